@@ -1,14 +1,13 @@
 import streamlit as st
-import sklearn
-import pandas as pd
-import joblib
 from pathlib import Path
 import os
-from shared.utils import (
-    FeatureEngineering, TrasformNumeric, MinMaxScalerFeatures, 
-    LifestyleScore, ObesityMap, Model, DropNonNumeric, DropFeatures
-)
-import google.generativeai as genai
+import json
+# sklearn, pandas e o SDK do Gemini só são importados quando realmente usados:
+# o modelo vem do artefato compacto (só NumPy) e a IA só carrega ao pedir a análise
+from shared.cache import PredictionCache, CachedPredictor, file_signature
+from shared.registry import ModelRegistry
+from shared.warmup import BackgroundLoader, warm_predictor
+from shared import profiling
 
 
 # 2. CONFIGURAÇÃO DA PÁGINA (PRIMEIRO COMANDO STREAMLIT)
@@ -16,13 +15,38 @@ st.set_page_config(page_title="ObesityFastCheck", layout="centered")
 
 # 3. FUNÇÕES AUXILIARES
 BASE_DIR = Path(__file__).resolve().parent
-MODEL_PATH = BASE_DIR / "models" / "obesity_model.joblib"
+MODEL_PATH = BASE_DIR / "models" / "obesity_model.ofc"
+if not MODEL_PATH.exists():
+    # Sem o artefato compacto, usa o Pipeline do joblib (importa sklearn e pandas)
+    MODEL_PATH = BASE_DIR / "models" / "obesity_model.joblib"
+# Linha de base do monitor de drift, gravada pelo treino (python -m train.build_baseline)
+BASELINE_PATH = BASE_DIR / "models" / "obesity_baseline.json"
+ANALYSIS_CACHE_PATH = BASE_DIR / ".cache" / "analises.sqlite3"
+ANALYSIS_TIMEOUT = 60
+
+
+def _load_predictor():
+    from shared.artifact import load_predictor
+    return load_predictor(MODEL_PATH)
+
 
 @st.cache_resource
+def start_model_registry():
+    # O carregamento roda em segundo plano: a página é desenhada sem esperar o modelo.
+    # Quando o modelo muda no disco, a nova versão é carregada e trocada
+    # sem reiniciar o app; predições em andamento terminam com a versão anterior
+    registry = ModelRegistry(_load_predictor, [MODEL_PATH], warmup=warm_predictor).start()
+    # OBESITY_SHADOW_MODEL=caminho avalia um modelo candidato em sombra, sem afetar a resposta
+    shadow_path = os.environ.get("OBESITY_SHADOW_MODEL")
+    if shadow_path:
+        from shared.artifact import load_predictor
+        BackgroundLoader(lambda: registry.set_shadow(load_predictor(shadow_path), version=shadow_path))
+    return registry
+
+
 def load_model():
     try:
-        pipeline = joblib.load(MODEL_PATH)
-        return pipeline
+        return start_model_registry().wait()
     except FileNotFoundError:
         st.error(f"Modelo não encontrado em: {MODEL_PATH.resolve()}")
         return None
@@ -31,20 +55,56 @@ def load_model():
         return None
 
 
+@st.cache_resource
+def load_prediction_cache():
+    return PredictionCache(maxsize=4096, ttl=3600, source=lambda: start_model_registry().active_version)
+
+
+@st.cache_resource(max_entries=1)
+def load_drift_monitor(signature):
+    # A assinatura do arquivo entra na chave: uma nova linha de base recomeça as estatísticas
+    if signature is None:
+        return None
+    from shared.drift import DriftMonitor, load_baseline
+    return DriftMonitor(load_baseline(BASELINE_PATH))
 
-def gerar_analise_ia(imc, lifestyle_score, healthy_meal_ratio, activity_balance, transport_type, input_data):
+
+@st.cache_resource
+def load_analysis_service():
+    from shared.llm import AnalysisService, AnalysisStore, GeminiBackend, LocalBackend
+
+    # OBESITY_LLM_BACKEND=local usa um substituto offline do Gemini (testes e benchmarks)
+    if os.environ.get("OBESITY_LLM_BACKEND") == "local":
+        backend = LocalBackend()
+    else:
+        backend = GeminiBackend(api_key=st.secrets["GOOGLE_API_KEY"]) # Usando o modelo Flash, que é rápido e eficiente
+    return AnalysisService(backend, AnalysisStore(ANALYSIS_CACHE_PATH))
+
+
+
+def gerar_analise_ia(imc, lifestyle_score, healthy_meal_ratio, activity_balance, transport_type, input_data,
+                     fatores=None):
     """
     Gera uma análise de saúde personalizada usando a API do Google Gemini.
+    A geração roda em segundo plano; o retorno é um stream de texto parcial.
     """
-    # Configura a API key a partir dos segredos do Streamlit
+    from shared.explain import format_contributions
+
+    # Cliente reutilizado entre chamadas; a API key vem dos segredos do Streamlit
     try:
-        genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
+        service = load_analysis_service()
     except Exception:
         st.error("Chave da API do Google não encontrada. Verifique o arquivo secrets.toml.")
         return "Erro: Chave da API não configurada."
 
-    # Cria o modelo
-    model = genai.GenerativeModel('gemini-2.5-flash') # Usando o modelo Flash, que é rápido e eficiente
+    # Com a explicação do modelo, os fatores que mais pesaram substituem o dicionário
+    # bruto do formulário: o prompt fica mais curto e mais focado
+    if fatores:
+        dados_modelo = ("    - **Fatores que mais pesaram na classificação (pontos percentuais na classe prevista):**\n"
+                        + format_contributions(fatores))
+    else:
+        dados_modelo = f"""    - ** Inputa do usuário: para avaliações mais precisas**
+    - **Geral:** {input_data}"""
 
     # O prompt é a parte mais importante. Ele guia a IA para dar a resposta desejada.
     prompt = f"""
@@ -57,8 +117,7 @@ def gerar_analise_ia(imc, lifestyle_score, healthy_meal_ratio, activity_balance,
     - **ActivityBalance (Balanço de Atividade Física vs. Tela):** {activity_balance}
     - **TransportType (Tipo de Transporte):** '{transport_type}'
 
-    - ** Inputa do usuário: para avaliações mais precisas**
-    - **Geral:** {input_data}
+{dados_modelo}
 
     **Instruções:**
     -   IMC (Índice de Massa Corporal)
@@ -119,16 +178,29 @@ def gerar_analise_ia(imc, lifestyle_score, healthy_meal_ratio, activity_balance,
         
     """
 
+    # Prompts idênticos vêm do cache em disco; pedidos simultâneos iguais viram uma só chamada
+    return service.stream(prompt, timeout=ANALYSIS_TIMEOUT)
+
+
+def exibir_analise(analise):
+    """
+    Escreve a análise na página à medida que o texto chega.
+    """
+    if isinstance(analise, str):
+        st.markdown(analise)
+        return
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        st.write_stream(iter(analise))
+    except TimeoutError:
+        st.warning("A análise demorou mais que o esperado e foi cancelada. Tente novamente.")
     except Exception as e:
         st.error(f"Ocorreu um erro ao contatar a IA: {e}")
-        return "Não foi possível gerar a análise no momento."
+        st.markdown("Não foi possível gerar a análise no momento.")
     
 
-# 4. CARREGAMENTO DO MODELO
-pipeline = load_model()
+# 4. CARREGAMENTO DO MODELO (em segundo plano)
+start_model_registry()
+prediction_cache = load_prediction_cache()
 
 # 5. INTERFACE DO USUÁRIO
 st.title("🔬 ObesityFastCheck")
@@ -221,7 +293,8 @@ with st.sidebar:
 
 # 6. LÓGICA DO BOTÃO
 if st.button("Prever Nível de Obesidade"):
-    if pipeline is not None:
+    predictor = load_model()
+    if predictor is not None:
         input_data = {
             "Height": Height, "Weight": Weight, "FCVC": FCVC, "NCP": NCP,
             "CH2O": CH2O, "FAF": FAF, "TUE": TUE,
@@ -231,31 +304,23 @@ if st.button("Prever Nível de Obesidade"):
             "CALC": calc_map[CALC_pt], "Gender": gender_map[Gender_pt],
             "MTRANS": mtrans_map[MTRANS_pt]
         }
-        features_df = pd.DataFrame([input_data])
 
         try:
-            transformed_df = pipeline[:-1].transform(features_df)
-            prediction = pipeline.predict(features_df)
-           
-            
-            
-            
-            predicted_class = prediction[0] 
-            
+            drift_monitor = load_drift_monitor(file_signature(BASELINE_PATH))
+            if drift_monitor is not None:
+                drift_monitor.observe(input_data)
+            result = CachedPredictor(predictor, prediction_cache).predict_record(input_data)
+            predicted_class = result['prediction']
+            if drift_monitor is not None:
+                drift_monitor.observe_predictions([predicted_class])
 
             transport_type = MTRANS_pt
 
-            imc = Weight / (Height**2)
-            healthy_meal_ratio = FCVC / NCP if NCP > 0 else 0
-            activity_balance = FAF - TUE
-            
-            # Para o LifestyleScore, replicamos a lógica com os valores 0 e 1
-            score = (
-                (1 if SMOKE_pt == 'Não' else 0) + 
-                (1 if SCC_pt == 'Sim' else 0) + 
-                (1 if FAVC_pt == 'Não' else 0) + 
-                (1 if family_history_pt == 'Não' else 0))
-            lifestyle_score = score
+            indicators = result['indicators']
+            imc = indicators['IMC']
+            healthy_meal_ratio = indicators['HealthyMealRatio']
+            activity_balance = indicators['ActivityBalance']
+            lifestyle_score = indicators['LifestyleScore']
 
 
             label_map = {
@@ -279,20 +344,29 @@ if st.button("Prever Nível de Obesidade"):
                 unsafe_allow_html=True
             )
 
-        
+            # Contribuição de cada campo para a classe prevista (caminhos das árvores, sem chamar a IA)
+            from shared.explain import format_contributions
+            explicacao = predictor.explain_record(input_data, top=5)
+            with st.expander("🔍 Por que essa classificação?"):
+                st.markdown(
+                    f"Probabilidade média da classe no modelo: **{explicacao['base']:.0%}**; "
+                    f"com os seus dados: **{explicacao['probability']:.0%}**. Campos que mais pesaram:"
+                )
+                st.markdown(format_contributions(explicacao['contributions']))
+
             st.subheader("🤖 Análise Personalizada por IA")
             
-            # Adiciona um spinner para mostrar que está processando
-            with st.spinner('Gerando análise com base nos seus dados...'):
-                analise_personalizada = gerar_analise_ia(
-                    imc=imc,
-                    lifestyle_score=lifestyle_score,
-                    healthy_meal_ratio=healthy_meal_ratio,
-                    activity_balance=activity_balance,
-                    transport_type=transport_type,
-                    input_data=input_data
-                )
-            st.markdown(analise_personalizada)
+            # A predição já está na tela; a análise é gerada em segundo plano e transmitida
+            analise_personalizada = gerar_analise_ia(
+                imc=imc,
+                lifestyle_score=lifestyle_score,
+                healthy_meal_ratio=healthy_meal_ratio,
+                activity_balance=activity_balance,
+                transport_type=transport_type,
+                input_data=input_data,
+                fatores=explicacao['contributions']
+            )
+            exibir_analise(analise_personalizada)
             st.markdown("---")
                     
         except Exception as e:
@@ -302,3 +376,20 @@ if st.button("Prever Nível de Obesidade"):
     else:
         st.error("O modelo não está carregado. O aplicativo não pode fazer predições.")
 
+
+# 7. PERFIL DE DESEMPENHO (OBESITY_PROFILE=1)
+if profiling.is_enabled():
+    with st.sidebar.expander("⏱️ Tempo por etapa"):
+        st.dataframe(profiling.summary(), hide_index=True)
+        st.download_button("Snapshot JSON", json.dumps(profiling.snapshot()), "etapas.json", "application/json")
+        st.download_button("Formato Prometheus", profiling.to_prometheus(), "etapas.prom", "text/plain")
+    drift_monitor = load_drift_monitor(file_signature(BASELINE_PATH))
+    if drift_monitor is not None:
+        with st.sidebar.expander("📈 Drift das entradas"):
+            drift_report = drift_monitor.report()
+            st.markdown(f"Campos acima do limite: **{', '.join(drift_report['drifted']) or 'nenhum'}**")
+            st.json(drift_report)
+
+if start_model_registry().shadow is not None:
+    with st.sidebar.expander("🧪 Modelo em sombra"):
+        st.json(start_model_registry().describe())
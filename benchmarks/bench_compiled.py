@@ -0,0 +1,92 @@
+"""
+Compara o Pipeline do joblib com o CompiledPipeline em lotes grandes.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_compiled --rows 1000000
+"""
+import argparse
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_inputs
+from shared.compiled import compile_pipeline
+
+MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "obesity_model.joblib"
+
+
+def measure(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    # O pico de memória é medido numa execução separada: o tracemalloc distorce o tempo
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def record_latency(fn, record, repeat):
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(record)
+        timings[i] = time.perf_counter() - start
+    return np.percentile(timings, 50) * 1e3, np.percentile(timings, 99) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--records', type=int, default=2000, help='repetições do teste de um registro')
+    parser.add_argument('--model', default=str(MODEL_PATH))
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    pipeline = joblib.load(args.model)
+    compiled = compile_pipeline(pipeline)
+    X = make_inputs(args.rows)
+
+    cases = [
+        ('pipeline.transform', lambda: pipeline[:-1].transform(X).to_numpy(np.float64)),
+        ('compiled.transform', lambda: compiled.transform(X)),
+        ('pipeline.predict', lambda: pipeline.predict(X)),
+        ('compiled.predict', lambda: compiled.predict(X)),
+    ]
+    results = {}
+    print(f"{'case':<22}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}")
+    for name, fn in cases:
+        results[name], seconds, peak = measure(fn, args.repeat)
+        print(f"{name:<22}{seconds:>10.3f}{args.rows / seconds:>14,.0f}{peak / 2**20:>10.1f}")
+
+    print("\nmatriz idêntica:", np.array_equal(results['pipeline.transform'], results['compiled.transform']))
+    print("predições idênticas:", np.array_equal(results['pipeline.predict'], results['compiled.predict']))
+
+    # Latência de um único registro, como no botão do app.py
+    record = X.iloc[0].to_dict()
+
+    def app_path(rec):
+        features_df = pd.DataFrame([rec])
+        pipeline[:-1].transform(features_df)
+        return pipeline.predict(features_df)
+
+    print(f"\n{'single record':<22}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, fn, repeat in [
+        ('pipeline (app.py)', app_path, max(args.records // 10, 1)),
+        ('predict_record', compiled.predict_record, args.records),
+    ]:
+        p50, p99 = record_latency(fn, record, repeat)
+        print(f"{name:<22}{p50:>10.3f}{p99:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Custo do monitor de drift (shared.drift) no caminho de predição.
+
+Mede o `observe` por registro (o que o app e POST /predict pagam a cada
+predição) ao lado do predict_record, e o `observe_batch` em lotes de linhas
+sintéticas (score.py --drift e /predict_batch) ao lado do predict_proba.
+Confere também que as estatísticas por registro e em lote coincidem.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_drift --rows 100000
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import make_inputs
+from shared.artifact import load_predictor
+from shared.drift import DriftMonitor, load_baseline
+from shared.warmup import SAMPLE_RECORD, warm_predictor
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def rows_per_second(fn, rows):
+    start = time.perf_counter()
+    result = fn()
+    return rows / (time.perf_counter() - start), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=str(ROOT / 'models' / 'obesity_model.ofc'))
+    parser.add_argument('--baseline', default=str(ROOT / 'models' / 'obesity_baseline.json'))
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5000, help='chamadas por registro')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    predictor = load_predictor(args.model)
+    warm_predictor(predictor)
+    baseline = load_baseline(args.baseline)
+    monitor = DriftMonitor(baseline)
+    prediction = predictor.predict_record(SAMPLE_RECORD)['prediction']
+    print(f"{'registro único':<34}{'µs':>10}")
+    for name, fn in [('predict_record', lambda: predictor.predict_record(SAMPLE_RECORD)),
+                     ('observe', lambda: monitor.observe(SAMPLE_RECORD, prediction))]:
+        print(f"{name:<34}{per_call_us(fn, args.repeat):>10.1f}")
+
+    X = make_inputs(args.rows, seed=args.seed)
+    print(f"\n{f'lote de {args.rows:,} linhas':<34}{'linhas/s':>10}")
+    rate, proba = rows_per_second(lambda: predictor.predict_proba(X), args.rows)
+    print(f"{'predict_proba':<34}{rate:>10,.0f}")
+    predictions = predictor.forest.classes_.take(np.argmax(proba, axis=1))
+    batch = DriftMonitor(baseline)
+    rate, _ = rows_per_second(lambda: batch.observe_batch(X, predictions), args.rows)
+    print(f"{'observe_batch':<34}{rate:>10,.0f}")
+
+    sample = min(args.rows, 5000)
+    head, labels = X.head(sample), predictions[:sample]
+    one_by_one, in_batch = DriftMonitor(baseline), DriftMonitor(baseline)
+    for record, label in zip(head.to_dict('records'), labels):
+        one_by_one.observe(record, label)
+    in_batch.observe_batch(head, labels)
+    expected, actual = one_by_one.report(), in_batch.report()
+    same = all(np.isclose(expected['fields'][name].get('psi') or 0, actual['fields'][name].get('psi') or 0)
+               for name in expected['fields'])
+    print(f"\nPSI igual por registro e em lote ({sample:,} linhas): {same}")
+    print(f"campos acima do limite no lote sintético: {', '.join(batch.report()['drifted']) or 'nenhum'}")
+
+
+if __name__ == '__main__':
+    main()
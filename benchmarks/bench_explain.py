@@ -0,0 +1,70 @@
+"""
+Custo das explicações por feature (FlatForest.explain) em relação à predição.
+
+Para um registro (caminho do app e de POST /explain) e para lotes de linhas
+sintéticas (pontuação de coortes com score.py --explain), compara o tempo da
+predição com o da explicação completa (todas as classes) e só da classe
+prevista. Confere também que bias + soma das contribuições reproduz o
+predict_proba.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_explain --rows 100000
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import make_inputs
+from shared.artifact import load_predictor
+from shared.warmup import SAMPLE_RECORD, warm_predictor
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def rows_per_second(fn, rows):
+    start = time.perf_counter()
+    result = fn()
+    return rows / (time.perf_counter() - start), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=str(ROOT / 'models' / 'obesity_model.ofc'))
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=2000, help='chamadas por registro')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    predictor = load_predictor(args.model)
+    warm_predictor(predictor)
+    print(f"{'registro único':<34}{'µs':>10}")
+    for name, fn in [('predict_record', lambda: predictor.predict_record(SAMPLE_RECORD)),
+                     ('explain_record', lambda: predictor.explain_record(SAMPLE_RECORD))]:
+        print(f"{name:<34}{per_call_us(fn, args.repeat):>10.1f}")
+
+    X = make_inputs(args.rows, seed=args.seed)
+    print(f"\n{f'lote de {args.rows:,} linhas':<34}{'linhas/s':>10}")
+    rate, proba = rows_per_second(lambda: predictor.predict_proba(X), args.rows)
+    print(f"{'predict_proba':<34}{rate:>10,.0f}")
+    rate, full = rows_per_second(lambda: predictor.explain(X), args.rows)
+    print(f"{'explain (todas as classes)':<34}{rate:>10,.0f}")
+    rate, predicted = rows_per_second(lambda: predictor.explain(X, predicted_only=True), args.rows)
+    print(f"{'explain (classe prevista)':<34}{rate:>10,.0f}")
+
+    error = np.abs(full['bias'] + full['contributions'].sum(axis=1) - proba).max()
+    print(f"\nprobabilidades idênticas ao predict_proba: {np.array_equal(full['proba'], proba)}")
+    print(f"maior erro de bias + soma das contribuições: {error:.2e}")
+    print(f"classe prevista igual nas duas formas: {np.array_equal(predicted['prediction'], full['prediction'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Compara os motores da floresta (sklearn x FlatForest) em vários tamanhos de lote.
+
+As features são a matriz já transformada (saída do CompiledPipeline), então
+só a inferência da RandomForest é medida.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_forest --sizes 1 10 100 1000 10000 100000 1000000
+"""
+import argparse
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from benchmarks.synthetic import make_inputs
+from shared.compiled import compile_pipeline, forest_proba
+from shared.forest import FlatForest
+
+MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "obesity_model.joblib"
+DEFAULT_SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+def best_time(fn, min_time=0.2, max_repeat=1000):
+    # Repete até acumular `min_time` segundos (lotes pequenos) e fica com o melhor tempo
+    best, total, repeat = float('inf'), 0.0, 0
+    while repeat < max_repeat and (total < min_time or repeat < 2):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best, total, repeat = min(best, elapsed), total + elapsed, repeat + 1
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--model', default=str(MODEL_PATH))
+    parser.add_argument('--chunk-size', type=int, help='linhas por bloco do FlatForest')
+    parser.add_argument('--min-time', type=float, default=0.2, help='segundos mínimos medidos por caso')
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    compiled = compile_pipeline(joblib.load(args.model))
+    forest = compiled.forest
+    flat = FlatForest.from_sklearn(forest, **({'chunk_size': args.chunk_size} if args.chunk_size else {}))
+    X_all = compiled.transform(make_inputs(max(args.sizes))).astype(np.float32, order='C')
+
+    engines = [
+        ('sklearn', forest.predict_proba),
+        ('sklearn trees', lambda X: forest_proba(forest, X)),
+        ('flat', flat.predict_proba),
+    ]
+    print(f"{'rows':>9}  " + ''.join(f"{name + ' ms':>18}" for name, _ in engines) + f"{'speedup':>10}{'identical':>11}")
+    for size in args.sizes:
+        X = X_all[:size]
+        results, timings = [], []
+        for _, fn in engines:
+            result, seconds = best_time(lambda: fn(X), min_time=args.min_time)
+            results.append(result)
+            timings.append(seconds)
+        identical = all(np.array_equal(results[0], r) for r in results[1:])
+        print(f"{size:>9,}  " + ''.join(f"{t * 1e3:>18.3f}" for t in timings)
+              + f"{timings[0] / timings[-1]:>9.1f}x{str(identical):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Concordância e latência da tabela de consulta (shared.lookup) contra o modelo ao vivo.
+
+Usa dois conjuntos de registros: as linhas de Obesity.csv arredondadas para a
+resolução do formulário (sliders inteiros, altura e peso com duas casas) e
+entradas sorteadas uniformemente dentro dos limites do formulário. Para cada
+um, mostra a cobertura (fração respondida pela tabela), a concordância da
+classe entre as respondidas e o tempo por predição com e sem a tabela.
+
+Uso (a partir da raiz do repositório):
+    python -m train.build_lookup
+    python -m benchmarks.bench_lookup --random 20000
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from shared.artifact import load_predictor
+from shared.lookup import DISCRETE_FIELDS, LookupPredictor, agreement, load_table
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def dataset_records(path=ROOT / 'Obesity.csv'):
+    df = pd.read_csv(path).drop(columns=['Obesity'])
+    for name in ['FCVC', 'NCP', 'CH2O', 'FAF', 'TUE']:
+        df[name] = df[name].round().astype(int)
+    df['Height'] = df['Height'].round(2)
+    df['Weight'] = df['Weight'].round(2)
+    return df.to_dict('records')
+
+
+def random_records(n, seed=42):
+    # Mesmos limites do formulário do app
+    rng = np.random.default_rng(seed)
+    records = []
+    for _ in range(n):
+        record = {name: values[rng.integers(len(values))] for name, values, _ in DISCRETE_FIELDS}
+        record['Height'] = round(rng.integers(100, 251) / 100, 2)
+        record['Weight'] = round(rng.integers(3000, 20001) / 100, 2)
+        records.append(record)
+    return records
+
+
+def per_call_us(fn, records):
+    start = time.perf_counter()
+    for record in records:
+        fn(record)
+    return (time.perf_counter() - start) / len(records) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=str(ROOT / 'models' / 'obesity_lookup.oft'))
+    parser.add_argument('--model', default=str(ROOT / 'models' / 'obesity_model.ofc'))
+    parser.add_argument('--random', type=int, default=20_000, help='entradas sorteadas no espaço do formulário')
+    args = parser.parse_args()
+
+    live = load_predictor(args.model)
+    table = load_table(args.table)
+    lookup = LookupPredictor(table, live)
+    print(f"tabela: {len(table.classes):,} entradas, {table.coverage():.1%} com resposta")
+    print(f"{'registros':<12}{'n':>8}{'cobertura':>11}{'concordância':>14}{'tabela µs':>11}"
+          f"{'modelo µs':>11}{'com fallback µs':>17}")
+    for name, records in [('Obesity.csv', dataset_records()), ('uniforme', random_records(args.random))]:
+        result = agreement(table, live, records)
+        answered = [r for r in records if table.lookup(r) is not None] or records[:1]
+        print(f"{name:<12}{result['records']:>8,}{result['coverage']:>11.1%}{result['agreement']:>14.2%}"
+              f"{per_call_us(lookup.predict_record, answered):>11.1f}{per_call_us(live.predict_record, records):>11.1f}"
+              f"{per_call_us(lookup.predict_record, records):>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
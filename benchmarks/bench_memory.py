@@ -0,0 +1,91 @@
+"""
+Pico de memória do Pipeline padrão vs. modo compacto (shared.utils.compact_pipeline).
+
+Grava um CSV sintético e, em processos filhos separados, lê o arquivo e roda o
+predict_proba: no modo padrão (strings como object, cópias a cada etapa) e no
+compacto (texto lido como Categorical, tipos menores, etapas no lugar). Por
+milhão de linhas, mostra a memória da entrada lida, o pico durante o
+predict_proba (alocações do NumPy/pandas via tracemalloc, entrada incluída) e
+o pico de RSS do processo, que inclui o read_csv. Confere também que as
+probabilidades são idênticas.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from benchmarks.suite import isolated, peak_rss_mb
+from benchmarks.synthetic import make_inputs
+from shared.utils import COMPACT_READ_DTYPES, compact_pipeline
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        return peak_rss_mb()
+
+
+def run_case(pipeline, path, dtype):
+    # RSS medido a partir do processo filho ocioso (que já herdou o modelo carregado)
+    base = current_rss_mb()
+    X = pd.read_csv(path, dtype=dtype)
+    tracemalloc.start()
+    input_mb = X.memory_usage(index=True, deep=True).sum() / 2**20
+    start = time.perf_counter()
+    proba = pipeline.predict_proba(X)
+    seconds = time.perf_counter() - start
+    predict_peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return {'seconds': seconds, 'input_mb': input_mb, 'predict_peak_mb': input_mb + predict_peak,
+            'peak_rss_mb': peak_rss_mb() - base, 'digest': hashlib.sha1(proba.tobytes()).hexdigest()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    pipeline = joblib.load(ROOT / 'models' / 'obesity_model.joblib')
+    cases = [('padrão', pipeline, None), ('compacto', compact_pipeline(pipeline), COMPACT_READ_DTYPES)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'entrada.csv'
+        make_inputs(args.rows, seed=args.seed).to_csv(path, index=False)
+        results = {}
+        scale = 1e6 / args.rows
+        print(f"MB por milhão de linhas ({args.rows:,} linhas)")
+        print(f"{'modo':<12}{'tempo s':>10}{'entrada':>10}{'pico predict':>14}{'pico RSS':>10}")
+        for name, model, dtype in cases:
+            result, _ = isolated(lambda: run_case(model, path, dtype))
+            results[name] = result
+            if 'error' in result:
+                print(f"{name:<12}{result['error']}")
+                continue
+            print(f"{name:<12}{result['seconds']:>10.2f}{result['input_mb'] * scale:>10,.0f}"
+                  f"{result['predict_peak_mb'] * scale:>14,.0f}{result['peak_rss_mb'] * scale:>10,.0f}")
+
+    if all('digest' in r for r in results.values()):
+        default, compact = results['padrão'], results['compacto']
+        print(f"\nprobabilidades idênticas: {default['digest'] == compact['digest']}")
+        for key, label in [('input_mb', 'entrada'), ('predict_peak_mb', 'pico predict'), ('peak_rss_mb', 'pico RSS')]:
+            print(f"redução ({label}): {default[key] / compact[key]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
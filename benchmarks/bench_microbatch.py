@@ -0,0 +1,66 @@
+"""
+Predições concorrentes de uma linha: chamadas diretas vs. micro-batching.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_microbatch --threads 32 --requests 200 --window-ms 2
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from benchmarks.synthetic import make_inputs
+from shared.batching import MicroBatchModel
+from shared.compiled import compile_pipeline, forest_proba
+
+MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "obesity_model.joblib"
+
+
+def run(predict_one, rows, threads):
+    latencies = np.empty(len(rows))
+
+    def task(i):
+        start = time.perf_counter()
+        result = predict_one(rows[i:i + 1])
+        latencies[i] = time.perf_counter() - start
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = np.concatenate(list(pool.map(task, range(len(rows)))))
+    return results, time.perf_counter() - start, latencies * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200, help='requisições por thread')
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--max-batch', type=int, default=64)
+    args = parser.parse_args()
+
+    compiled = compile_pipeline(joblib.load(MODEL_PATH))
+    rows = compiled.transform(make_inputs(args.threads * args.requests), dtype=np.float32)
+    rows = np.ascontiguousarray(rows)
+    batched = MicroBatchModel(compiled.forest, max_batch_size=args.max_batch, max_wait=args.window_ms / 1000)
+
+    cases = [
+        ('direct', lambda X: forest_proba(compiled.forest, X)),
+        ('microbatch', batched.predict_proba),
+    ]
+    outputs = {}
+    print(f"{'mode':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, fn in cases:
+        outputs[name], seconds, latencies = run(fn, rows, args.threads)
+        print(f"{name:<12}{len(rows) / seconds:>10,.0f}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}")
+
+    print("\nresultados idênticos:", np.array_equal(outputs['direct'], outputs['microbatch']))
+    print("métricas:", batched.metrics())
+    batched.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Teste de carga do server.py: req/s e latência p50/p99 em /predict.
+
+Sobe o servidor local (ou usa --url) e dispara requisições de processos
+clientes concorrentes, cada um com uma conexão keep-alive. Uso:
+    python -m benchmarks.bench_server --workers 4 --concurrency 8 --duration 10
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+
+from benchmarks.synthetic import make_inputs
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def client(url, payloads, duration, path):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        body = payloads[i % len(payloads)]
+        i += 1
+        start = time.perf_counter()
+        conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            errors += 1
+    conn.close()
+    return latencies, errors
+
+
+def wait_ready(url, timeout=60):
+    parsed = urlparse(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='servidor já em execução (senão um é iniciado)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--engine', default='compiled')
+    parser.add_argument('--microbatch-ms', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    payloads = [json.dumps(r) for r in make_inputs(1000).to_dict('records')]
+
+    process = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        process = subprocess.Popen(
+            [sys.executable, str(BASE_DIR / 'server.py'), '--port', str(args.port),
+             '--workers', str(args.workers), '--engine', args.engine,
+             '--microbatch-ms', str(args.microbatch_ms)],
+            cwd=BASE_DIR, stdout=subprocess.DEVNULL
+        )
+    try:
+        wait_ready(url)
+        with multiprocessing.Pool(args.concurrency) as pool:
+            results = pool.starmap(
+                client, [(url, payloads[i::args.concurrency], args.duration, '/predict') for i in range(args.concurrency)]
+            )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies = np.concatenate([np.asarray(lat) for lat, _ in results]) * 1e3
+    errors = sum(err for _, err in results)
+    print(f"requisições: {len(latencies)}  erros: {errors}")
+    print(f"req/s: {len(latencies) / args.duration:,.0f}")
+    print(f"p50: {np.percentile(latencies, 50):.2f} ms  p99: {np.percentile(latencies, 99):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
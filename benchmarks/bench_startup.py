@@ -0,0 +1,94 @@
+"""
+Tempo de partida do app.py: imports e tempo até a primeira predição.
+
+Cada medição roda num processo Python novo. O modo `eager` reproduz o app
+antigo (sklearn, pandas, joblib, shared.utils e o SDK do Gemini importados no
+topo, Pipeline lido do .joblib); o modo `lazy` é o atual (só o necessário para
+desenhar a página, modelo lido do artefato .ofc em segundo plano). Módulos não
+instalados (por exemplo streamlit ou google-generativeai) são ignorados nos
+dois modos e listados na saída.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEADER = """
+import importlib, json, sys, time
+start = time.perf_counter()
+skipped = []
+for name in {modules!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        skipped.append(name)
+imported = time.perf_counter()
+"""
+
+EAGER = HEADER + """
+import joblib
+from shared.compiled import compile_pipeline
+from shared.warmup import SAMPLE_RECORD
+predictor = compile_pipeline(joblib.load('models/obesity_model.joblib'))
+loaded = time.perf_counter()
+predictor.predict_record(SAMPLE_RECORD)
+"""
+
+LAZY = HEADER + """
+from shared.warmup import BackgroundLoader, SAMPLE_RECORD, warm_predictor
+from shared.artifact import load_predictor
+loader = BackgroundLoader(lambda: load_predictor('models/obesity_model.ofc'), warmup=warm_predictor)
+predictor = loader.result()
+loaded = time.perf_counter()
+predictor.predict_record(SAMPLE_RECORD)
+"""
+
+FOOTER = """
+done = time.perf_counter()
+print(json.dumps({
+    'import': imported - start, 'load': loaded - imported, 'first_prediction': done - start,
+    'modules': len(sys.modules), 'skipped': skipped,
+}))
+"""
+
+MODES = {
+    'eager': (EAGER, ['streamlit', 'sklearn', 'pandas', 'joblib', 'shared.utils', 'shared.compiled',
+                      'shared.cache', 'shared.llm', 'google.generativeai']),
+    'lazy': (LAZY, ['streamlit', 'shared.cache', 'shared.warmup']),
+}
+
+
+def run_once(mode):
+    template, modules = MODES[mode]
+    code = template.format(modules=modules) + FOOTER
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'import s':>10}{'load s':>10}{'1st pred s':>12}{'modules':>9}")
+    skipped = set()
+    for mode in MODES:
+        runs = [run_once(mode) for _ in range(args.repeat)]
+        skipped.update(*(r['skipped'] for r in runs))
+        median = {key: np.median([r[key] for r in runs]) for key in ('import', 'load', 'first_prediction', 'modules')}
+        print(f"{mode:<8}{median['import']:>10.3f}{median['load']:>10.3f}"
+              f"{median['first_prediction']:>12.3f}{median['modules']:>9.0f}")
+    if skipped:
+        print(f"\nnão instalados (ignorados): {', '.join(sorted(skipped))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Tempo até o primeiro texto na tela: análise bloqueante vs. transmitida.
+
+Usa o LocalBackend, então roda sem rede. Uso (a partir da raiz):
+    python -m benchmarks.bench_streaming --latency 0.5 --chunk-latency 0.1
+"""
+import argparse
+import time
+
+import numpy as np
+
+from shared.llm import AnalysisService, LocalBackend
+
+
+def run(service, mode, prompt):
+    start = time.perf_counter()
+    if mode == 'generate':
+        service.generate(prompt)
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed
+    first = None
+    for _ in service.stream(prompt):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.5, help='latência até o primeiro token (s)')
+    parser.add_argument('--chunk-latency', type=float, default=0.1, help='intervalo entre pedaços (s)')
+    parser.add_argument('--chunks', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=10)
+    args = parser.parse_args()
+
+    backend = LocalBackend(latency=args.latency, chunk_latency=args.chunk_latency, n_chunks=args.chunks)
+    # Sem store: cada pedido chama o backend, para medir a geração e não o cache
+    service = AnalysisService(backend, store=None)
+
+    print(f"{'mode':<10}{'first p50 s':>14}{'first p99 s':>14}{'total p50 s':>14}")
+    for mode in ('generate', 'stream'):
+        timings = np.array([run(service, mode, f"{mode}-{i}") for i in range(args.requests)])
+        first, total = timings[:, 0], timings[:, 1]
+        print(f"{mode:<10}{np.percentile(first, 50):>14.3f}{np.percentile(first, 99):>14.3f}{np.percentile(total, 50):>14.3f}")
+    service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Tempo por etapa do caminho de predição (shared.profiling) em execução offline.
+
+Roda o Pipeline do joblib e o caminho compilado sobre dados sintéticos com a
+instrumentação ligada, imprime o resumo por etapa e mede o custo do
+decorador quando a instrumentação está desligada.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.profile_stages --rows 100000 --out etapas.json
+"""
+import argparse
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+
+from benchmarks.synthetic import make_inputs
+from shared import profiling
+from shared.artifact import load_predictor
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class _Step:
+    def plain(self, X):
+        return X
+
+    instrumented = profiling.instrument()(plain)
+
+
+def disabled_overhead(repeat=500_000):
+    # Custo do decorador desligado: método instrumentado vs. o mesmo método sem decorador
+    profiling.disable()
+    step = _Step()
+    timings = []
+    for fn in (step.plain, step.instrumented):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(None)
+        timings.append((time.perf_counter() - start) / repeat)
+    return (timings[1] - timings[0]) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--records', type=int, default=1000, help='predições de um registro (caminho do app)')
+    parser.add_argument('--trace-allocations', action='store_true', help='bytes alocados via tracemalloc')
+    parser.add_argument('--out', help='grava o snapshot (.json, ou .prom para o formato do Prometheus)')
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    pipeline = joblib.load(ROOT / 'models' / 'obesity_model.joblib')
+    compiled = load_predictor(ROOT / 'models' / 'obesity_model.ofc')
+    X = make_inputs(args.rows)
+    records = X.head(args.records).to_dict('records')
+
+    profiling.enable(trace_allocations=args.trace_allocations or None)
+    pipeline.predict(X)
+    compiled.predict(X)
+    for record in records:
+        compiled.predict_record(record)
+    data = profiling.snapshot()
+
+    print(f"{'stage':<40}{'calls':>8}{'total s':>10}{'mean ms':>10}{'rows':>12}{'MB':>10}")
+    for row in profiling.summary(data):
+        print(f"{row['stage']:<40}{row['calls']:>8}{row['total_s']:>10.3f}{row['mean_ms']:>10.3f}"
+              f"{row['rows']:>12,}{row['bytes'] / 2**20:>10.1f}")
+    print(f"\ncusto do decorador desligado: {disabled_overhead():.0f} ns por chamada")
+    if args.out:
+        profiling.dump(args.out, data)
+        print(f"snapshot gravado em {args.out}")
+
+
+if __name__ == '__main__':
+    main()
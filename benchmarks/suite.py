@@ -0,0 +1,263 @@
+"""
+Suíte de benchmarks reprodutível: pré-processamento, modelo e ponta a ponta.
+
+Para cada tamanho de entrada (sintética, com as distribuições de
+Obesity.csv e semente fixa) mede o `transform` de cada transformador do
+Pipeline, o `Pipeline.predict` completo (também no modo compacto) e o caminho
+compilado; mede também o tempo de carga do modelo (.joblib e .ofc). Cada caso roda num processo
+filho (fork) para que o pico de RSS seja só dele. O tempo de um caso é a
+mediana de `--rounds` rodadas (cada uma o melhor de N chamadas). O resultado
+vai para um JSON; com `--compare`, os casos mais lentos (ou com mais memória)
+que o baseline além da tolerância são listados e o processo sai com código 1.
+Um caso só é mais lento se a mediana piorar além da tolerância e do piso
+absoluto e se nenhuma rodada atual for tão rápida quanto a mais lenta do
+baseline, para que duas execuções da mesma árvore não acusem regressão.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.suite --out resultados.json
+    python -m benchmarks.suite --sizes 1 1000 100000 --compare baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.synthetic import make_inputs
+from shared.artifact import load_predictor
+from shared.utils import compact_pipeline
+
+ROOT = Path(__file__).resolve().parent.parent
+JOBLIB_PATH = ROOT / "models" / "obesity_model.joblib"
+ARTIFACT_PATH = ROOT / "models" / "obesity_model.ofc"
+DEFAULT_SIZES = [1, 1_000, 100_000, 10_000_000]
+DEFAULT_ROUNDS = 5
+# Diferenças abaixo disso são ruído de medição, mesmo que a razão seja grande
+MIN_DELTA_SECONDS = 2e-3
+MIN_DELTA_RSS_MB = 8.0
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB; macOS, bytes
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def best_time(fn, min_time, max_repeat=100):
+    best, total, repeat, result = float('inf'), 0.0, 0, None
+    while repeat < max_repeat and (repeat == 0 or total < min_time):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best, total, repeat = min(best, elapsed), total + elapsed, repeat + 1
+    return best, result
+
+
+def round_times(fn, min_time, rounds=DEFAULT_ROUNDS, max_repeat=100):
+    """
+    `rounds` medições independentes de `fn` (melhor de N cada, dividindo
+    `min_time` entre elas) e o resultado da última chamada.
+    """
+    times, result = [], None
+    for _ in range(rounds):
+        seconds, result = best_time(fn, min_time / rounds, max_repeat)
+        times.append(seconds)
+    return times, result
+
+
+def isolated(fn):
+    """
+    Roda `fn` num processo filho (fork) e devolve (resultado, pico de RSS em MB).
+    O filho herda a entrada já gerada; se ele morrer (por exemplo, sem memória),
+    o resultado é {'error': ...}.
+    """
+    if not hasattr(os, 'fork'):
+        return fn(), peak_rss_mb()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            payload = {'result': fn(), 'peak_rss_mb': peak_rss_mb()}
+        except BaseException as e:
+            payload = {'result': {'error': repr(e)}, 'peak_rss_mb': peak_rss_mb()}
+        with os.fdopen(write_fd, 'w') as f:
+            json.dump(payload, f)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        data = f.read()
+    _, status = os.waitpid(pid, 0)
+    if not data:
+        reason = f"signal {os.WTERMSIG(status)}" if os.WIFSIGNALED(status) else f"exit {os.WEXITSTATUS(status)}"
+        return {'error': f"worker died ({reason})"}, None
+    payload = json.loads(data)
+    return payload['result'], payload['peak_rss_mb']
+
+
+def transformer_cases(pipeline, X, min_time, rounds=DEFAULT_ROUNDS):
+    # Cada etapa recebe a saída da anterior, como dentro do Pipeline
+    timings = {}
+    current = X
+    for name, step in pipeline.steps[:-1]:
+        times, current = round_times(lambda: step.transform(current), min_time, rounds)
+        timings[f"{type(step).__name__}.transform"] = times
+    times, _ = round_times(lambda: pipeline.steps[-1][1].predict(current), min_time, rounds)
+    timings['Model.predict'] = times
+    return timings
+
+
+def model_load_cases(min_time, rounds=DEFAULT_ROUNDS):
+    return {
+        'load.joblib': round_times(lambda: joblib.load(JOBLIB_PATH), min_time, rounds, max_repeat=10)[0],
+        'load.artifact': round_times(lambda: load_predictor(ARTIFACT_PATH), min_time, rounds, max_repeat=10)[0],
+    }
+
+
+def run_suite(sizes, min_time=0.5, seed=42, rounds=DEFAULT_ROUNDS):
+    warnings.simplefilter('ignore')
+    pipeline = joblib.load(JOBLIB_PATH)
+    compiled = load_predictor(ARTIFACT_PATH)
+    compact = compact_pipeline(pipeline)
+    results = []
+
+    def add(case, rows, times, peak, error=None):
+        seconds = statistics.median(times) if times else None
+        entry = {'case': case, 'rows': rows, 'seconds': seconds, 'rounds': times, 'peak_rss_mb': peak}
+        if seconds:
+            entry['rows_per_s'] = rows / seconds
+        if error:
+            entry['error'] = error
+        results.append(entry)
+        status = error or f"{seconds * 1e3:12.3f} ms  ({min(times) * 1e3:.3f}-{max(times) * 1e3:.3f})"
+        print(f"{case:<36}{rows:>12,}  {status}  {'' if peak is None else f'{peak:,.0f} MB'}", flush=True)
+
+    timings, peak = isolated(lambda: model_load_cases(min_time, rounds))
+    for case in ('load.joblib', 'load.artifact'):
+        add(case, 0, timings.get(case), peak, timings.get('error'))
+
+    for n_rows in sizes:
+        X = make_inputs(n_rows, seed=seed)
+        timings, peak = isolated(lambda: transformer_cases(pipeline, X, min_time, rounds))
+        if 'error' in timings:
+            add('transformers', n_rows, None, peak, timings['error'])
+        for case, times in timings.items():
+            if case != 'error':
+                add(case, n_rows, times, peak)
+        predictors = [('Pipeline.predict', pipeline.predict), ('Pipeline.predict[compact]', compact.predict),
+                      ('CompiledPipeline.predict', compiled.predict)]
+        for case, fn in predictors:
+            times, peak = isolated(lambda: round_times(lambda: fn(X), min_time, rounds)[0])
+            if isinstance(times, dict):
+                add(case, n_rows, None, peak, times['error'])
+            else:
+                add(case, n_rows, times, peak)
+        del X
+    return results
+
+
+def environment(seed, min_time, rounds=DEFAULT_ROUNDS):
+    return {
+        'python': platform.python_version(), 'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(), 'cpu_count': os.cpu_count(),
+        'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+        'seed': seed, 'min_time': min_time, 'rounds': rounds, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def _slower(entry, old, tolerance, min_delta):
+    # Mediana pior além da tolerância e do piso, sem sobreposição entre as rodadas
+    new_value, old_value = entry['seconds'], old['seconds']
+    if not (new_value > old_value * (1 + tolerance) and new_value - old_value > min_delta):
+        return False
+    return min(entry.get('rounds') or [new_value]) > max(old.get('rounds') or [old_value])
+
+
+def compare(current, baseline, tolerance=0.25, min_delta_seconds=MIN_DELTA_SECONDS):
+    """
+    Casos presentes nos dois resultados cujo tempo ou pico de RSS piorou mais
+    que `tolerance` (fração) e mais que o ruído mínimo. O tempo compara as
+    medianas e exige que as rodadas das duas execuções não se sobreponham.
+    """
+    previous = {(r['case'], r['rows']): r for r in baseline['results']}
+    regressions = []
+    for entry in current['results']:
+        old = previous.get((entry['case'], entry['rows']))
+        if old is None:
+            continue
+        checks = [('seconds', min_delta_seconds), ('peak_rss_mb', MIN_DELTA_RSS_MB)]
+        for metric, min_delta in checks:
+            new_value, old_value = entry.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            if metric == 'seconds':
+                worse = _slower(entry, old, tolerance, min_delta)
+            else:
+                worse = new_value > old_value * (1 + tolerance) and new_value - old_value > min_delta
+            if worse:
+                regressions.append({
+                    'case': entry['case'], 'rows': entry['rows'], 'metric': metric,
+                    'baseline': old_value, 'current': new_value, 'ratio': new_value / old_value,
+                })
+        if old.get('seconds') and 'error' in entry:
+            regressions.append({'case': entry['case'], 'rows': entry['rows'], 'metric': 'error',
+                                'baseline': old['seconds'], 'current': entry['error'], 'ratio': None})
+    return regressions
+
+
+def _describe(regression):
+    metric, old, new = regression['metric'], regression['baseline'], regression['current']
+    if metric == 'seconds':
+        return f"tempo {old * 1e3:.3f} ms -> {new * 1e3:.3f} ms ({regression['ratio']:.2f}x)"
+    if metric == 'peak_rss_mb':
+        return f"pico de RSS {old:,.0f} MB -> {new:,.0f} MB ({regression['ratio']:.2f}x)"
+    return f"falhou: {new}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='segundos mínimos medidos por caso, divididos entre as rodadas')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                        help='rodadas por caso (melhor de N cada); o tempo registrado é a mediana')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='benchmark_results.json')
+    parser.add_argument('--compare', help='JSON de uma execução anterior usada como baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='piora relativa aceita antes de acusar regressão')
+    parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA_SECONDS * 1e3,
+                        help='piora absoluta mínima (ms) para acusar regressão de tempo')
+    args = parser.parse_args(argv)
+
+    current = {'environment': environment(args.seed, args.min_time, args.rounds),
+               'results': run_suite(args.sizes, min_time=args.min_time, seed=args.seed, rounds=args.rounds)}
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(current, f, indent=2)
+    print(f"\nresultados gravados em {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance, args.min_delta_ms / 1e3)
+        if not regressions:
+            print(f"sem regressões em relação a {args.compare} (tolerância {args.tolerance:.0%})")
+            return 0
+        print(f"\n{len(regressions)} regressão(ões) em relação a {args.compare}:")
+        for r in regressions:
+            print(f"  {r['case']:<36}{r['rows']:>12,}  {_describe(r)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+"""
+Geração de entradas sintéticas com as mesmas distribuições de Obesity.csv.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "Obesity.csv"
+
+
+def load_reference(path=DATA_PATH):
+    return pd.read_csv(path).drop(columns=['Obesity'])
+
+
+def make_inputs(n_rows, seed=42, reference=None):
+    """
+    Reamostra linhas de Obesity.csv (com reposição) até `n_rows` linhas.
+    """
+    if reference is None:
+        reference = load_reference()
+    rng = np.random.default_rng(seed)
+    index = rng.integers(0, len(reference), size=n_rows)
+    return reference.iloc[index].reset_index(drop=True)
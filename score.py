@@ -0,0 +1,247 @@
+"""
+Pontuação em lote de arquivos CSV grandes com o schema de Obesity.csv.
+
+Lê a entrada em blocos, distribui os blocos para um pool de processos (cada
+um com uma cópia do pipeline) e grava a saída de forma incremental, na ordem
+original, com a classe prevista e as probabilidades de cada classe (e, com
+--explain, a contribuição de cada campo para a classe prevista). A memória
+fica limitada a `--max-inflight` blocos, independente do tamanho do arquivo.
+
+Uso (a partir da raiz do repositório):
+    python score.py entrada.csv saida.csv --chunksize 100000 --workers 4
+    python score.py entrada.csv saida.parquet   # requer pyarrow
+    python score.py entrada.csv saida.csv --drift drift.json   # relatório de drift das entradas
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from shared import profiling
+from shared.artifact import load_predictor
+from shared.drift import DriftMonitor, load_baseline
+from shared.explain import by_field
+from shared.utils import COMPACT_READ_DTYPES, ObesityMap, compact_pipeline
+
+BASE_DIR = Path(__file__).resolve().parent
+MODEL_PATH = BASE_DIR / "models" / "obesity_model.joblib"
+BASELINE_PATH = BASE_DIR / "models" / "obesity_baseline.json"
+CLASS_NAMES = {code: name for name, code in ObesityMap().obesity_dict.items()}
+
+_predictor = None
+_monitor = None
+
+
+def _init_worker(model_path, engine, profile=False, baseline=None, trace_allocations=False):
+    global _predictor, _monitor
+    if profile:
+        profiling.enable(trace_allocations=trace_allocations or None)
+    if baseline is not None:
+        _monitor = DriftMonitor(baseline)
+    if engine == 'compiled':
+        _predictor = load_predictor(model_path)
+    elif engine == 'compact':
+        _predictor = compact_pipeline(joblib.load(model_path))
+    else:
+        _predictor = joblib.load(model_path)
+
+
+def explain_chunk(chunk):
+    # Contribuições por campo só para a classe prevista: custa quase o mesmo que o predict_proba
+    if hasattr(_predictor, 'steps'):
+        return by_field(_predictor.steps[-1][1].explain(_predictor[:-1].transform(chunk), predicted_only=True))
+    return by_field(_predictor.explain(chunk, predicted_only=True))
+
+
+def score_chunk(chunk, keep_columns=(), explain=False):
+    # Entradas observadas antes de predizer: um bloco rejeitado pelo preditor ainda conta no drift
+    if _monitor is not None:
+        _monitor.observe_batch(chunk)
+    explanation = explain_chunk(chunk) if explain else None
+    proba = explanation['proba'] if explain else _predictor.predict_proba(chunk)
+    classes = _predictor.steps[-1][1].model.classes_ if hasattr(_predictor, 'steps') else _predictor.forest.classes_
+    predictions = classes.take(np.argmax(proba, axis=1))
+    if _monitor is not None:
+        _monitor.observe_predictions(predictions)
+
+    out = pd.DataFrame({col: chunk[col].to_numpy() for col in keep_columns})
+    out['prediction'] = predictions
+    out['label'] = pd.Categorical.from_codes(predictions, [CLASS_NAMES[c] for c in sorted(CLASS_NAMES)])
+    for j, c in enumerate(classes):
+        out[f"proba_{CLASS_NAMES.get(c, c)}"] = proba[:, j]
+    if explain:
+        out['base_proba'] = explanation['bias']
+        for j, field in enumerate(explanation['feature_names']):
+            out[f"contrib_{field}"] = explanation['contributions'][:, j]
+    return out
+
+
+def score_and_encode(chunk, keep_columns, fmt, explain=False):
+    # A serialização em CSV roda no worker: o processo principal só grava bytes
+    try:
+        frame = score_chunk(chunk, keep_columns, explain)
+        payload = frame.to_csv(index=False, header=False) if fmt == 'csv' else frame
+        result, error = (len(frame), list(frame.columns), payload), None
+    except (ValueError, KeyError, TypeError) as e:
+        # O erro volta com o snapshot do drift, para o relatório mostrar o que havia no bloco
+        result, error = (0, None, None), str(e)
+    # Com --profile, cada bloco devolve as medições do worker para o processo principal somar
+    stages = profiling.snapshot(reset=True) if profiling.is_enabled() else None
+    # Idem para as estatísticas do monitor de drift
+    drift = _monitor.snapshot(reset=True) if _monitor is not None else None
+    return result + (stages, drift, error)
+
+
+class CsvWriter:
+    format = 'csv'
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.header = True
+
+    def write(self, columns, payload):
+        if self.header:
+            self.file.write(','.join(columns) + '\n')
+            self.header = False
+        self.file.write(payload)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    format = 'parquet'
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Saída em Parquet requer o pacote pyarrow (pip install pyarrow).")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.writer = None
+
+    def write(self, columns, frame):
+        table = self.pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_writer(path):
+    if str(path).endswith('.parquet'):
+        return ParquetWriter(path)
+    return CsvWriter(path)
+
+
+def score_file(input_path, output_path, model_path=MODEL_PATH, chunksize=100_000, workers=None,
+               max_inflight=None, engine='compiled', keep_columns=(), progress=None, profile=False,
+               explain=False, monitor=None, trace_allocations=False):
+    """
+    Pontua `input_path` em blocos e devolve (linhas, segundos). Com `profile`,
+    as medições por etapa dos workers ficam em shared.profiling.REGISTRY (bytes
+    alocados em vez do tamanho da saída com `trace_allocations`); com
+    `monitor` (DriftMonitor), as estatísticas das entradas são somadas nele.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_inflight = max_inflight or 2 * workers
+    # No modo compacto as colunas de texto já chegam como Categorical
+    dtype = COMPACT_READ_DTYPES if engine == 'compact' else None
+    reader = pd.read_csv(input_path, chunksize=chunksize, dtype=dtype)
+    writer = open_writer(output_path)
+    pending = deque()
+    rows = 0
+    start = time.perf_counter()
+
+    def drain_one():
+        nonlocal rows
+        n_rows, columns, payload, stages, drift, error = pending.popleft().result()
+        if stages:
+            profiling.merge(stages)
+        if drift:
+            monitor.merge(drift)
+        if error is not None:
+            raise ValueError(f"Scoring failed after {rows:,} rows: {error}")
+        writer.write(columns, payload)
+        rows += n_rows
+        if progress is not None:
+            progress(rows, time.perf_counter() - start)
+
+    baseline = monitor.baseline if monitor is not None else None
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(str(model_path), engine, profile, baseline, trace_allocations)) as pool:
+            for chunk in reader:
+                # Janela limitada de blocos em voo: é isso que mantém a memória constante
+                if len(pending) >= max_inflight:
+                    drain_one()
+                pending.append(pool.submit(score_and_encode, chunk, tuple(keep_columns), writer.format, explain))
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+    return rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV de entrada (schema de Obesity.csv)')
+    parser.add_argument('output', help='arquivo de saída .csv ou .parquet')
+    parser.add_argument('--model', default=str(MODEL_PATH), help='.joblib ou artefato compacto .ofc')
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-inflight', type=int, help='blocos em processamento ao mesmo tempo (padrão: 2 x workers)')
+    parser.add_argument('--engine', choices=['compiled', 'pipeline', 'compact'], default='compiled',
+                        help='compact: Pipeline do joblib no modo de tipos compactos (menos memória)')
+    parser.add_argument('--keep-columns', nargs='*', default=[], help='colunas da entrada copiadas para a saída')
+    parser.add_argument('--explain', action='store_true',
+                        help='acrescenta base_proba e contrib_<campo>: contribuição de cada campo para a classe prevista')
+    parser.add_argument('--drift', help='grava o relatório de drift das entradas contra a linha de base (.json)')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='linha de base do drift (train.train)')
+    parser.add_argument('--profile', help='grava os tempos por etapa (.json, ou .prom para o formato do Prometheus)')
+    parser.add_argument('--trace-allocations', action='store_true',
+                        help='com --profile, mede os bytes alocados por etapa (tracemalloc) em vez do tamanho da saída')
+    args = parser.parse_args(argv)
+
+    monitor = DriftMonitor(load_baseline(args.baseline)) if args.drift else None
+
+    def progress(rows, seconds):
+        print(f"\r{rows:,} linhas  {rows / seconds:,.0f} linhas/s", end='', file=sys.stderr, flush=True)
+
+    try:
+        rows, seconds = score_file(
+            args.input, args.output, model_path=args.model, chunksize=args.chunksize,
+            workers=args.workers, max_inflight=args.max_inflight, engine=args.engine,
+            keep_columns=args.keep_columns, progress=progress, profile=bool(args.profile),
+            explain=args.explain, monitor=monitor, trace_allocations=args.trace_allocations
+        )
+    finally:
+        # Mesmo quando um bloco é rejeitado, o relatório mostra os problemas das entradas vistas
+        if args.drift:
+            report = monitor.report()
+            with open(args.drift, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+    if args.profile:
+        profiling.dump(args.profile, allocations=args.trace_allocations or None)
+    print(file=sys.stderr)
+    if args.drift:
+        print(f"Drift: {', '.join(report['drifted']) or 'nenhum campo'} acima do limite -> {args.drift}", file=sys.stderr)
+    print(f"{rows:,} linhas em {seconds:.1f} s ({rows / seconds:,.0f} linhas/s) -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+"""
+Serviço HTTP de inferência, sem interface, ao lado do app Streamlit.
+
+Cada worker carrega o modelo (models/obesity_model.joblib ou o artefato
+compacto .ofc) uma única vez, recarrega quando o arquivo muda no disco
+(--reload-interval) e atende:
+    GET  /health         -> {"status": "ok"}
+    GET  /metrics        -> métricas do micro-batching (e das etapas, com --profile) deste worker
+    GET  /models         -> versões carregadas, a ativa e a avaliação em sombra (--shadow)
+    GET  /drift          -> drift das entradas atendidas por este worker contra a linha de base do treino
+    GET  /metrics/prometheus -> tempos por etapa no formato do Prometheus (com --profile)
+    POST /predict        -> um registro JSON
+    POST /explain        -> contribuição de cada campo para a classe prevista de um registro
+    POST /predict_batch  -> JSON lines (application/x-ndjson) ou CSV (text/csv)
+
+Uso (a partir da raiz do repositório):
+    python server.py --port 8000 --workers 4 --microbatch-ms 2
+"""
+import argparse
+import io
+import json
+import os
+import signal
+import socket
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from shared import artifact, profiling
+from shared.batching import MicroBatchModel
+from shared.compiled import compile_pipeline
+from shared.drift import BaselineWatcher
+from shared.registry import DEFAULT_POLL_INTERVAL, ModelRegistry
+from shared.utils import ObesityMap
+
+BASE_DIR = Path(__file__).resolve().parent
+MODEL_PATH = BASE_DIR / "models" / "obesity_model.joblib"
+BASELINE_PATH = BASE_DIR / "models" / "obesity_baseline.json"
+CLASS_NAMES = {code: name for name, code in ObesityMap().obesity_dict.items()}
+MAX_BODY = 256 * 2**20
+
+
+class PipelinePredictor:
+    """
+    Usa o Pipeline do joblib diretamente (pandas), para comparação com o
+    caminho compilado.
+    """
+
+    batcher = None
+
+    def __init__(self, pipeline, **options):
+        self.pipeline = pipeline
+        self.compiled = compile_pipeline(pipeline)
+
+    def predict_proba(self, X):
+        return self.pipeline.predict_proba(pd.DataFrame(X))
+
+    def predict_record(self, record):
+        proba = self.pipeline.predict_proba(pd.DataFrame([record]))[0]
+        classes = self.pipeline.steps[-1][1].model.classes_
+        return {
+            'prediction': classes[int(np.argmax(proba))].item(),
+            'proba': proba,
+            'indicators': self.compiled.indicators(record),
+        }
+
+    def explain_record(self, record, top=None):
+        return self.compiled.explain_record(record, top)
+
+    @property
+    def classes(self):
+        return self.pipeline.steps[-1][1].model.classes_
+
+
+class CompiledPredictor:
+    """
+    Caminho compilado; com `microbatch_ms`, os registros de requisições
+    concorrentes são agrupados numa única avaliação da floresta.
+    """
+
+    def __init__(self, compiled, microbatch_ms=0, max_batch=64):
+        self.compiled = compiled
+        self.batcher = None
+        if microbatch_ms > 0:
+            self.batcher = MicroBatchModel(self.compiled.forest, max_batch_size=max_batch, max_wait=microbatch_ms / 1000)
+
+    def predict_proba(self, X):
+        return self.compiled.predict_proba(X)
+
+    def predict_record(self, record):
+        if self.batcher is None:
+            return self.compiled.predict_record(record)
+        proba = self.batcher.predict_proba(self.compiled.encode_record(record)[np.newaxis])[0]
+        return {
+            'prediction': self.classes[int(np.argmax(proba))].item(),
+            'proba': proba,
+            'indicators': self.compiled.indicators(record),
+        }
+
+    def explain_record(self, record, top=None):
+        return self.compiled.explain_record(record, top)
+
+    @property
+    def classes(self):
+        return self.compiled.forest.classes_
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+
+ENGINES = {'compiled': CompiledPredictor, 'pipeline': PipelinePredictor}
+
+
+def load_predictor(model_path=MODEL_PATH, engine='compiled', **options):
+    if engine == 'compiled':
+        return CompiledPredictor(artifact.load_predictor(model_path), **options)
+    return PipelinePredictor(joblib.load(model_path), **options)
+
+
+def read_batch(body, content_type):
+    if content_type.startswith('text/csv'):
+        return pd.read_csv(io.BytesIO(body))
+    records = [json.loads(line) for line in body.splitlines() if line.strip()]
+    return pd.DataFrame.from_records(records)
+
+
+def write_batch(proba, classes, content_type):
+    predictions = classes.take(np.argmax(proba, axis=1))
+    if content_type.startswith('text/csv'):
+        out = pd.DataFrame(proba, columns=[f"proba_{CLASS_NAMES.get(c, c)}" for c in classes])
+        out.insert(0, 'label', [CLASS_NAMES.get(c, str(c)) for c in predictions])
+        out.insert(0, 'prediction', predictions)
+        return out.to_csv(index=False).encode('utf-8'), 'text/csv'
+    lines = [
+        json.dumps({'prediction': int(c), 'label': CLASS_NAMES.get(c, str(c)), 'proba': p.tolist()})
+        for c, p in zip(predictions, proba)
+    ]
+    return ('\n'.join(lines) + '\n').encode('utf-8'), 'application/x-ndjson'
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em escritas separadas: sem isso o Nagle soma ~40 ms
+    disable_nagle_algorithm = True
+    registry = None
+    monitor = None
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type='application/json'):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            raise ValueError(f"Request body larger than {MAX_BODY} bytes.")
+        body = self.rfile.read(length)
+        self._body_read = True
+        return body
+
+    def _record(self):
+        record = json.loads(self._body())
+        if not isinstance(record, dict):
+            raise ValueError("Request body must be a JSON object.")
+        return record
+
+    def _error(self, status, message):
+        # Com keep-alive, um corpo não lido seria interpretado como a próxima requisição
+        if not self._body_read:
+            self.close_connection = True
+        self._send(status, {'error': message})
+
+    def _drift(self):
+        return self.monitor.current() if self.monitor is not None else None
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok', 'pid': os.getpid()})
+        elif self.path == '/metrics':
+            batcher = self.registry.current()[1].batcher
+            self._send(200, {
+                'pid': os.getpid(), 'microbatch': batcher.metrics() if batcher else None,
+                'stages': profiling.snapshot() if profiling.is_enabled() else None,
+            })
+        elif self.path == '/models':
+            self._send(200, dict(self.registry.describe(), pid=os.getpid()))
+        elif self.path == '/drift':
+            monitor = self._drift()
+            if monitor is None:
+                self._send(404, {'error': "Drift monitor is disabled (no baseline)."})
+            else:
+                self._send(200, dict(monitor.report(), pid=os.getpid()))
+        elif self.path == '/metrics/prometheus':
+            self._send(200, profiling.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        self._body_read = False
+        try:
+            if self.path == '/predict':
+                record = self._record()
+                # A entrada é observada antes: registros que o preditor rejeita contam como problemas
+                monitor = self._drift()
+                if monitor is not None:
+                    monitor.observe(record)
+                result = self.registry.predict_record(record)
+                prediction = result['prediction']
+                if monitor is not None:
+                    monitor.observe_predictions([prediction])
+                self._send(200, {
+                    'prediction': prediction,
+                    'label': CLASS_NAMES.get(prediction, str(prediction)),
+                    'proba': result['proba'].tolist(),
+                    'indicators': result['indicators'],
+                    'model_version': result['model_version'],
+                })
+            elif self.path == '/explain':
+                result = self.registry.explain_record(self._record())
+                prediction = result['prediction']
+                self._send(200, dict(result, label=CLASS_NAMES.get(prediction, str(prediction))))
+            elif self.path == '/predict_batch':
+                content_type = self.headers.get('Content-Type', 'application/x-ndjson')
+                X = read_batch(self._body(), content_type)
+                monitor = self._drift()
+                if monitor is not None:
+                    monitor.observe_batch(X)
+                # Uma única leitura da versão ativa: probabilidades e classes do mesmo modelo
+                with self.registry.lease() as (version, predictor):
+                    proba = predictor.predict_proba(X)
+                    classes = predictor.classes
+                if monitor is not None:
+                    monitor.observe_predictions(classes.take(np.argmax(proba, axis=1)))
+                body, out_type = write_batch(proba, classes, content_type)
+                self._send(200, body, out_type)
+            else:
+                self._error(404, f"Unknown path {self.path}")
+        except (ValueError, KeyError, TypeError) as e:
+            self._error(400, str(e))
+        except Exception as e:
+            self._error(500, str(e))
+
+
+def make_server(sock, registry, threaded=True, verbose=False, monitor=None):
+    handler = type('Handler', (InferenceHandler,), {'registry': registry, 'monitor': monitor})
+    server_class = ThreadingHTTPServer if threaded else HTTPServer
+    server = server_class(sock.getsockname()[:2], handler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.verbose = verbose
+    return server
+
+
+def serve_worker(sock, args):
+    if args.profile or args.trace_allocations:
+        profiling.enable(trace_allocations=args.trace_allocations or None)
+    # Cada worker carrega o modelo uma única vez, depois do fork
+    options = {}
+    if args.engine == 'compiled':
+        options = {'microbatch_ms': args.microbatch_ms, 'max_batch': args.max_batch}
+    registry = ModelRegistry(lambda: load_predictor(args.model, args.engine, **options), args.model,
+                             poll_interval=args.reload_interval)
+    registry.load()
+    registry.start()
+    if args.shadow:
+        registry.set_shadow(load_predictor(args.shadow, args.engine), version=args.shadow, log_path=args.shadow_log)
+    # Segue o arquivo da linha de base: um modelo novo traz uma linha de base nova
+    monitor = BaselineWatcher(args.baseline) if args.baseline else None
+    server = make_server(sock, registry, verbose=args.verbose, monitor=monitor)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--model', default=str(MODEL_PATH), help='.joblib ou artefato compacto .ofc')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='compiled')
+    parser.add_argument('--microbatch-ms', type=float, default=0.0,
+                        help='janela de micro-batching em ms (0 desativa)')
+    parser.add_argument('--max-batch', type=int, default=64, help='tamanho máximo do micro-lote')
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='segundos entre verificações do arquivo do modelo (0 desativa a recarga)')
+    parser.add_argument('--shadow', help='modelo candidato avaliado em sombra nas requisições de /predict')
+    parser.add_argument('--shadow-log', help='arquivo JSON lines com as discordâncias do candidato')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH),
+                        help='linha de base do monitor de drift (GET /drift); vazio desativa')
+    parser.add_argument('--profile', action='store_true', help='mede o tempo de cada etapa (/metrics/prometheus)')
+    parser.add_argument('--trace-allocations', action='store_true',
+                        help='com o perfil, mede os bytes alocados por etapa (tracemalloc) em vez do tamanho da saída')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    print(f"Servindo em http://{args.host}:{sock.getsockname()[1]} com {args.workers} worker(s)", flush=True)
+
+    if args.workers <= 1 or not hasattr(os, 'fork'):
+        serve_worker(sock, args)
+        return
+
+    # Pre-fork: os workers compartilham o socket de escuta e o kernel distribui as conexões
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve_worker(sock, args)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(*_):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+if __name__ == '__main__':
+    main()
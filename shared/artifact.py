@@ -0,0 +1,141 @@
+"""
+Artefato compacto do modelo, carregado sem unpickling.
+
+A floresta treinada é gravada como arrays NumPy planos (feature, threshold,
+filhos e valores das folhas de todas as árvores, concatenados), junto com o
+min/scale do MinMaxScalerFeatures e a ordem das colunas. O arquivo é mapeado
+em memória: vários processos que carregam o mesmo artefato compartilham as
+páginas dos arrays sem cópia. Este módulo depende apenas do NumPy.
+
+Layout do arquivo (versão 1):
+    MAGIC (8 bytes) | versão (uint32) | tamanho do cabeçalho (uint32)
+    cabeçalho JSON | arrays alinhados em 64 bytes
+"""
+import json
+import mmap
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from shared.compiled import CompiledPipeline
+from shared.forest import FlatForest, forest_arrays
+
+MAGIC = b'OFCMODEL'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREFIX = struct.Struct('<8sII')
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_container(path, header, arrays, magic=MAGIC):
+    """
+    Grava `header` (JSON) e `arrays` no layout do artefato, com troca atômica.
+    O cabeçalho gravado ganha a descrição de cada array em header['arrays'].
+    """
+    header = dict(header, arrays={})
+    # Offsets relativos ao início da área de dados; o cabeçalho é calculado primeiro
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(_PREFIX.size + len(header_bytes))
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREFIX.pack(magic, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+    # Troca atômica: leitores nunca veem um arquivo pela metade
+    tmp_path.replace(path)
+    return path
+
+
+def read_container(path, magic=MAGIC, use_mmap=True, kind='model artifact'):
+    """
+    Lê um arquivo gravado por `write_container`: devolve (cabeçalho, arrays,
+    buffer). Com `use_mmap`, os arrays são views do arquivo mapeado.
+    """
+    with open(path, 'rb') as f:
+        if use_mmap:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = f.read()
+    file_magic, version, header_len = _PREFIX.unpack_from(buffer, 0)
+    if file_magic != magic:
+        raise ValueError(f"{path} is not an ObesityFastCheck {kind}.")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version {version} (max {FORMAT_VERSION}).")
+    header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + header_len]))
+    data_start = _align(_PREFIX.size + header_len)
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec['offset'])
+        arrays[name] = array.reshape(spec['shape'])
+    return header, arrays, buffer
+
+
+def export_artifact(pipeline, path, metadata=None):
+    """
+    Grava o Pipeline treinado (shared.utils) no formato compacto em `path`.
+    """
+    compiled = CompiledPipeline.from_pipeline(pipeline)
+    forest = compiled.forest
+    header = {
+        'format_version': FORMAT_VERSION,
+        'feature_names': compiled.feature_names,
+        'scaling': {col: list(params) for col, params in compiled.scaling.items()},
+        'n_trees': len(forest.estimators_),
+        'max_depth': max(e.tree_.max_depth for e in forest.estimators_),
+        'metadata': metadata or {},
+    }
+    return write_container(path, header, forest_arrays(forest))
+
+
+class ModelArtifact:
+    def __init__(self, header, arrays, buffer=None):
+        self.header = header
+        self.arrays = arrays
+        self._buffer = buffer
+
+    @property
+    def metadata(self):
+        return self.header.get('metadata', {})
+
+    def forest(self, **kwargs):
+        return FlatForest(self.arrays, self.header['max_depth'], **kwargs)
+
+    def predictor(self, **kwargs):
+        """
+        CompiledPipeline com a floresta do artefato (FlatForest): mesma API
+        (predict, predict_proba, predict_record) e mesmas predições do Pipeline.
+        """
+        scaling = {col: tuple(params) for col, params in self.header['scaling'].items()}
+        return CompiledPipeline(self.header['feature_names'], scaling, forest=self.forest(), **kwargs)
+
+
+def load_artifact(path, use_mmap=True):
+    header, arrays, buffer = read_container(path, MAGIC, use_mmap)
+    return ModelArtifact(header, arrays, buffer)
+
+
+def load_predictor(path, **kwargs):
+    """
+    Carrega um preditor a partir do artefato compacto ou, para arquivos
+    .joblib, a partir do Pipeline (o que exige sklearn e pandas).
+    """
+    if str(path).endswith('.joblib'):
+        import joblib
+
+        return CompiledPipeline.from_pipeline(joblib.load(path), **kwargs)
+    return load_artifact(path).predictor(**kwargs)
@@ -0,0 +1,193 @@
+"""
+Micro-batching de predições concorrentes.
+
+Chamar predict_proba numa matriz de N linhas custa bem menos que N chamadas
+de uma linha: os pedidos que chegam dentro de uma janela curta (ou até
+`max_batch_size`) são empilhados, avaliados numa única chamada vetorizada e
+os resultados voltam para o Future de cada chamador.
+
+Cada linha é validada no `submit` (uma linha malformada falha só para quem a
+enviou). Se a chamada do lote falhar, as linhas são refeitas uma a uma, para
+que o erro atinja apenas a linha culpada; um resultado com outro número de
+linhas falha os Futures do lote em vez de deixá-los sem resposta.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from shared.compiled import forest_proba
+
+_STOP = object()
+# Limite de espera de cada chamador por um resultado
+DEFAULT_TIMEOUT = 30.0
+
+
+class MicroBatcher:
+    """
+    Agrupa linhas enviadas por `submit` e chama `fn(matriz)` uma vez por lote.
+
+    `fn` recebe um array (n, n_features) e devolve um array com n linhas.
+    Sem `n_features`, a largura da primeira linha vale para as seguintes.
+    """
+
+    def __init__(self, fn, max_batch_size=64, max_wait=0.002, dtype=np.float32, n_features=None):
+        self.fn = fn
+        self.n_features = n_features
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.dtype = dtype
+        self.batches = 0
+        self.rows = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        row = np.asarray(row, dtype=self.dtype)
+        if row.ndim != 1:
+            raise ValueError(f"Expected a 1-D row, got shape {row.shape}.")
+        future = Future()
+        with self._lock:
+            if self.n_features is None:
+                self.n_features = len(row)
+            if len(row) != self.n_features:
+                raise ValueError(f"Expected {self.n_features} features, got {len(row)}.")
+            # Depois do close nenhuma thread atenderia o pedido: falha já, em vez de esperar para sempre
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed.")
+            self._queue.put((row, future))
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = self._collect(item)
+            rows, futures = zip(*batch)
+            try:
+                results = self.fn(np.stack(rows))
+            except Exception as e:
+                if len(batch) == 1:
+                    futures[0].set_exception(e)
+                else:
+                    # Refaz linha a linha: o erro fica só com o chamador da linha que o causou
+                    for row, future in batch:
+                        self._run_one(row, future)
+            else:
+                self._deliver(futures, results)
+            self._record(len(batch))
+
+    def _run_one(self, row, future):
+        try:
+            results = self.fn(row[None, :])
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            self._deliver([future], results)
+
+    @staticmethod
+    def _deliver(futures, results):
+        if len(results) != len(futures):
+            # Sem uma linha por pedido não dá para saber qual resultado é de quem: falha todos
+            error = RuntimeError(f"Batch function returned {len(results)} rows for {len(futures)}.")
+            for future in futures:
+                future.set_exception(error)
+            return
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+    def _record(self, size):
+        # Histograma em potências de 2: 1, 2, 4, 8, ...
+        bucket = 1 << (size - 1).bit_length()
+        with self._lock:
+            self.batches += 1
+            self.rows += size
+            self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+                'batch_size_histogram': {f"<={k}": v for k, v in sorted(self.batch_sizes.items())},
+            }
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        # Pedidos que ficaram na fila não serão atendidos
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                item[1].set_exception(RuntimeError("MicroBatcher is closed."))
+
+
+class MicroBatchModel:
+    """
+    Fachada com a interface de shared.utils.Model (predict/predict_proba) que
+    envia cada linha ao MicroBatcher. Recebe features já transformadas.
+    """
+
+    def __init__(self, model, max_batch_size=64, max_wait=0.002, timeout=DEFAULT_TIMEOUT):
+        self.model = model
+        self.timeout = timeout
+        forest = getattr(model, 'model', model)
+        self.classes_ = forest.classes_
+        if hasattr(forest, 'estimators_'):
+            def fn(X):
+                return forest_proba(forest, X)
+        else:
+            fn = model.predict_proba
+        self.batcher = MicroBatcher(fn, max_batch_size=max_batch_size, max_wait=max_wait,
+                                    n_features=getattr(forest, 'n_features_in_', None))
+
+    def predict_proba(self, X):
+        rows = np.asarray(X, dtype=np.float32)
+        if len(rows) == 0:
+            return np.empty((0, len(self.classes_)))
+        futures = [self.batcher.submit(row) for row in rows]
+        return np.array([future.result(timeout=self.timeout) for future in futures])
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        return self.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+    def metrics(self):
+        return self.batcher.metrics()
+
+    def close(self):
+        self.batcher.close()
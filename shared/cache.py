@@ -0,0 +1,157 @@
+"""
+Cache de predições por entrada exata.
+
+Quase todas as entradas do app são discretas, então perfis repetidos são
+comuns: um acerto no cache evita as transformações e a travessia da floresta.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def file_signature(path):
+    """
+    Assinatura (mtime, tamanho, inode) de um arquivo; None se ele não existir.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def canonical_key(record, fields=None):
+    """
+    Chave canônica de um registro: campos ordenados, números normalizados
+    para float (2 e 2.0 são a mesma entrada) e textos mantidos como estão.
+    """
+    if fields is None:
+        fields = record.keys()
+    key = []
+    for name in sorted(fields):
+        value = record[name]
+        if isinstance(value, str):
+            key.append((name, value))
+        else:
+            key.append((name, float(value)))
+    return tuple(key)
+
+
+class PredictionCache:
+    """
+    Cache LRU com TTL, invalidado automaticamente quando `watch_path` muda
+    (ou quando `source()` devolve outro valor, ex.: a versão ativa de um
+    ModelRegistry).
+
+    Os contadores `hits`, `misses`, `evictions`, `expirations` e
+    `invalidations` ficam disponíveis em `stats()`.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600.0, watch_path=None, fields=None, clock=time.monotonic, source=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.watch_path = watch_path
+        if source is None and watch_path is not None:
+            source = lambda: file_signature(watch_path)
+        self.source = source
+        self.fields = fields
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = source() if source is not None else None
+
+    def _check_source(self):
+        if self.source is None:
+            return
+        signature = self.source()
+        if signature != self._signature:
+            self._signature = signature
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get(self, record):
+        key = canonical_key(record, self.fields)
+        with self._lock:
+            self._check_source()
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+        return None
+
+    def put(self, record, value, generation=None):
+        key = canonical_key(record, self.fields)
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            # Um valor calculado antes de uma invalidação não volta para o cache
+            if generation is not None and generation != self.invalidations:
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, record, compute):
+        value = self.get(record)
+        if value is None:
+            generation = self.invalidations
+            value = compute(record)
+            self.put(record, value, generation)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class CachedPredictor:
+    """
+    Envolve um preditor com `predict_record` (ex.: CompiledPipeline) e guarda
+    a classe e as probabilidades de cada registro já visto.
+    """
+
+    def __init__(self, predictor, cache):
+        self.predictor = predictor
+        self.cache = cache
+
+    def _compute(self, record):
+        result = self.predictor.predict_record(record)
+        # O resultado é compartilhado entre chamadas: protege o array contra escrita
+        if result.get('proba') is not None:
+            result['proba'].flags.writeable = False
+        return result
+
+    def predict_record(self, record):
+        # Cópia rasa por chamada: quem altera o resultado (ou os indicadores) não corrompe o cache
+        result = dict(self.cache.get_or_compute(record, self._compute))
+        if result.get('indicators') is not None:
+            result['indicators'] = dict(result['indicators'])
+        return result
+
+    def predict(self, record):
+        return self.predict_record(record)['prediction']
+
+    def predict_proba(self, record):
+        return self.predict_record(record)['proba']
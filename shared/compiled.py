@@ -0,0 +1,382 @@
+"""
+Caminho compilado do pré-processamento de shared.utils.
+
+Reproduz DropFeatures -> FeatureEngineering -> TrasformNumeric ->
+MinMaxScalerFeatures -> DropNonNumeric -> LifestyleScore em uma única
+passada vetorizada sobre arrays de colunas, gerando exatamente a mesma
+matriz de features que o Pipeline salvo em models/obesity_model.joblib.
+"""
+import sys
+import threading
+
+import numpy as np
+
+from shared.forest import FlatForest
+from shared.profiling import instrument
+
+BOOL_COLS = ['family_history', 'FAVC', 'SMOKE', 'SCC']
+RAW_NUMERIC = ['Height', 'Weight', 'FCVC', 'NCP', 'CH2O', 'FAF', 'TUE']
+DUMMY_SOURCES = {'TransportType': 'MTRANS', 'CALC': 'CALC', 'CAEC': 'CAEC'}
+TRANSPORT_TYPE = {
+    'Automobile': 'sedentary', 'Motorbike': 'sedentary',
+    'Bike': 'active', 'Walking': 'active'
+}
+SUPPORTED_STEPS = {
+    'DropFeatures', 'FeatureEngineering', 'TrasformNumeric',
+    'MinMaxScalerFeatures', 'DropNonNumeric', 'LifestyleScore'
+}
+DEFAULT_CHUNK_SIZE = 65536
+INDICATORS = ['IMC', 'HealthyMealRatio', 'ActivityBalance', 'LifestyleScore']
+
+
+def _column_names(X):
+    if hasattr(X, 'columns'):
+        return set(X.columns)
+    names = getattr(getattr(X, 'dtype', None), 'names', None)
+    if names:
+        return set(names)
+    return set(X.keys())
+
+
+def _factorize(values):
+    # Usa o hash do pandas quando ele já foi importado (entrada DataFrame);
+    # caso contrário, evita a importação e usa np.unique
+    pd = sys.modules.get('pandas')
+    if pd is not None:
+        codes, uniques = pd.factorize(values)
+        if (codes < 0).any():
+            raise ValueError("Missing values in categorical column.")
+        return codes, list(uniques)
+    uniques, codes = np.unique(values, return_inverse=True)
+    return codes, uniques.tolist()
+
+
+def _encode(values, mapping, name, default=None):
+    """
+    Converte uma coluna categórica em códigos inteiros segundo `mapping`.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        return values
+    codes, uniques = _factorize(values)
+    table = np.empty(len(uniques), dtype=np.int8)
+    for i, value in enumerate(uniques):
+        if value in mapping:
+            table[i] = mapping[value]
+        elif default is not None:
+            table[i] = default
+        else:
+            raise ValueError(f"Unexpected value {value!r} in column '{name}'")
+    return table[codes]
+
+
+def _lookup(value, mapping, name, default=None):
+    if isinstance(value, (int, float, np.number)):
+        return value
+    if value in mapping:
+        return mapping[value]
+    if default is not None:
+        return default
+    raise ValueError(f"Unexpected value {value!r} in column '{name}'")
+
+
+def forest_proba(forest, X):
+    """
+    Média das probabilidades das árvores, como RandomForestClassifier.predict_proba,
+    mas sem validação da entrada nem despacho via joblib. `X` deve ser float32.
+    Florestas que não são do sklearn (ex.: ArtifactForest) usam o próprio predict_proba.
+    """
+    if not hasattr(forest, 'estimators_'):
+        return forest.predict_proba(X)
+    n_classes = len(forest.classes_)
+    proba = np.zeros((X.shape[0], n_classes), dtype=np.float64)
+    for estimator in forest.estimators_:
+        proba += estimator.tree_.predict(X)[:, :n_classes]
+    proba /= len(forest.estimators_)
+    return proba
+
+
+class CompiledPipeline:
+    """
+    Versão fundida e vetorizada do Pipeline de shared.utils.
+
+    Aceita DataFrame, array estruturado (record array) ou dict de colunas e
+    processa as linhas em blocos de `chunk_size`, sem cópias intermediárias.
+    """
+
+    def __init__(self, feature_names, scaling, forest=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.feature_names = list(feature_names)
+        self.scaling = dict(scaling)
+        self.forest = forest
+        self.chunk_size = chunk_size
+        self.categories = {}
+        self._plan = [self._compile_feature(name) for name in self.feature_names]
+        self.required_columns = self._required_columns()
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, pipeline, **kwargs):
+        scaling = {}
+        for name, step in pipeline.steps[:-1]:
+            step_type = type(step).__name__
+            if step_type not in SUPPORTED_STEPS:
+                raise ValueError(f"Cannot compile pipeline step '{name}' ({step_type}).")
+            if step_type == 'MinMaxScalerFeatures':
+                scaler = step.scaler
+                scaling = {
+                    col: (float(scale), float(offset))
+                    for col, scale, offset in zip(step.min_max_col, scaler.scale_, scaler.min_)
+                }
+        model = pipeline.steps[-1][1]
+        forest = getattr(model, 'model', model)
+        return cls(forest.feature_names_in_, scaling, forest=forest, **kwargs)
+
+    def _compile_feature(self, name):
+        if name in RAW_NUMERIC or name in ('IMC', 'HealthyMealRatio', 'ActivityBalance', 'LifestyleScore'):
+            return name, None
+        if name in BOOL_COLS or name == 'Gender':
+            return name, None
+        prefix, _, value = name.partition('_')
+        if prefix in DUMMY_SOURCES and value:
+            self.categories.setdefault(prefix, []).append(value)
+            return prefix, len(self.categories[prefix]) - 1
+        raise ValueError(f"Cannot compile feature '{name}'.")
+
+    def _required_columns(self):
+        required = set()
+        for name, index in self._plan:
+            if index is not None:
+                required.add(DUMMY_SOURCES[name])
+            elif name == 'IMC':
+                required.update(['Height', 'Weight'])
+            elif name == 'HealthyMealRatio':
+                required.update(['FCVC', 'NCP'])
+            elif name == 'ActivityBalance':
+                required.update(['FAF', 'TUE'])
+            elif name == 'LifestyleScore':
+                required.update(BOOL_COLS)
+            else:
+                required.add(name)
+        return required
+
+    def _prepare(self, X):
+        missing = self.required_columns - _column_names(X)
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+
+        columns = {}
+        for name in self.required_columns:
+            values = np.asarray(X[name])
+            if name in BOOL_COLS:
+                values = _encode(values, {'no': 0, 'yes': 1}, name)
+            elif name == 'Gender':
+                values = _encode(values, {'Female': 0, 'Male': 1}, name)
+            columns[name] = values
+
+        for prefix, categories in self.categories.items():
+            source = DUMMY_SOURCES[prefix]
+            if prefix == 'TransportType':
+                mapping = {
+                    mtrans: categories.index(kind)
+                    for mtrans, kind in TRANSPORT_TYPE.items() if kind in categories
+                }
+                default = categories.index('neutral')
+            else:
+                mapping = {value: i for i, value in enumerate(categories)}
+                default = None
+            columns[prefix] = _encode(columns[source], mapping, source, default)
+        return columns
+
+    def _fill(self, columns, start, stop, out):
+        block = {}
+
+        def get(name):
+            if name not in block:
+                block[name] = np.asarray(columns[name][start:stop], dtype=np.float64)
+            return block[name]
+
+        for j, (name, index) in enumerate(self._plan):
+            if index is not None:
+                values = columns[name][start:stop] == index
+            elif name == 'IMC':
+                values = get('Weight') / (get('Height') ** 2)
+            elif name == 'HealthyMealRatio':
+                values = get('FCVC') / get('NCP')
+            elif name == 'ActivityBalance':
+                values = get('FAF') - get('TUE')
+            elif name == 'LifestyleScore':
+                values = (1 - get('SMOKE')) + get('SCC') + (1 - get('FAVC')) + (1 - get('family_history'))
+            else:
+                values = get(name)
+
+            if name in self.scaling:
+                scale, offset = self.scaling[name]
+                values = values * scale
+                values += offset
+            out[:, j] = values
+        return out
+
+    def _blocks(self, n):
+        for start in range(0, n, self.chunk_size):
+            yield start, min(start + self.chunk_size, n)
+
+    @instrument()
+    def transform(self, X, dtype=np.float64):
+        columns = self._prepare(X)
+        n = len(next(iter(columns.values())))
+        out = np.empty((n, len(self.feature_names)), dtype=dtype, order='F')
+        for start, stop in self._blocks(n):
+            self._fill(columns, start, stop, out[start:stop])
+        return out
+
+    @instrument()
+    def predict_proba(self, X):
+        self._check_forest()
+        columns = self._prepare(X)
+        n = len(next(iter(columns.values())))
+        proba = np.empty((n, len(self.forest.classes_)), dtype=np.float64)
+        # O RandomForest converte a entrada para float32; preenchemos direto nesse dtype
+        buffer = np.empty((min(self.chunk_size, n), len(self.feature_names)), dtype=np.float32)
+        for start, stop in self._blocks(n):
+            block = self._fill(columns, start, stop, buffer[:stop - start])
+            proba[start:stop] = forest_proba(self.forest, block)
+        return proba
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        return self.forest.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+    def _check_forest(self):
+        if self.forest is None:
+            raise ValueError("CompiledPipeline has no model to predict with.")
+
+    def _flat_forest(self):
+        # Floresta do joblib (sklearn) convertida uma vez; a do artefato já é um FlatForest
+        if isinstance(self.forest, FlatForest):
+            return self.forest
+        if getattr(self, '_flat', None) is None:
+            self._check_forest()
+            self._flat = FlatForest.from_sklearn(self.forest)
+        return self._flat
+
+    def explain(self, X, predicted_only=False):
+        """
+        Contribuição de cada feature do modelo para as probabilidades de cada
+        linha da entrada bruta (ver FlatForest.explain).
+        """
+        result = self._flat_forest().explain(self.transform(X, dtype=np.float32), predicted_only)
+        result['feature_names'] = self.feature_names
+        result['classes'] = self.forest.classes_
+        result['prediction'] = self.forest.classes_.take(result['proba'].argmax(axis=1), axis=0)
+        return result
+
+    def explain_record(self, record, top=None):
+        """
+        Por que um registro recebeu a classe prevista: a probabilidade média
+        da classe na floresta ('base') e a contribuição de cada campo de
+        entrada, em ordem de importância. base + soma das contribuições = probabilidade prevista.
+        """
+        from shared.explain import by_field, top_contributions
+
+        x = self.encode_record(record)[np.newaxis]
+        result = self._flat_forest().explain(x, predicted_only=True)
+        result['feature_names'] = self.feature_names
+        result = by_field(result)
+        proba = result['proba'][0]
+        return {
+            'prediction': self.forest.classes_[int(np.argmax(proba))].item(),
+            'probability': float(proba.max()),
+            'base': float(result['bias'][0]),
+            'contributions': top_contributions(result['feature_names'], result['contributions'][0], top),
+        }
+
+    def indicators(self, record):
+        """
+        Indicadores derivados (sem escala) exibidos no app e enviados à IA.
+        """
+        ncp = record['NCP']
+        return {
+            'IMC': record['Weight'] / (record['Height'] ** 2),
+            'HealthyMealRatio': record['FCVC'] / ncp if ncp > 0 else 0,
+            'ActivityBalance': record['FAF'] - record['TUE'],
+            'LifestyleScore': (
+                (1 - _lookup(record['SMOKE'], {'no': 0, 'yes': 1}, 'SMOKE')) +
+                _lookup(record['SCC'], {'no': 0, 'yes': 1}, 'SCC') +
+                (1 - _lookup(record['FAVC'], {'no': 0, 'yes': 1}, 'FAVC')) +
+                (1 - _lookup(record['family_history'], {'no': 0, 'yes': 1}, 'family_history'))
+            ),
+        }
+
+    def encode_record(self, record, out=None):
+        """
+        Codifica um único registro (dict) direto no vetor de features, na ordem
+        de colunas do modelo, sem passar pelo pandas.
+        """
+        missing = self.required_columns - record.keys()
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+        if out is None:
+            out = np.empty(len(self.feature_names), dtype=np.float32)
+
+        values = {}
+        for name in self.required_columns:
+            value = record[name]
+            if name in BOOL_COLS:
+                value = _lookup(value, {'no': 0, 'yes': 1}, name)
+            elif name == 'Gender':
+                value = _lookup(value, {'Female': 0, 'Male': 1}, name)
+            elif name not in DUMMY_SOURCES.values():
+                value = float(value)
+            values[name] = value
+        for prefix, categories in self.categories.items():
+            source = DUMMY_SOURCES[prefix]
+            value = record[source]
+            if prefix == 'TransportType':
+                value = TRANSPORT_TYPE.get(value, 'neutral')
+            if value not in categories:
+                raise ValueError(f"Unexpected value {value!r} in column '{source}'")
+            values[prefix] = categories.index(value)
+
+        for j, (name, index) in enumerate(self._plan):
+            if index is not None:
+                value = float(values[name] == index)
+            elif name == 'IMC':
+                # h * h é o mesmo quadrado (corretamente arredondado) que o pandas calcula
+                value = values['Weight'] / (values['Height'] * values['Height'])
+            elif name == 'HealthyMealRatio':
+                value = values['FCVC'] / values['NCP'] if values['NCP'] else float('inf')
+            elif name == 'ActivityBalance':
+                value = values['FAF'] - values['TUE']
+            elif name == 'LifestyleScore':
+                value = (1 - values['SMOKE']) + values['SCC'] + (1 - values['FAVC']) + (1 - values['family_history'])
+            else:
+                value = values[name]
+
+            if name in self.scaling:
+                scale, offset = self.scaling[name]
+                value = value * scale + offset
+            out[j] = value
+        return out
+
+    @instrument()
+    def predict_record(self, record):
+        """
+        Predição de baixa latência para um único registro: codifica o dict num
+        buffer pré-alocado (por thread), percorre a floresta uma única vez e
+        devolve a classe, as probabilidades e os indicadores derivados.
+        """
+        self._check_forest()
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, len(self.feature_names)), dtype=np.float32)
+        self.encode_record(record, out=buffer[0])
+        proba = forest_proba(self.forest, buffer)[0]
+        return {
+            'prediction': self.forest.classes_[int(np.argmax(proba))].item(),
+            'proba': proba,
+            'indicators': self.indicators(record),
+        }
+
+
+def compile_pipeline(pipeline, **kwargs):
+    return CompiledPipeline.from_pipeline(pipeline, **kwargs)
@@ -0,0 +1,73 @@
+"""
+Armazenamento local, só de acréscimo, de registros rotulados (schema de Obesity.csv).
+
+Os registros novos são anexados ao fim de um CSV; quem consome guarda o
+offset em bytes até onde já leu e, na próxima vez, lê só o que veio depois.
+Assim o custo de leitura acompanha o volume novo, não o histórico inteiro.
+"""
+import io
+import os
+import threading
+
+import pandas as pd
+
+
+class AppendOnlyStore:
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self._lock = threading.Lock()
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def append(self, rows):
+        """
+        Anexa um DataFrame (ou lista de dicts). Cada chamada vira uma única
+        escrita em modo append, seguida de fsync. Devolve o novo tamanho em bytes.
+        """
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame.from_records(rows)
+        if frame.empty:
+            return self.size()
+        with self._lock:
+            header = self._header()
+            if header is not None and header != list(frame.columns):
+                frame = frame.reindex(columns=header)
+            payload = frame.to_csv(index=False, header=header is None).encode('utf-8')
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'ab') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+                return f.tell()
+
+    def _header(self):
+        try:
+            with open(self.path, 'rb') as f:
+                line = f.readline()
+        except FileNotFoundError:
+            return None
+        return line.decode('utf-8').rstrip('\r\n').split(',') if line.endswith(b'\n') else None
+
+    def read_since(self, offset=0):
+        """
+        Linhas completas gravadas a partir de `offset`. Devolve (DataFrame, novo offset);
+        uma linha ainda sendo escrita fica para a próxima leitura.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return pd.DataFrame(), offset
+        with f:
+            header = f.readline()
+            if not header.endswith(b'\n'):
+                return pd.DataFrame(), offset
+            start = max(offset, len(header))
+            f.seek(start)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return pd.DataFrame(columns=header.decode('utf-8').rstrip('\r\n').split(',')), start
+        return pd.read_csv(io.BytesIO(header + data[:end])), start + end
@@ -0,0 +1,471 @@
+"""
+Monitor de drift e de validação das entradas pontuadas.
+
+Para cada campo de entrada do modelo, cada indicador derivado (IMC,
+HealthyMealRatio, ActivityBalance, LifestyleScore) e a classe prevista, o
+DriftMonitor mantém estatísticas em memória constante: contagem, média e
+variância (Welford), mínimo e máximo, histograma nas faixas da linha de base e
+frequência de cada categoria. O relatório compara com a linha de base gravada
+no treino (PSI e KS sobre as faixas) e conta os problemas de validação:
+campo ausente, valor inválido, fora do intervalo visto no treino e categoria
+desconhecida.
+
+`observe(record)` é o caminho por predição (Python puro, sem pandas);
+`observe_batch(X)` atualiza com um bloco inteiro (pontuação em lote).
+Snapshots de vários processos se somam com `merge`, como em shared.profiling.
+"""
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+from shared.cache import file_signature
+from shared.compiled import BOOL_COLS, INDICATORS, RAW_NUMERIC
+
+CATEGORICAL_FIELDS = ['Gender'] + BOOL_COLS + ['CAEC', 'CALC', 'MTRANS']
+NUMERIC_FIELDS = RAW_NUMERIC + INDICATORS
+PREDICTION = 'prediction'
+DEFAULT_BINS = 10
+# Limites usuais do PSI: abaixo de 0.1 estável, acima de 0.25 mudança relevante
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+MIN_COUNT = 100
+_EPSILON = 1e-4
+_YES_NO = {'no': 0, 'yes': 1}
+
+
+def _number(value):
+    # None para ausente, NaN para inválido (texto, infinito)
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    if math.isnan(value):
+        return None
+    return value if math.isfinite(value) else math.nan
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return _YES_NO.get(value)
+    return _number(value)
+
+
+def _derived(values, flags):
+    # Indicadores sem escala, como em FeatureEngineering e LifestyleScore
+    height, weight, fcvc, ncp = values['Height'], values['Weight'], values['FCVC'], values['NCP']
+    faf, tue = values['FAF'], values['TUE']
+    return {
+        'IMC': weight / (height * height) if height and weight is not None else None,
+        'HealthyMealRatio': fcvc / ncp if ncp and fcvc is not None else None,
+        'ActivityBalance': faf - tue if faf is not None and tue is not None else None,
+        'LifestyleScore': (
+            (1 - flags['SMOKE']) + flags['SCC'] + (1 - flags['FAVC']) + (1 - flags['family_history'])
+            if all(flags[name] is not None for name in BOOL_COLS) else None
+        ),
+    }
+
+
+def psi(expected, actual):
+    """
+    Population Stability Index entre duas contagens nas mesmas faixas.
+    """
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return None
+    expected = np.maximum(expected / expected.sum(), _EPSILON)
+    actual = np.maximum(actual / actual.sum(), _EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(expected, actual):
+    """
+    Estatística de Kolmogorov-Smirnov calculada nas faixas (maior diferença
+    entre as distribuições acumuladas nas bordas das faixas).
+    """
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return None
+    return float(np.abs(np.cumsum(expected) / expected.sum() - np.cumsum(actual) / actual.sum()).max())
+
+
+def _status(score, count):
+    if score is None or count < MIN_COUNT:
+        return 'insufficient_data'
+    if score >= PSI_DRIFT:
+        return 'drift'
+    return 'warning' if score >= PSI_WARNING else 'ok'
+
+
+class NumericStats:
+    """
+    Contagem, média e variância (Welford), mínimo, máximo e histograma com
+    faixas fixas: (-inf, e0], (e0, e1], ..., (ek, inf).
+    """
+
+    def __init__(self, edges):
+        self.edges = [float(e) for e in edges]
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value):
+        self.counts[bisect_left(self.edges, value)] += 1
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def observe_many(self, values):
+        if not len(values):
+            return
+        bins = np.searchsorted(self.edges, values, side='left')
+        self.counts = [a + int(b) for a, b in zip(self.counts, np.bincount(bins, minlength=len(self.counts)))]
+        mean = float(values.mean())
+        self._combine(len(values), mean, float(((values - mean) ** 2).sum()), float(values.min()), float(values.max()))
+
+    def _combine(self, count, mean, m2, low, high):
+        # Fórmula de Chan para juntar médias e variâncias de dois grupos
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {
+            'edges': self.edges, 'counts': list(self.counts), 'count': self.count, 'mean': self.mean,
+            'm2': self.m2, 'min': self.min if self.count else None, 'max': self.max if self.count else None,
+        }
+
+    def merge(self, data):
+        if list(data['edges']) != self.edges:
+            raise ValueError("Cannot merge statistics with different bins.")
+        self.counts = [a + b for a, b in zip(self.counts, data['counts'])]
+        if data['count']:
+            self._combine(data['count'], data['mean'], data['m2'], data['min'], data['max'])
+
+
+class DriftMonitor:
+    """
+    Estatísticas das entradas pontuadas comparadas à `baseline` (ver
+    build_baseline). Sem linha de base, `edges` define as faixas dos campos
+    numéricos e não há validação de intervalo nem de categorias.
+    """
+
+    def __init__(self, baseline=None, edges=None):
+        self.baseline = baseline
+        if baseline is not None:
+            edges = {name: stats['edges'] for name, stats in baseline['numeric'].items()}
+            self._ranges = {name: (stats['min'], stats['max']) for name, stats in baseline['numeric'].items()}
+            self._categories = {name: set(stats['counts']) for name, stats in baseline['categorical'].items()}
+        else:
+            self._ranges, self._categories = {}, {}
+        self._edges = edges
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.records = 0
+        self.numeric = {name: NumericStats(self._edges[name]) for name in NUMERIC_FIELDS}
+        self.categorical = {name: {} for name in CATEGORICAL_FIELDS + [PREDICTION]}
+        self.issues = {}
+
+    def _issue(self, name, kind, count=1):
+        # Chamado com o lock
+        by_kind = self.issues.setdefault(name, {})
+        by_kind[kind] = by_kind.get(kind, 0) + count
+
+    def _check_value(self, name, value):
+        if value is None:
+            return 'missing'
+        if math.isnan(value):
+            return 'invalid'
+        low, high = self._ranges.get(name, (None, None))
+        self.numeric[name].observe(value)
+        if low is not None and not low <= value <= high:
+            return 'out_of_range'
+        return None
+
+    def _check_category(self, name, value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return 'missing'
+        value = str(value)
+        counts = self.categorical[name]
+        counts[value] = counts.get(value, 0) + 1
+        known = self._categories.get(name)
+        if known is not None and value not in known:
+            return 'unknown_category'
+        return None
+
+    def observe(self, record, prediction=None):
+        """
+        Atualiza com um registro (dict com os campos do formulário) e, se
+        dada, a classe prevista. Devolve os problemas encontrados: [(campo, tipo)].
+        """
+        values = {name: _number(record.get(name)) for name in RAW_NUMERIC}
+        flags = {name: _flag(record.get(name)) for name in BOOL_COLS}
+        usable = {name: None if value is not None and math.isnan(value) else value for name, value in values.items()}
+        usable_flags = {name: None if value is not None and math.isnan(value) else value for name, value in flags.items()}
+        derived = _derived(usable, usable_flags)
+        problems = []
+        with self._lock:
+            self.records += 1
+            for name, value in values.items():
+                problems.append((name, self._check_value(name, value)))
+            for name, value in derived.items():
+                # Indicador sem valor: o problema já foi contado no campo de origem
+                if value is not None:
+                    problems.append((name, self._check_value(name, value)))
+            for name in CATEGORICAL_FIELDS:
+                problems.append((name, self._check_category(name, record.get(name))))
+            if prediction is not None:
+                self._check_category(PREDICTION, prediction)
+            problems = [(name, kind) for name, kind in problems if kind is not None]
+            for name, kind in problems:
+                self._issue(name, kind)
+        return problems
+
+    def observe_predictions(self, predictions):
+        """
+        Soma classes previstas à distribuição de `prediction`. Nos caminhos
+        integrados as entradas são observadas antes de predizer (o preditor
+        rejeita registros inválidos) e as classes só depois, das linhas que deram certo.
+        """
+        counts = {}
+        for value in np.asarray(predictions).ravel().tolist():
+            counts[str(value)] = counts.get(str(value), 0) + 1
+        with self._lock:
+            target = self.categorical[PREDICTION]
+            for value, count in counts.items():
+                target[value] = target.get(value, 0) + count
+
+    def observe_batch(self, X, predictions=None):
+        """
+        Atualiza com um bloco (DataFrame ou dict de colunas) e as classes previstas.
+        """
+        n, columns, categories, problems = _batch_columns(X, predictions)
+        with self._lock:
+            self.records += n
+            for name, kind, count in problems:
+                if count:
+                    self._issue(name, kind, count)
+            for name in NUMERIC_FIELDS:
+                values = columns[name]
+                values = values[np.isfinite(values)]
+                low, high = self._ranges.get(name, (None, None))
+                if low is not None:
+                    outside = int(((values < low) | (values > high)).sum())
+                    if outside:
+                        self._issue(name, 'out_of_range', outside)
+                self.numeric[name].observe_many(values)
+            for name, counts in categories.items():
+                target = self.categorical[name]
+                for value, count in counts.items():
+                    target[value] = target.get(value, 0) + count
+                known = self._categories.get(name)
+                if known is not None:
+                    unknown = sum(c for v, c in counts.items() if v not in known)
+                    if unknown:
+                        self._issue(name, 'unknown_category', unknown)
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            data = {
+                'records': self.records,
+                'numeric': {name: stats.to_dict() for name, stats in self.numeric.items()},
+                'categorical': {name: {'counts': dict(counts)} for name, counts in self.categorical.items()},
+                'issues': {name: dict(kinds) for name, kinds in self.issues.items()},
+            }
+            if reset:
+                self._reset()
+        return data
+
+    def merge(self, snapshot):
+        with self._lock:
+            self.records += snapshot['records']
+            for name, data in snapshot['numeric'].items():
+                self.numeric[name].merge(data)
+            for name, data in snapshot['categorical'].items():
+                target = self.categorical[name]
+                for value, count in data['counts'].items():
+                    target[value] = target.get(value, 0) + count
+            for name, kinds in snapshot['issues'].items():
+                for kind, count in kinds.items():
+                    self._issue(name, kind, count)
+
+    def report(self):
+        """
+        Drift de cada campo contra a linha de base (PSI, KS, médias) e os
+        problemas de validação; `drifted` lista os campos com PSI acima de PSI_DRIFT.
+        """
+        if self.baseline is None:
+            raise ValueError("DriftMonitor has no baseline to compare with.")
+        current = self.snapshot()
+        fields = {}
+        for name, stats in current['numeric'].items():
+            base = self.baseline['numeric'][name]
+            score = psi(base['counts'], stats['counts'])
+            current_stats, base_stats = NumericStats(stats['edges']), NumericStats(base['edges'])
+            current_stats.merge(stats)
+            base_stats.merge(base)
+            fields[name] = {
+                'count': stats['count'], 'mean': stats['mean'] if stats['count'] else None,
+                'std': current_stats.std, 'baseline_mean': base['mean'], 'baseline_std': base_stats.std,
+                'psi': score, 'ks': ks(base['counts'], stats['counts']), 'status': _status(score, stats['count']),
+            }
+        for name, stats in current['categorical'].items():
+            base = self.baseline['categorical'].get(name)
+            if base is None:
+                continue
+            values = sorted(set(base['counts']) | set(stats['counts']))
+            expected = [base['counts'].get(v, 0) for v in values]
+            actual = [stats['counts'].get(v, 0) for v in values]
+            score = psi(expected, actual)
+            count = sum(actual)
+            fields[name] = {
+                'count': count,
+                'frequencies': {v: c / count for v, c in zip(values, actual)} if count else {},
+                'baseline_frequencies': {v: c / sum(expected) for v, c in zip(values, expected)},
+                'psi': score, 'status': _status(score, count),
+            }
+        return {
+            'records': current['records'], 'fields': fields, 'issues': current['issues'],
+            'drifted': [name for name, field in fields.items() if field['status'] == 'drift'],
+            'baseline': self.baseline.get('metadata', {}),
+        }
+
+
+class BaselineWatcher:
+    """
+    DriftMonitor ligado ao arquivo da linha de base: quando o arquivo muda (o
+    treino grava uma nova linha de base a cada versão do modelo), `current()`
+    devolve um monitor novo, zerado, contra a linha de base nova. None
+    enquanto o arquivo não existir.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._signature = None
+        self._monitor = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        signature = file_signature(self.path)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._monitor = DriftMonitor(load_baseline(self.path)) if signature is not None else None
+                    self._signature = signature
+        return self._monitor
+
+
+def _batch_columns(X, predictions=None):
+    """
+    Colunas numéricas (com os indicadores derivados) como float64, contagem
+    das categorias e problemas [(campo, tipo, quantidade)] de um bloco.
+    """
+    import pandas as pd
+
+    n = len(X) if hasattr(X, 'columns') else len(X[next(iter(X.keys()))])
+    columns, problems = {}, []
+    for name in RAW_NUMERIC:
+        if name not in X:
+            problems.append((name, 'missing', n))
+            columns[name] = np.full(n, np.nan)
+            continue
+        raw = pd.Series(np.asarray(X[name]))
+        values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64)
+        invalid = (np.isnan(values) & raw.notna().to_numpy()) | np.isinf(values)
+        problems.append((name, 'missing', int(raw.isna().sum())))
+        problems.append((name, 'invalid', int(invalid.sum())))
+        values[invalid] = np.nan
+        columns[name] = values
+    flags = {}
+    for name in BOOL_COLS:
+        raw = pd.Series(X[name]) if name in X else pd.Series(np.full(n, np.nan))
+        if raw.dtype.kind not in 'biuf':
+            raw = raw.astype(object).map(_YES_NO)
+        flags[name] = raw.to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns['IMC'] = columns['Weight'] / (columns['Height'] * columns['Height'])
+        columns['HealthyMealRatio'] = columns['FCVC'] / columns['NCP']
+        columns['ActivityBalance'] = columns['FAF'] - columns['TUE']
+        columns['LifestyleScore'] = ((1 - flags['SMOKE']) + flags['SCC'] + (1 - flags['FAVC']) +
+                                     (1 - flags['family_history']))
+
+    categories = {}
+    for name in CATEGORICAL_FIELDS:
+        raw = pd.Series(np.asarray(X[name], dtype=object) if name in X else np.full(n, None, dtype=object))
+        problems.append((name, 'missing', int(raw.isna().sum())))
+        categories[name] = {str(v): int(c) for v, c in raw.dropna().astype(str).value_counts().items()}
+    if predictions is not None:
+        counts = pd.Series(np.asarray(predictions)).astype(str).value_counts()
+        categories[PREDICTION] = {v: int(c) for v, c in counts.items()}
+    return n, columns, categories, problems
+
+
+def build_baseline(X, predictions=None, bins=DEFAULT_BINS, metadata=None):
+    """
+    Linha de base a partir dos dados de treino: faixas nos quantis de cada
+    campo numérico e as estatísticas de `X` (e das classes previstas).
+    """
+    _, columns, _, _ = _batch_columns(X)
+    quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+    edges = {}
+    for name in NUMERIC_FIELDS:
+        finite = columns[name][np.isfinite(columns[name])]
+        edges[name] = np.unique(np.quantile(finite, quantiles)).tolist() if len(finite) else []
+    monitor = DriftMonitor(edges=edges)
+    monitor.observe_batch(X, predictions)
+    baseline = monitor.snapshot()
+    baseline['metadata'] = dict(metadata or {}, created_at=time.time(), bins=bins)
+    return baseline
+
+
+def extend_baseline(baseline, X, predictions=None, metadata=None):
+    """
+    Linha de base de um retreino incremental: a anterior somada às linhas
+    novas (e às classes previstas pelo novo modelo), nas mesmas faixas.
+    """
+    monitor = DriftMonitor(edges={name: stats['edges'] for name, stats in baseline['numeric'].items()})
+    monitor.merge(baseline)
+    monitor.observe_batch(X, predictions)
+    extended = monitor.snapshot()
+    extended['metadata'] = dict(baseline.get('metadata', {}), **(metadata or {}), rows=extended['records'],
+                                created_at=time.time())
+    return extended
+
+
+def save_baseline(baseline, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,45 @@
+"""
+Explicações por campo a partir das contribuições por feature
+(FlatForest.explain, Model.explain, CompiledPipeline.explain).
+
+O modelo vê as features já transformadas. As dummies (CAEC_*, CALC_*,
+TransportType_*) são somadas no campo de origem; as features derivadas (IMC,
+LifestyleScore, HealthyMealRatio, ActivityBalance) e as demais aparecem com o
+próprio nome. As contribuições estão em unidades de probabilidade: a escala do
+MinMaxScaler não muda nada.
+"""
+import numpy as np
+
+DUMMY_PREFIXES = ('CAEC', 'CALC', 'TransportType')
+
+
+def field_of(feature):
+    prefix, _, value = feature.partition('_')
+    return prefix if prefix in DUMMY_PREFIXES and value else feature
+
+
+def by_field(explanation):
+    """
+    Mesma explicação, com as contribuições das dummies somadas por campo.
+    """
+    names = explanation['feature_names']
+    fields = list(dict.fromkeys(field_of(name) for name in names))
+    groups = np.zeros((len(names), len(fields)))
+    groups[np.arange(len(names)), [fields.index(field_of(name)) for name in names]] = 1.0
+    contributions = np.einsum('nf...,fg->ng...', explanation['contributions'], groups)
+    return dict(explanation, feature_names=fields, contributions=contributions)
+
+
+def top_contributions(names, contributions, k=None):
+    """
+    [(nome, contribuição)] de uma linha (vetor por feature), em ordem de |contribuição|.
+    """
+    order = np.argsort(-np.abs(contributions), kind='stable')[:k]
+    return [(names[j], float(contributions[j])) for j in order]
+
+
+def format_contributions(contributions):
+    """
+    Texto curto (uma linha por campo, em pontos percentuais), para a tela ou para o prompt da IA.
+    """
+    return '\n'.join(f"- {name}: {value * 100:+.1f} p.p." for name, value in contributions)
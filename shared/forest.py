@@ -0,0 +1,252 @@
+"""
+Motor de inferência próprio para a RandomForest de shared.utils.Model.
+
+As árvores treinadas são compiladas numa única tabela contígua de nós e
+todas são percorridas ao mesmo tempo, nível a nível, com operações
+vetorizadas do NumPy. O predict_proba é idêntico, bit a bit, ao do sklearn.
+"""
+import numpy as np
+
+from shared.profiling import instrument
+
+DEFAULT_CHUNK_SIZE = 2048
+# Compacta os caminhos ativos quando essa fração já chegou a uma folha
+COMPACT_FRACTION = 0.5
+
+
+def breadth_first(arrays):
+    """
+    Renumera os nós de cada árvore em largura, de modo que os filhos de um
+    nó fiquem lado a lado (direito = esquerdo + 1).
+    """
+    left, right = arrays['left'], arrays['right']
+    order = []
+    for root in arrays['tree_offsets'][:-1]:
+        frontier = np.array([root])
+        while frontier.size:
+            order.append(frontier)
+            internal = frontier[left[frontier] >= 0]
+            frontier = np.stack([left[internal], right[internal]], axis=1).ravel()
+    order = np.concatenate(order)
+    new_id = np.empty_like(order)
+    new_id[order] = np.arange(len(order))
+
+    out = dict(arrays)
+    for name in ('feature', 'threshold', 'missing_left', 'value'):
+        out[name] = np.ascontiguousarray(arrays[name][order])
+    for name in ('left', 'right'):
+        child = arrays[name][order]
+        out[name] = np.where(child >= 0, new_id[np.maximum(child, 0)], -1).astype(np.int32)
+    return out
+
+
+def forest_arrays(forest):
+    """
+    Concatena os nós de todas as árvores de um RandomForestClassifier, em
+    largura dentro de cada árvore. Os índices dos filhos são globais (-1 nas folhas).
+    """
+    n_classes = len(forest.classes_)
+    offsets = [0]
+    parts = {'feature': [], 'threshold': [], 'left': [], 'right': [], 'missing_left': [], 'value': []}
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        nodes = tree.__getstate__()['nodes']
+        start = offsets[-1]
+        left, right = nodes['left_child'], nodes['right_child']
+        parts['feature'].append(nodes['feature'].astype(np.int32))
+        parts['threshold'].append(nodes['threshold'].astype(np.float64))
+        parts['left'].append(np.where(left >= 0, left + start, -1).astype(np.int32))
+        parts['right'].append(np.where(right >= 0, right + start, -1).astype(np.int32))
+        parts['missing_left'].append(nodes['missing_go_to_left'].astype(np.uint8))
+        parts['value'].append(tree.value[:, 0, :n_classes].astype(np.float64))
+        offsets.append(start + tree.node_count)
+    arrays = {name: np.ascontiguousarray(np.concatenate(values)) for name, values in parts.items()}
+    arrays['tree_offsets'] = np.asarray(offsets, dtype=np.int64)
+    arrays['classes'] = np.asarray(forest.classes_, dtype=np.int64)
+    return breadth_first(arrays)
+
+
+def _children_adjacent(arrays):
+    internal = arrays['left'] >= 0
+    return bool(np.array_equal(arrays['right'][internal], arrays['left'][internal] + 1))
+
+
+def _float32_floor(threshold):
+    # Para x float32, `x <= t` (t float64) equivale a `x <= maior float32 <= t`
+    low = threshold.astype(np.float32)
+    above = low.astype(np.float64) > threshold
+    low[above] = np.nextafter(low[above], np.float32(-np.inf))
+    return low
+
+
+class FlatForest:
+    """
+    Floresta compilada: uma tabela de nós (feature, threshold, filhos,
+    direção dos valores ausentes e valores) com as raízes em `tree_offsets`.
+
+    A entrada é convertida para float32, como no sklearn, e as linhas são
+    processadas em blocos de `chunk_size` para limitar a memória temporária.
+    """
+
+    def __init__(self, arrays, max_depth=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        if not _children_adjacent(arrays):
+            # Artefatos antigos, gravados na ordem em profundidade do sklearn
+            arrays = breadth_first(arrays)
+        self.classes_ = arrays['classes']
+        self.tree_offsets = arrays['tree_offsets']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.missing_left = arrays['missing_left'].view(bool)
+        self.value = arrays['value']
+        self.roots = np.asarray(self.tree_offsets[:-1], dtype=np.int32)
+        self.n_estimators = len(self.roots)
+        self.max_depth = max_depth if max_depth is not None else len(self.feature)
+        self.chunk_size = chunk_size
+
+        # Registro empacotado (feature, threshold float32, primeiro filho): um único
+        # gather por nível. As folhas apontam para si mesmas e nunca descem.
+        leaf = self.left < 0
+        self._nodes = np.empty((len(leaf), 3), dtype=np.int32)
+        self._nodes[:, 0] = np.where(leaf, 0, self.feature)
+        self._nodes[:, 1] = np.where(leaf, np.float32(np.inf), _float32_floor(self.threshold)).view(np.int32)
+        self._nodes[:, 2] = np.where(leaf, np.arange(len(leaf)), self.left)
+        self._missing_right = ~self.missing_left & ~leaf
+
+    @classmethod
+    def from_sklearn(cls, forest, **kwargs):
+        max_depth = max(e.tree_.max_depth for e in forest.estimators_)
+        return cls(forest_arrays(forest), max_depth=max_depth, **kwargs)
+
+    def _apply(self, X):
+        n, n_features = X.shape
+        n_trees = self.n_estimators
+        flat = X.ravel()
+        has_missing = np.isnan(flat).any()
+        # Uma posição por (linha, árvore); só os caminhos ainda em nós internos seguem ativos
+        node = np.tile(self.roots, n)
+        row_offset = np.repeat(np.arange(n, dtype=np.int32) * n_features, n_trees)
+        position = None
+        leaves = np.empty(n * n_trees, dtype=np.int32)
+        for _ in range(self.max_depth + 1):
+            record = self._nodes.take(node, axis=0)
+            x = flat.take(row_offset + record[:, 0])
+            go_right = x > record[:, 1].view(np.float32)
+            if has_missing:
+                missing = np.isnan(x)
+                go_right[missing] = self._missing_right[node[missing]]
+            child = record[:, 2] + go_right
+            done = child == node
+            node = child
+            n_done = np.count_nonzero(done)
+            if n_done == node.size:
+                break
+            if n_done > COMPACT_FRACTION * node.size:
+                if position is None:
+                    position = np.arange(n * n_trees, dtype=np.int32)
+                finished = np.flatnonzero(done)
+                leaves[position.take(finished)] = node.take(finished)
+                keep = np.flatnonzero(~done)
+                position, node, row_offset = position.take(keep), node.take(keep), row_offset.take(keep)
+        if position is None:
+            return node.reshape(n, n_trees)
+        leaves[position] = node
+        return leaves.reshape(n, n_trees)
+
+    def apply(self, X):
+        """
+        Índices das folhas na tabela de nós, forma (n_amostras, n_árvores).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = np.empty((X.shape[0], self.n_estimators), dtype=np.int32)
+        for start in range(0, X.shape[0], self.chunk_size):
+            out[start:start + self.chunk_size] = self._apply(X[start:start + self.chunk_size])
+        return out
+
+    @instrument()
+    def predict_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        proba = np.zeros((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], self.chunk_size):
+            leaves = self._apply(X[start:start + self.chunk_size]).T.copy()
+            block = proba[start:start + self.chunk_size]
+            # Soma na ordem das árvores, como o sklearn, para resultados idênticos
+            for tree in range(self.n_estimators):
+                block += self.value.take(leaves[tree], axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def _path_table(self, n_features):
+        """
+        Para cada folha, a variação das probabilidades em cada divisão do
+        caminho desde a raiz, somada pela feature da divisão: forma
+        (n_folhas, n_classes * n_features). Calculada uma vez por floresta.
+        """
+        cached = getattr(self, '_paths', None)
+        if cached is not None and cached[0] == n_features:
+            return cached[1], cached[2]
+        n_nodes, n_classes = self.value.shape
+        internal = np.flatnonzero(self.left >= 0)
+        parent = np.full(n_nodes, -1, dtype=np.int64)
+        parent[self.left[internal]] = internal
+        parent[self.right[internal]] = internal
+        table = np.zeros((n_nodes, n_classes, n_features))
+        # Nível a nível: o caminho de cada nó é o do pai mais a variação na divisão do pai
+        level = self.roots
+        while level.size:
+            split = level[self.left[level] >= 0]
+            children = np.concatenate([self.left[split], self.right[split]])
+            parents = parent[children]
+            table[children] = table[parents]
+            table[children, :, self.feature[parents]] += self.value[children] - self.value[parents]
+            level = children
+        leaves = np.flatnonzero(self.left < 0)
+        leaf_row = np.full(n_nodes, -1, dtype=np.int32)
+        leaf_row[leaves] = np.arange(len(leaves), dtype=np.int32)
+        table = np.ascontiguousarray(table[leaves].reshape(len(leaves), -1))
+        self._paths = (n_features, table, leaf_row)
+        return table, leaf_row
+
+    @instrument()
+    def explain(self, X, predicted_only=False):
+        """
+        Contribuição de cada feature para as probabilidades (decomposição dos
+        caminhos nas árvores, de Saabas): bias + soma das contribuições é o
+        predict_proba da linha, a menos de arredondamento.
+
+        Devolve 'proba' (idêntico ao predict_proba), 'bias' (n_classes,) e
+        'contributions' (n_amostras, n_features, n_classes). Com
+        `predicted_only`, só a classe prevista de cada linha: 'bias' (n_amostras,)
+        e 'contributions' (n_amostras, n_features).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, n_features = X.shape
+        n_classes = len(self.classes_)
+        table, leaf_row = self._path_table(n_features)
+        if predicted_only:
+            table = table.reshape(-1, n_features)
+        proba = np.zeros((n, n_classes), dtype=np.float64)
+        contributions = np.zeros((n, table.shape[1]), dtype=np.float64)
+        for start in range(0, n, self.chunk_size):
+            leaves = self._apply(X[start:start + self.chunk_size]).T.copy()
+            block = proba[start:start + self.chunk_size]
+            for tree in range(self.n_estimators):
+                block += self.value.take(leaves[tree], axis=0)
+            rows = leaf_row.take(leaves)
+            if predicted_only:
+                # Linha (folha, classe prevista) da tabela vista como (n_folhas * n_classes, n_features)
+                rows = rows * n_classes + block.argmax(axis=1)
+            out = contributions[start:start + self.chunk_size]
+            for tree in range(self.n_estimators):
+                out += table.take(rows[tree], axis=0)
+        proba /= self.n_estimators
+        contributions /= self.n_estimators
+        bias = self.value.take(self.roots, axis=0).mean(axis=0)
+        if predicted_only:
+            return {'proba': proba, 'bias': bias.take(proba.argmax(axis=1)), 'contributions': contributions}
+        contributions = contributions.reshape(n, n_classes, n_features).transpose(0, 2, 1)
+        return {'proba': proba, 'bias': bias, 'contributions': contributions}
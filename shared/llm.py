@@ -0,0 +1,397 @@
+"""
+Geração da análise por IA com cache persistente e deduplicação de chamadas.
+
+O backend é plugável: GeminiBackend fala com a API do Google e LocalBackend
+é um substituto local, sem rede, para testes e benchmarks. Ambos expõem
+`generate` (bloqueante) e `stream` (texto parcial à medida que chega).
+"""
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from pathlib import Path
+
+from shared import profiling
+
+_DONE = object()
+
+
+class GeminiBackend:
+    """
+    Cliente do Gemini configurado uma única vez e reutilizado entre chamadas.
+    """
+
+    def __init__(self, api_key, model_name='gemini-2.5-flash'):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+
+class LocalBackend:
+    """
+    Substituto local do LLM: responde de forma determinística a partir do
+    prompt, com latência opcional para simular a chamada de rede. No modo
+    `stream`, a resposta sai em `n_chunks` pedaços separados por `chunk_latency`.
+    """
+
+    def __init__(self, latency=0.0, responder=None, model_name='local', n_chunks=8, chunk_latency=0.0):
+        self.latency = latency
+        self.responder = responder
+        self.model_name = model_name
+        self.n_chunks = n_chunks
+        self.chunk_latency = chunk_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _respond(self, prompt):
+        with self._lock:
+            self.calls += 1
+        if self.responder is not None:
+            return self.responder(prompt)
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        return f"**🔬 Análise de Saúde do Usuário**\n\nAnálise local de teste ({digest})."
+
+    def generate(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        text = self._respond(prompt)
+        if self.chunk_latency:
+            time.sleep(self.chunk_latency * self.n_chunks)
+        return text
+
+    def stream(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        text = self._respond(prompt)
+        size = max(1, -(-len(text) // self.n_chunks))
+        for start in range(0, len(text), size):
+            if self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            yield text[start:start + size]
+
+
+class AnalysisStream:
+    """
+    Texto parcial produzido em segundo plano. Iterar consome os pedaços à
+    medida que chegam; `timeout` limita a espera total e interromper a
+    iteração (ou chamar `cancel`) avisa o produtor para parar. `on_cancel`
+    é chamado uma única vez, no primeiro cancelamento.
+    """
+
+    def __init__(self, timeout=None, on_cancel=None):
+        self.timeout = timeout
+        self.chunks = []
+        self.finished = False
+        self._queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._cancel_lock = threading.Lock()
+        self._on_cancel = on_cancel
+        self._error = None
+
+    @classmethod
+    def from_text(cls, text):
+        stream = cls()
+        stream.put(text)
+        stream.finish()
+        return stream
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def text(self):
+        return ''.join(self.chunks)
+
+    def put(self, chunk):
+        self._queue.put(chunk)
+
+    def finish(self, error=None):
+        self._error = error
+        self._queue.put(_DONE)
+
+    def cancel(self):
+        with self._cancel_lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+        if self._on_cancel is not None:
+            self._on_cancel()
+
+    def __iter__(self):
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        try:
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                try:
+                    if remaining is not None and remaining <= 0:
+                        raise queue.Empty
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    raise TimeoutError(f"Analysis not finished after {self.timeout} seconds.")
+                if item is _DONE:
+                    self.finished = True
+                    if self._error is not None:
+                        raise self._error
+                    return
+                self.chunks.append(item)
+                yield item
+        finally:
+            if not self.finished:
+                self.cancel()
+
+
+class AnalysisStore:
+    """
+    Armazena as respostas em SQLite, de modo que o cache sobrevive a reinícios.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL)"
+            )
+
+    def get(self, key, max_age=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM analyses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        response, created = row
+        if max_age is not None and time.time() - created > max_age:
+            return None
+        return response
+
+    def put(self, key, model, response):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, model, response, created) VALUES (?, ?, ?, ?)",
+                (key, model, response, time.time())
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AnalysisService:
+    """
+    Fachada usada pelo app: consulta o cache, agrupa pedidos idênticos em
+    andamento numa única chamada ao backend e grava a resposta.
+    """
+
+    def __init__(self, backend, store=None, max_age=None, max_workers=4):
+        self.backend = backend
+        self.store = store
+        self.max_age = max_age
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self._inflight = {}
+        self._waiters = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def key(self, prompt):
+        model = getattr(self.backend, 'model_name', type(self.backend).__name__)
+        return hashlib.sha256(f"{model}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _cached(self, key):
+        if self.store is None:
+            return None
+        cached = self.store.get(key, self.max_age)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+        return cached
+
+    def _claim(self, key):
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+                self._waiters[key] = self._waiters.get(key, 0) + 1
+        return future, owner
+
+    def _abandon(self, key):
+        # O dono só desiste se ninguém espera pela mesma resposta; a chave sai sob o
+        # mesmo lock, então nenhum pedido novo se junta a uma geração abandonada
+        with self._lock:
+            if self._waiters.get(key):
+                return False
+            del self._inflight[key]
+            return True
+
+    def _leave(self, key, future):
+        # Um pedido agrupado desistiu: sem ele, o dono cancelado pode abandonar a geração
+        with self._lock:
+            if self._inflight.get(key) is future and self._waiters.get(key):
+                self._waiters[key] -= 1
+
+    def _recheck(self, key, future):
+        # Outro dono pode ter gravado a resposta entre a primeira consulta e o _claim
+        cached = self._cached(key)
+        if cached is not None:
+            future.set_result(cached)
+            self._release(key)
+        else:
+            with self._lock:
+                self.misses += 1
+        return cached
+
+    def _release(self, key):
+        with self._lock:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+
+    def _save(self, key, response):
+        if self.store is not None:
+            self.store.put(key, getattr(self.backend, 'model_name', ''), response)
+
+    def generate(self, prompt):
+        key = self.key(prompt)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+        cached = self._recheck(key, future)
+        if cached is not None:
+            return cached
+
+        try:
+            start = time.perf_counter()
+            response = self.backend.generate(prompt)
+            profiling.record('llm.generate', time.perf_counter() - start, 1, len(response.encode('utf-8')))
+            self._save(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            # Erros não são gravados: a próxima tentativa chama o backend de novo
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key)
+
+    def stream(self, prompt, timeout=60.0):
+        """
+        Inicia a geração num executor em segundo plano e devolve um
+        AnalysisStream imediatamente, sem bloquear quem chamou.
+        """
+        key = self.key(prompt)
+        cached = self._cached(key)
+        if cached is not None:
+            return AnalysisStream.from_text(cached)
+
+        future, owner = self._claim(key)
+        if not owner:
+            # Pedido idêntico em andamento: a resposta completa chega por callback, sem ocupar um worker
+            stream = AnalysisStream(timeout, on_cancel=lambda: self._leave(key, future))
+            future.add_done_callback(lambda done: self._deliver(done, stream))
+            return stream
+
+        stream = AnalysisStream(timeout)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='analysis')
+        try:
+            self._executor.submit(self._produce, prompt, key, stream, future)
+        except BaseException as e:
+            future.set_exception(e)
+            self._release(key)
+            raise
+        return stream
+
+    @staticmethod
+    def _deliver(future, stream):
+        if future.cancelled():
+            stream.finish(CancelledError())
+        elif future.exception() is not None:
+            stream.finish(future.exception())
+        else:
+            stream.put(future.result())
+            stream.finish()
+
+    def _produce(self, prompt, key, stream, future):
+        cached = self._recheck(key, future)
+        if cached is not None:
+            stream.put(cached)
+            stream.finish()
+            return
+
+        abandoned = False
+        try:
+            start = time.perf_counter()
+            backend_stream = getattr(self.backend, 'stream', None)
+            chunks = backend_stream(prompt) if backend_stream else iter([self.backend.generate(prompt)])
+            parts = []
+            for chunk in chunks:
+                # Com a stream cancelada, a geração continua enquanto houver pedidos agrupados esperando
+                if stream.cancelled and self._abandon(key):
+                    abandoned = True
+                    break
+                if not parts:
+                    profiling.record('llm.first_chunk', time.perf_counter() - start, 1)
+                parts.append(chunk)
+                if not stream.cancelled:
+                    stream.put(chunk)
+            if abandoned:
+                close = getattr(chunks, 'close', None)
+                if close is not None:
+                    close()
+                with self._lock:
+                    self.cancelled += 1
+                future.cancel()
+                stream.finish(CancelledError())
+                return
+            response = ''.join(parts)
+            profiling.record('llm.stream', time.perf_counter() - start, 1, len(response.encode('utf-8')))
+            self._save(key, response)
+            future.set_result(response)
+            stream.finish()
+        except BaseException as e:
+            future.set_exception(e)
+            stream.finish(e)
+        finally:
+            if not abandoned:
+                self._release(key)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits, 'misses': self.misses,
+                'coalesced': self.coalesced, 'cancelled': self.cancelled,
+            }
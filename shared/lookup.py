@@ -0,0 +1,381 @@
+"""
+Tabela pré-calculada de predições para o espaço de entradas do formulário do app.
+
+Fora Height e Weight, o formulário tem um espaço finito: gênero, 5 sliders,
+4 perguntas sim/não, CAEC e CALC com 4 opções e 5 meios de transporte (que o
+modelo só vê como TransportType, 3 valores). Height e Weight entram como uma
+célula da grade (faixa de altura x faixa de IMC): o modelo usa os três como
+features, então colapsar só no IMC perderia informação.
+
+Uma célula só entra na tabela quando nenhum threshold de Height, Weight ou
+IMC alcançável a partir da combinação dos campos discretos cai dentro dela:
+aí todos os registros da célula percorrem os mesmos caminhos na floresta e a
+resposta é exatamente a do modelo. A entrada guarda a classe prevista e a
+probabilidade dela (uint8). As demais células ficam marcadas com NO_ENTRY e a
+consulta cai no modelo; o mesmo vale para valores fora da grade. O arquivo usa o layout do artefato
+(shared.artifact), é mapeado em memória e guarda o digest do modelo para o
+qual foi gerado.
+"""
+import hashlib
+import json
+import math
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from shared.artifact import read_container, write_container
+from shared.compiled import TRANSPORT_TYPE, forest_proba
+from shared.forest import forest_arrays
+
+MAGIC = b'OFCTABLE'
+# 2: só células sem threshold de Height/Weight/IMC (a versão 1 testava centro e cantos)
+TABLE_FORMAT = 2
+NO_ENTRY = 255
+YES_NO = ['no', 'yes']
+LEVELS = ['no', 'Sometimes', 'Frequently', 'Always']
+MTRANS_VALUES = ['Public_Transportation', 'Walking', 'Motorbike', 'Bike', 'Automobile']
+TRANSPORT_TYPES = ['active', 'neutral', 'sedentary']
+# (campo, valores aceitos no formulário, código de cada valor na tabela)
+DISCRETE_FIELDS = [
+    ('Gender', ['Female', 'Male'], None),
+    ('FCVC', [1, 2, 3], None),
+    ('NCP', [1, 2, 3, 4], None),
+    ('CH2O', [0, 1, 2, 3], None),
+    ('FAF', [0, 1, 2, 3], None),
+    ('TUE', [0, 1, 2], None),
+    ('family_history', YES_NO, None),
+    ('FAVC', YES_NO, None),
+    ('SMOKE', YES_NO, None),
+    ('SCC', YES_NO, None),
+    ('CAEC', LEVELS, None),
+    ('CALC', LEVELS, None),
+    ('MTRANS', MTRANS_VALUES, [TRANSPORT_TYPES.index(TRANSPORT_TYPE.get(v, 'neutral')) for v in MTRANS_VALUES]),
+]
+# (início, passo, número de faixas); fora da grade a consulta vai para o modelo
+DEFAULT_HEIGHT = (1.45, 0.1, 6)
+DEFAULT_IMC = (14.0, 1.0, 40)
+
+
+def _normalize(value):
+    return value if isinstance(value, str) else float(value)
+
+
+def _forest_nodes(forest):
+    if hasattr(forest, 'estimators_'):
+        arrays = forest_arrays(forest)
+        arrays['roots'] = arrays['tree_offsets'][:-1]
+        return arrays
+    arrays = {name: getattr(forest, name) for name in ('feature', 'threshold', 'left', 'right', 'value', 'roots')}
+    arrays['missing_left'] = forest.missing_left.view(np.uint8)
+    return arrays
+
+
+def model_digest(predictor):
+    """
+    Digest da floresta, da escala e da ordem das features de um CompiledPipeline:
+    o mesmo para o .joblib e para o artefato do mesmo modelo.
+    """
+    arrays = _forest_nodes(predictor.forest)
+    digest = hashlib.sha1(json.dumps([predictor.feature_names, predictor.scaling], sort_keys=True).encode())
+    for name in ('feature', 'threshold', 'left', 'right', 'missing_left', 'value'):
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()
+
+
+class LookupTable:
+    """
+    Índice denso: chave = (combinação dos campos discretos) x (célula de
+    altura e IMC). `lookup(record)` devolve (classe, probabilidade) em O(1),
+    ou None quando o registro não tem entrada na tabela.
+    """
+
+    def __init__(self, header, arrays, buffer=None):
+        self.header = header
+        self.classes = arrays['classes']
+        self.confidence = arrays['confidence']
+        self.class_values = header['class_values']
+        self.model_digest = header['model_digest']
+        self.height = header['height']
+        self.imc = header['imc']
+        self.n_cells = self.height[2] * self.imc[2]
+        self._buffer = buffer
+
+        self._fields = []
+        stride = self.n_cells
+        for name, values, codes in reversed(header['fields']):
+            codes = codes if codes is not None else list(range(len(values)))
+            self._fields.append((name, {_normalize(v): c for v, c in zip(values, codes)}, stride))
+            stride *= max(codes) + 1
+        self._fields.reverse()
+
+    @staticmethod
+    def _bucket(value, grid):
+        start, step, count = grid
+        index = math.floor((value - start) / step)
+        return index if 0 <= index < count else None
+
+    def key(self, record):
+        index = 0
+        for name, codes, stride in self._fields:
+            value = record.get(name)
+            try:
+                code = codes.get(_normalize(value))
+            except (TypeError, ValueError):
+                return None
+            if code is None:
+                return None
+            index += code * stride
+        try:
+            height, weight = float(record['Height']), float(record['Weight'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not height > 0 or not math.isfinite(weight):
+            return None
+        h = self._bucket(height, self.height)
+        i = self._bucket(weight / (height * height), self.imc)
+        if h is None or i is None:
+            return None
+        return index + h * self.imc[2] + i
+
+    def lookup(self, record):
+        key = self.key(record)
+        if key is None:
+            return None
+        code = int(self.classes[key])
+        if code == NO_ENTRY:
+            return None
+        return self.class_values[code], int(self.confidence[key]) / 255
+
+    def coverage(self):
+        return float(np.count_nonzero(self.classes != NO_ENTRY)) / len(self.classes)
+
+
+def load_table(path, use_mmap=True):
+    header, arrays, buffer = read_container(path, MAGIC, use_mmap, kind='lookup table')
+    return LookupTable(header, arrays, buffer)
+
+
+def _combination_columns(combos):
+    # Colunas de entrada (para CompiledPipeline.transform) de um bloco de combinações
+    columns = {}
+    for name, values, codes in DISCRETE_FIELDS:
+        if codes is not None:
+            # Um valor representante por código (ex.: um meio de transporte por TransportType)
+            values = [values[codes.index(c)] for c in range(max(codes) + 1)]
+        columns[name] = np.asarray(values)[combos[name]]
+    n = len(columns['Gender'])
+    columns['Height'] = np.ones(n)
+    columns['Weight'] = np.ones(n)
+    return columns
+
+
+def _grid_centers(height, imc):
+    """
+    Altura e peso do centro de cada célula, na ordem (faixa de altura, faixa de IMC).
+    """
+    h_start, h_step, n_h = height
+    i_start, i_step, n_i = imc
+    h, i = np.meshgrid(np.arange(n_h) + 0.5, np.arange(n_i) + 0.5, indexing='ij')
+    h = h_start + h.ravel() * h_step
+    return h, (i_start + i.ravel() * i_step) * h * h
+
+
+def _cell_cuts(nodes, predictor, height, imc, margin=1e-5):
+    """
+    Para cada nó que divide em Height, Weight ou IMC, as células cujo intervalo
+    contém o threshold (matriz nós x células). Os intervalos são os da escala
+    do modelo, com uma folga para os arredondamentos do cálculo do IMC.
+    """
+    names = predictor.feature_names
+    h_start, h_step, n_h = height
+    i_start, i_step, n_i = imc
+    h_low, i_low = np.meshgrid(h_start + np.arange(n_h) * h_step, i_start + np.arange(n_i) * i_step, indexing='ij')
+    h_high, i_high = h_low + h_step, i_low + i_step
+    ranges = {
+        'Height': (h_low, h_high), 'IMC': (i_low, i_high),
+        'Weight': (i_low * h_low ** 2, i_high * h_high ** 2),
+    }
+    split = np.flatnonzero(nodes['left'] >= 0)
+    body_nodes = split[np.isin(nodes['feature'][split], [names.index(name) for name in ranges])]
+    cuts = np.zeros((len(body_nodes), n_h * n_i), dtype=np.float32)
+    for name, (low, high) in ranges.items():
+        if name in predictor.scaling:
+            scale, offset = predictor.scaling[name]
+            low, high = low * scale + offset, high * scale + offset
+        low, high = np.minimum(low, high).ravel(), np.maximum(low, high).ravel()
+        rows = nodes['feature'][body_nodes] == names.index(name)
+        threshold = nodes['threshold'][body_nodes[rows]][:, None]
+        cuts[rows] = (threshold >= low - margin) & (threshold <= high + margin)
+    return body_nodes, cuts
+
+
+def _node_levels(nodes, roots):
+    # Nós internos agrupados por profundidade: os pais sempre vêm antes dos filhos
+    left, right = nodes['left'], nodes['right']
+    levels = []
+    frontier = np.asarray(roots, dtype=np.int64)
+    while frontier.size:
+        internal = frontier[left[frontier] >= 0]
+        if internal.size:
+            levels.append(internal)
+        frontier = np.concatenate([left[internal], right[internal]])
+    return levels
+
+
+def _split_free(templates, nodes, levels, body_nodes, cuts):
+    """
+    Células sem nenhum threshold de Height, Weight ou IMC alcançável a partir
+    de cada combinação (linhas de `templates`): dentro delas todos os pontos
+    caem nas mesmas folhas, então a predição do centro é exata para a célula.
+    """
+    feature, threshold, left, right = nodes['feature'], nodes['threshold'], nodes['left'], nodes['right']
+    body = np.zeros(len(feature), dtype=bool)
+    body[body_nodes] = True
+    reached = np.zeros((len(templates), len(feature)), dtype=bool)
+    reached[:, nodes['roots']] = True
+    for level in levels:
+        # Nos campos discretos só um dos filhos é alcançável; em Height/Weight/IMC, os dois
+        is_body = body[level]
+        go_left = templates[:, np.where(is_body, 0, feature[level])] <= threshold[level]
+        parent = reached[:, level]
+        reached[:, left[level]] = parent & (go_left | is_body)
+        reached[:, right[level]] = parent & (~go_left | is_body)
+    return (reached[:, body_nodes].astype(np.float32) @ cuts) == 0
+
+
+def build_table(predictor, path, height=DEFAULT_HEIGHT, imc=DEFAULT_IMC, block_rows=1 << 18,
+                metadata=None, progress=None):
+    """
+    Calcula a tabela com o `predictor` (CompiledPipeline) e grava em `path`.
+    """
+    names = predictor.feature_names
+    j_height, j_weight, j_imc = names.index('Height'), names.index('Weight'), names.index('IMC')
+    sizes = [len(values) if codes is None else max(codes) + 1 for _, values, codes in DISCRETE_FIELDS]
+    n_combos = int(np.prod(sizes))
+    n_cells = height[2] * imc[2]
+
+    # Height, Weight e IMC do centro de cada célula, com a mesma conta do CompiledPipeline
+    heights, weights = _grid_centers(height, imc)
+    body = {'Height': heights, 'Weight': weights, 'IMC': weights / (heights ** 2)}
+    for name, values in body.items():
+        if name in predictor.scaling:
+            scale, offset = predictor.scaling[name]
+            values = values * scale
+            values += offset
+            body[name] = values
+    body = {name: values.astype(np.float32) for name, values in body.items()}
+
+    nodes = _forest_nodes(predictor.forest)
+    levels = _node_levels(nodes, nodes['roots'])
+    body_nodes, cuts = _cell_cuts(nodes, predictor, height, imc)
+
+    classes = np.empty(n_combos * n_cells, dtype=np.uint8)
+    confidence = np.empty(n_combos * n_cells, dtype=np.uint8)
+    class_values = [c.item() for c in predictor.forest.classes_]
+    block = max(1, block_rows // n_cells)
+    start_time = time.perf_counter()
+    for start in range(0, n_combos, block):
+        stop = min(start + block, n_combos)
+        combos = dict(zip([f[0] for f in DISCRETE_FIELDS], np.unravel_index(np.arange(start, stop), sizes)))
+        templates = predictor.transform(_combination_columns(combos), dtype=np.float32)
+        # Só as células sem threshold de Height/Weight/IMC entram na tabela; só elas são avaliadas
+        stable = _split_free(templates, nodes, levels, body_nodes, cuts)
+        combo, cell = np.nonzero(stable)
+        X = templates[combo]
+        X[:, j_height] = body['Height'][cell]
+        X[:, j_weight] = body['Weight'][cell]
+        X[:, j_imc] = body['IMC'][cell]
+        proba = forest_proba(predictor.forest, X)
+
+        codes = np.full(stable.shape, NO_ENTRY, dtype=np.uint8)
+        top = np.zeros(stable.shape, dtype=np.uint8)
+        codes[combo, cell] = proba.argmax(axis=1)
+        top[combo, cell] = np.rint(proba.max(axis=1) * 255)
+        classes[start * n_cells:stop * n_cells] = codes.ravel()
+        confidence[start * n_cells:stop * n_cells] = top.ravel()
+        if progress is not None:
+            progress(stop, n_combos, time.perf_counter() - start_time)
+
+    header = {
+        'fields': DISCRETE_FIELDS, 'height': list(height), 'imc': list(imc),
+        'class_values': class_values, 'model_digest': model_digest(predictor),
+        'format': TABLE_FORMAT, 'metadata': metadata or {},
+    }
+    return write_container(path, header, {'classes': classes, 'confidence': confidence}, magic=MAGIC)
+
+
+class LookupPredictor:
+    """
+    `predict_record` pela tabela, em O(1), com o preditor ao vivo para tudo o
+    que a tabela não cobre. Respostas da tabela trazem a mesma classe do
+    modelo e a probabilidade dela para o próprio registro (`confidence`,
+    arredondada a 1/255), sem o vetor de probabilidades (`proba` é None);
+    `source` diz de onde veio a resposta. Como a classe é a do modelo,
+    `explain_record` (sempre pelo modelo ao vivo) explica a classe mostrada.
+    """
+
+    def __init__(self, table, predictor):
+        if table.header.get('format') != TABLE_FORMAT:
+            raise ValueError("Lookup table uses an old format; rebuild it with train.build_lookup.")
+        if table.model_digest != model_digest(predictor):
+            raise ValueError("Lookup table was built for a different model.")
+        self.table = table
+        self.predictor = predictor
+        self.hits = 0
+        self.misses = 0
+
+    def predict_record(self, record):
+        found = self.table.lookup(record)
+        if found is None:
+            self.misses += 1
+            result = self.predictor.predict_record(record)
+            result['confidence'] = float(np.max(result['proba']))
+            result['source'] = 'model'
+            return result
+        self.hits += 1
+        prediction, confidence = found
+        return {
+            'prediction': prediction, 'proba': None, 'confidence': confidence,
+            'indicators': self.predictor.indicators(record), 'source': 'table',
+        }
+
+    def explain_record(self, record, top=None):
+        return self.predictor.explain_record(record, top)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'coverage': self.table.coverage()}
+
+
+def with_lookup(predictor, path):
+    """
+    Envolve `predictor` com a tabela em `path`, se ela existir e tiver sido
+    gerada para este modelo; caso contrário devolve o próprio `predictor`.
+    """
+    if not Path(path).exists():
+        return predictor
+    try:
+        return LookupPredictor(load_table(path), predictor)
+    except ValueError as e:
+        warnings.warn(f"Ignoring lookup table {path}: {e}")
+        return predictor
+
+
+def agreement(table, predictor, records):
+    """
+    Compara a tabela com o modelo ao vivo em `records`: cobertura (fração
+    respondida pela tabela) e concordância da classe entre as respondidas.
+    """
+    answered = agreed = 0
+    for record in records:
+        found = table.lookup(record)
+        if found is None:
+            continue
+        answered += 1
+        agreed += found[0] == predictor.predict_record(record)['prediction']
+    return {
+        'records': len(records), 'answered': answered, 'agreed': agreed,
+        'coverage': answered / len(records) if records else 0.0,
+        'agreement': agreed / answered if answered else float('nan'),
+    }
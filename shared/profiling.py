@@ -0,0 +1,311 @@
+"""
+Instrumentação opcional do caminho de predição.
+
+Cada etapa instrumentada (transform dos transformadores de shared.utils,
+Model.predict/predict_proba, caminho compilado e chamada ao LLM) registra
+tempo de parede, linhas e bytes em histogramas de buckets fixos. Desligada
+(o padrão), o custo por chamada é um teste de uma variável global.
+
+Liga com OBESITY_PROFILE=1 no ambiente ou com `enable()`. Exporta um snapshot
+JSON (`snapshot`) ou texto no formato do Prometheus (`to_prometheus`).
+Por padrão os bytes são o tamanho da saída da etapa; com
+OBESITY_PROFILE_ALLOCATIONS=1 ou `enable(trace_allocations=True)`, são os
+alocados durante a etapa (tracemalloc, bem mais caro). A métrica exportada
+leva o nome da medida: `..._output_bytes` ou `..._allocated_bytes`.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = tuple(m * 10.0 ** e for e in range(-6, 2) for m in (1, 2.5, 5))
+ROWS_BUCKETS = tuple(4 ** e for e in range(11))
+BYTES_BUCKETS = tuple(256 * 4 ** e for e in range(12))
+
+_trace_allocations = os.environ.get('OBESITY_PROFILE_ALLOCATIONS', '') not in ('', '0')
+_enabled = _trace_allocations or os.environ.get('OBESITY_PROFILE', '') not in ('', '0')
+if _trace_allocations:
+    tracemalloc.start()
+# Por thread: [memória no início, maior pico já visto] de cada etapa aberta
+_peaks = threading.local()
+
+
+class Histogram:
+    """
+    Histograma cumulativo no estilo do Prometheus: contagem por limite
+    superior (`le`), mais soma e total de observações.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {'bounds': list(self.bounds), 'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+    def merge(self, data):
+        if tuple(data['bounds']) != self.bounds:
+            raise ValueError("Cannot merge histograms with different buckets.")
+        self.counts = [a + b for a, b in zip(self.counts, data['counts'])]
+        self.sum += data['sum']
+        self.count += data['count']
+
+
+class StageStats:
+    def __init__(self):
+        self.seconds = Histogram(SECONDS_BUCKETS)
+        self.rows = Histogram(ROWS_BUCKETS)
+        self.bytes = Histogram(BYTES_BUCKETS)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, rows, nbytes):
+        with self._lock:
+            self.seconds.observe(seconds)
+            self.rows.observe(rows)
+            self.bytes.observe(nbytes)
+
+    def to_dict(self):
+        with self._lock:
+            return {'seconds': self.seconds.to_dict(), 'rows': self.rows.to_dict(), 'bytes': self.bytes.to_dict()}
+
+    def merge(self, data):
+        with self._lock:
+            for name in ('seconds', 'rows', 'bytes'):
+                getattr(self, name).merge(data[name])
+
+
+class Registry:
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        stats = self._stages.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._stages.setdefault(name, StageStats())
+        return stats
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            stages = self._stages
+            if reset:
+                self._stages = {}
+        return {name: stats.to_dict() for name, stats in sorted(stages.items())}
+
+    def merge(self, snapshot):
+        for name, data in snapshot.items():
+            self.stage(name).merge(data)
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+
+REGISTRY = Registry()
+
+
+def enable(trace_allocations=None):
+    # None mantém o modo atual (que pode ter vindo de OBESITY_PROFILE_ALLOCATIONS)
+    global _enabled, _trace_allocations
+    if trace_allocations is not None:
+        _trace_allocations = trace_allocations
+    if _trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def traces_allocations():
+    return _trace_allocations
+
+
+def _rows(obj):
+    if isinstance(obj, dict):
+        return 1
+    try:
+        return len(obj)
+    except TypeError:
+        return 1
+
+
+def _nbytes(obj):
+    nbytes = getattr(obj, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    memory_usage = getattr(obj, 'memory_usage', None)
+    if memory_usage is not None:
+        # Series devolve um inteiro; DataFrame, uma Series por coluna
+        usage = memory_usage(index=True, deep=False)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if isinstance(obj, dict):
+        return sum(_nbytes(v) for v in obj.values())
+    if isinstance(obj, str):
+        return len(obj.encode('utf-8'))
+    return 0
+
+
+def record(stage, seconds, rows=0, nbytes=0):
+    if _enabled:
+        REGISTRY.stage(stage).observe(seconds, rows, nbytes)
+
+
+@contextmanager
+def timed(stage, rows=0, nbytes=0):
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, rows, nbytes)
+
+
+def _enter_peak():
+    # reset_peak é global: antes de zerar, guarda o pico atual na etapa que envolve esta
+    stack = getattr(_peaks, 'stack', None)
+    if stack is None:
+        stack = _peaks.stack = []
+    current, peak = tracemalloc.get_traced_memory()
+    if stack:
+        stack[-1][1] = max(stack[-1][1], peak)
+    tracemalloc.reset_peak()
+    stack.append([current, current])
+
+
+def _exit_peak():
+    # Devolve os bytes de pico da etapa e repassa o pico para a etapa de fora
+    stack = _peaks.stack
+    frame = stack.pop()
+    peak = max(tracemalloc.get_traced_memory()[1], frame[1])
+    if stack:
+        stack[-1][1] = max(stack[-1][1], peak)
+    return peak - frame[0]
+
+
+def instrument(name=None):
+    """
+    Decorador para métodos `f(self, X, ...)`: a etapa se chama `name` ou
+    `<Classe>.<método>`; as linhas vêm de `len(X)`.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, X, *args, **kwargs):
+            if not _enabled:
+                return fn(self, X, *args, **kwargs)
+            tracing = _trace_allocations and tracemalloc.is_tracing()
+            if tracing:
+                _enter_peak()
+            start = time.perf_counter()
+            try:
+                result = fn(self, X, *args, **kwargs)
+            finally:
+                if tracing:
+                    allocated = _exit_peak()
+            seconds = time.perf_counter() - start
+            nbytes = allocated if tracing else _nbytes(result)
+            record(name or f"{type(self).__name__}.{fn.__name__}", seconds, _rows(X), nbytes)
+            return result
+        return wrapper
+    return decorator
+
+
+def snapshot(reset=False):
+    return REGISTRY.snapshot(reset=reset)
+
+
+def merge(data):
+    REGISTRY.merge(data)
+
+
+def reset():
+    REGISTRY.reset()
+
+
+def _format_bound(bound):
+    return f"{bound:g}"
+
+
+def to_prometheus(data=None, prefix='obesity_stage', allocations=None):
+    """
+    Texto no formato de exposição do Prometheus, uma família por medida. Os
+    bytes saem como `allocated_bytes` se `allocations` (padrão: o modo atual)
+    e como `output_bytes` caso contrário.
+    """
+    data = snapshot() if data is None else data
+    allocations = _trace_allocations if allocations is None else allocations
+    if allocations:
+        bytes_family = ('allocated_bytes', 'Bytes allocated (tracemalloc peak) per pipeline stage call.')
+    else:
+        bytes_family = ('output_bytes', 'Size in bytes of the output of each pipeline stage call.')
+    families = [
+        ('seconds', 'seconds', 'Wall time per pipeline stage call.'),
+        ('rows', 'rows', 'Rows per pipeline stage call.'),
+        ('bytes',) + bytes_family,
+    ]
+    lines = []
+    for measure, name, help_text in families:
+        metric = f"{prefix}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for stage, stats in data.items():
+            hist = stats[measure]
+            label = stage.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(hist['bounds'] + ['+Inf'], hist['counts']):
+                cumulative += count
+                le = bound if bound == '+Inf' else _format_bound(bound)
+                lines.append(f'{metric}_bucket{{stage="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{label}"}} {float(hist["sum"])!r}')
+            lines.append(f'{metric}_count{{stage="{label}"}} {hist["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def summary(data=None):
+    """
+    Uma linha por etapa: chamadas, tempo total e médio, linhas e bytes.
+    """
+    data = snapshot() if data is None else data
+    rows = []
+    for stage, stats in data.items():
+        seconds, count = stats['seconds']['sum'], stats['seconds']['count']
+        rows.append({
+            'stage': stage, 'calls': count, 'total_s': seconds,
+            'mean_ms': seconds / count * 1e3 if count else 0.0,
+            'rows': int(stats['rows']['sum']), 'bytes': int(stats['bytes']['sum']),
+        })
+    return sorted(rows, key=lambda r: r['total_s'], reverse=True)
+
+
+def dump(path, data=None, allocations=None):
+    """
+    Grava o snapshot em `path`: texto do Prometheus para .prom/.txt, JSON nos demais.
+    """
+    data = snapshot() if data is None else data
+    if str(path).endswith(('.prom', '.txt')):
+        text = to_prometheus(data, allocations=allocations)
+    else:
+        text = json.dumps(data, indent=2)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
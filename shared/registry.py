@@ -0,0 +1,361 @@
+"""
+Registro de modelos em memória, com troca a quente e avaliação em sombra.
+
+O ModelRegistry guarda as últimas versões carregadas e aponta uma delas como
+ativa. Uma thread observa os arquivos do modelo (assinatura mtime, tamanho e
+inode) e, quando eles mudam, carrega e aquece a nova versão fora do caminho
+das requisições; só então ela vira a ativa, numa única atribuição. Cada
+requisição pega a versão ativa uma vez (`lease`), então as que já estavam em
+andamento terminam com a versão anterior; uma versão descartada só é fechada
+quando a última requisição que a usava termina.
+
+Com um candidato em sombra (ShadowScorer), cada registro atendido também é
+avaliado pelo candidato numa thread separada, que anota a discordância de
+classe e a latência dos dois modelos sem atrasar a resposta.
+"""
+import json
+import queue
+import threading
+import time
+import warnings
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from shared.cache import file_signature
+from shared.profiling import SECONDS_BUCKETS, Histogram
+
+DEFAULT_POLL_INTERVAL = 2.0
+_STOP = object()
+
+
+class ShadowScorer:
+    """
+    Avalia `predictor` (o candidato) nos mesmos registros do modelo ativo, numa
+    thread própria. A fila é limitada: se o candidato não acompanhar, as
+    comparações excedentes são descartadas (`dropped`), nunca a requisição.
+    Com `log_path`, cada discordância vira uma linha JSON no arquivo.
+    """
+
+    def __init__(self, predictor, version=None, max_queue=1024, log_path=None, keep_recent=100):
+        self.predictor = predictor
+        self.version = version
+        self.log_path = log_path
+        self.compared = 0
+        self.disagreements = 0
+        self.dropped = 0
+        self.errors = 0
+        self.primary_seconds = Histogram(SECONDS_BUCKETS)
+        self.shadow_seconds = Histogram(SECONDS_BUCKETS)
+        self.recent = deque(maxlen=keep_recent)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+        self._thread.start()
+
+    def submit(self, record, prediction, seconds, version=None):
+        try:
+            self._queue.put_nowait((record, prediction, seconds, version))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._compare(*item)
+            finally:
+                self._queue.task_done()
+
+    def _compare(self, record, prediction, seconds, version):
+        start = time.perf_counter()
+        try:
+            candidate = self.predictor.predict_record(record)['prediction']
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            warnings.warn(f"Shadow model failed: {e}")
+            return
+        shadow_seconds = time.perf_counter() - start
+        with self._lock:
+            self.compared += 1
+            self.primary_seconds.observe(seconds)
+            self.shadow_seconds.observe(shadow_seconds)
+            if candidate == prediction:
+                return
+            self.disagreements += 1
+            entry = {
+                'time': time.time(), 'active_version': version, 'shadow_version': self.version,
+                'active': prediction, 'shadow': candidate,
+                'active_ms': seconds * 1e3, 'shadow_ms': shadow_seconds * 1e3, 'record': record,
+            }
+            self.recent.append(entry)
+        if self.log_path is not None:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, default=str) + '\n')
+
+    def join(self):
+        """
+        Espera as comparações já enfileiradas terminarem.
+        """
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            primary, shadow = self.primary_seconds, self.shadow_seconds
+            return {
+                'shadow_version': self.version, 'compared': self.compared,
+                'disagreements': self.disagreements,
+                'disagreement_rate': self.disagreements / self.compared if self.compared else 0.0,
+                'dropped': self.dropped, 'errors': self.errors,
+                'active_mean_ms': primary.sum / primary.count * 1e3 if primary.count else None,
+                'shadow_mean_ms': shadow.sum / shadow.count * 1e3 if shadow.count else None,
+                'active_seconds': primary.to_dict(), 'shadow_seconds': shadow.to_dict(),
+            }
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+
+def _close(predictor):
+    close = getattr(predictor, 'close', None)
+    if close is not None:
+        close()
+
+
+def _model_info(path):
+    # Metadados gravados pelo treino no artefato (.ofc), como a versão
+    if str(path).endswith('.ofc') and Path(path).exists():
+        from shared.artifact import load_artifact
+
+        return load_artifact(path).metadata
+    return {}
+
+
+class ModelRegistry:
+    """
+    Versões carregadas em memória (as `keep` mais recentes) e a versão ativa.
+
+    `load()` devolve um preditor com `predict_record` a partir dos arquivos
+    atuais; `paths` são os arquivos observados. O próprio registro tem
+    `predict_record` e `predict_proba`, que usam a versão ativa.
+    """
+
+    def __init__(self, load, paths, warmup=None, keep=3, poll_interval=DEFAULT_POLL_INTERVAL):
+        self._load = load
+        self.paths = [paths] if isinstance(paths, (str, Path)) else list(paths)
+        self._warmup = warmup
+        self.keep = keep
+        self.poll_interval = poll_interval
+        self._versions = OrderedDict()
+        # Requisições em andamento por versão e versões descartadas que esperam por elas
+        self._leases = {}
+        self._retired = {}
+        # (versão, preditor): lido e trocado sempre como uma tupla, numa única atribuição
+        self._active = None
+        self._shadow = None
+        self._next_version = 1
+        self._signature = None
+        self._failed_signature = None
+        self.last_error = None
+        self._lock = threading.RLock()
+        # Serializa as cargas; separado de _lock para que as requisições não esperem uma carga
+        self._load_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def signature(self):
+        return tuple(file_signature(path) for path in self.paths)
+
+    def load(self):
+        """
+        Carrega os arquivos atuais como uma nova versão, aquece e a ativa.
+        A carga e o aquecimento rodam fora do lock das requisições: só o
+        registro e a troca da versão ativa o seguram.
+        """
+        with self._load_lock:
+            signature = self.signature()
+            start = time.perf_counter()
+            predictor = self._load()
+            if self._warmup is not None:
+                self._warmup(predictor)
+            entry = {
+                'predictor': predictor, 'signature': signature, 'loaded_at': time.time(),
+                'load_seconds': time.perf_counter() - start, 'info': _model_info(self.paths[0]),
+            }
+            with self._lock:
+                version = self._next_version
+                self._next_version += 1
+                self._versions[version] = entry
+                self._signature = signature
+                self.activate(version)
+                self._evict()
+            return version
+
+    def activate(self, version):
+        """
+        Torna `version` (já carregada) a ativa; também serve para voltar a uma versão anterior.
+        """
+        with self._lock:
+            self._active = (version, self._versions[version]['predictor'])
+            self._ready.set()
+
+    def _evict(self):
+        active = self._active[0]
+        while len(self._versions) > self.keep:
+            oldest = next(v for v in self._versions if v != active)
+            predictor = self._versions.pop(oldest)['predictor']
+            if self._leases.get(oldest):
+                # Ainda em uso: fecha quando a última requisição devolver a versão
+                self._retired[oldest] = predictor
+            else:
+                _close(predictor)
+
+    def poll(self):
+        """
+        Recarrega se os arquivos mudaram. Devolve a nova versão ou None.
+        """
+        signature = self.signature()
+        if signature in (self._signature, self._failed_signature):
+            return None
+        try:
+            return self.load()
+        except Exception as e:
+            # Mantém a versão ativa; tenta de novo só quando os arquivos mudarem outra vez
+            self._failed_signature = signature
+            self.last_error = e
+            warnings.warn(f"Keeping model version {self.active_version}: reload failed: {e}")
+            return None
+
+    def _run(self):
+        try:
+            if self._active is None:
+                self.load()
+        except Exception as e:
+            self._failed_signature = self.signature()
+            self.last_error = e
+        finally:
+            self._ready.set()
+        while self.poll_interval and not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    def start(self):
+        """
+        Carrega a primeira versão (se `load()` ainda não foi chamado) e observa
+        os arquivos numa thread daemon.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='model-registry', daemon=True)
+            self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """
+        Bloqueia até haver uma versão ativa; repassa o erro da primeira carga.
+        """
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Model is still loading.")
+        if self._active is None:
+            raise self.last_error
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.clear_shadow()
+
+    def current(self):
+        """
+        (versão, preditor) ativos, sem reserva: serve para consultar a versão;
+        para predizer, use `lease`, que impede o preditor de ser fechado no meio.
+        """
+        active = self._active
+        if active is None:
+            raise RuntimeError("No model version is active yet.")
+        return active
+
+    @contextmanager
+    def lease(self):
+        """
+        Reserva a versão ativa durante o bloco e devolve (versão, preditor). Quem
+        precisa de várias chamadas ao mesmo modelo numa requisição usa uma reserva só.
+        """
+        with self._lock:
+            version, predictor = self.current()
+            self._leases[version] = self._leases.get(version, 0) + 1
+        try:
+            yield version, predictor
+        finally:
+            with self._lock:
+                remaining = self._leases[version] - 1
+                if remaining:
+                    self._leases[version] = remaining
+                else:
+                    del self._leases[version]
+                retired = self._retired.pop(version, None) if not remaining else None
+            if retired is not None:
+                _close(retired)
+
+    @property
+    def active_version(self):
+        return self._active[0] if self._active is not None else None
+
+    def set_shadow(self, predictor, version=None, **options):
+        shadow, self._shadow = self._shadow, ShadowScorer(predictor, version, **options)
+        if shadow is not None:
+            shadow.close()
+        return self._shadow
+
+    def clear_shadow(self):
+        shadow, self._shadow = self._shadow, None
+        if shadow is not None:
+            shadow.close()
+
+    @property
+    def shadow(self):
+        return self._shadow
+
+    def predict_record(self, record):
+        with self.lease() as (version, predictor):
+            start = time.perf_counter()
+            result = predictor.predict_record(record)
+            seconds = time.perf_counter() - start
+        shadow = self._shadow
+        if shadow is not None:
+            shadow.submit(record, result['prediction'], seconds, version)
+        result['model_version'] = version
+        return result
+
+    def predict_proba(self, X):
+        with self.lease() as (_, predictor):
+            return predictor.predict_proba(X)
+
+    def indicators(self, record):
+        with self.lease() as (_, predictor):
+            return predictor.indicators(record)
+
+    def explain_record(self, record, top=None):
+        with self.lease() as (version, predictor):
+            result = predictor.explain_record(record, top)
+        result['model_version'] = version
+        return result
+
+    def describe(self):
+        with self._lock:
+            versions = [
+                {'version': version, 'loaded_at': entry['loaded_at'], 'load_seconds': entry['load_seconds'],
+                 'info': entry['info']}
+                for version, entry in self._versions.items()
+            ]
+        shadow = self._shadow
+        return {
+            'active': self.active_version, 'versions': versions, 'paths': [str(p) for p in self.paths],
+            'last_error': None if self.last_error is None else str(self.last_error),
+            'shadow': shadow.stats() if shadow is not None else None,
+        }
@@ -2,24 +2,121 @@ from sklearn.base import BaseEstimator, ClassifierMixin
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import  MinMaxScaler
 from sklearn.base import BaseEstimator, TransformerMixin    
+from sklearn.pipeline import Pipeline
+import copy
+import numpy as np
 import pandas as pd
+from shared.profiling import instrument
 
-class DropFeatures(BaseEstimator, TransformerMixin):
-    def __init__(self, feature_to_drop=['Age']):
+# Esquema compacto (compact_pipeline): strings viram Categorical, escores ordinais
+# inteiros viram int8. Height e Weight continuam float64 porque o IMC e a escala
+# são calculados a partir deles antes da conversão para float32 do modelo.
+COMPACT_CATEGORICAL = ['Gender', 'family_history', 'FAVC', 'SMOKE', 'SCC', 'CAEC', 'CALC', 'MTRANS']
+COMPACT_ORDINAL = ['FCVC', 'NCP', 'CH2O', 'FAF', 'TUE']
+COMPACT_FLOAT32 = ['Age']
+# dtype para pd.read_csv: lê as colunas de texto direto como Categorical
+COMPACT_READ_DTYPES = {col: 'category' for col in COMPACT_CATEGORICAL}
+
+
+def _transport_type(x):
+    return 'sedentary' if x in ['Automobile', 'Motorbike'] else 'active' if x in ['Bike', 'Walking'] else 'neutral'
+
+
+def _as_category(series):
+    return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+
+
+def _category_codes(series, mapping, name):
+    # Converte pelas categorias (poucas), não linha a linha
+    if series.dtype.kind in 'biuf':
+        return series
+    categorical = _as_category(series)
+    unexpected = set(categorical.cat.categories) - mapping.keys()
+    if unexpected:
+        raise ValueError(f"Unexpected values {unexpected} in column '{name}'")
+    codes = categorical.cat.codes.to_numpy()
+    if (codes < 0).any():
+        raise ValueError(f"Missing values in column '{name}'")
+    table = np.array([mapping[c] for c in categorical.cat.categories], dtype=np.uint8)
+    return pd.Series(table.take(codes), index=series.index, name=series.name)
+
+
+def _map_categories(series, fn):
+    # Equivale a series.apply(fn), mas aplica fn só às categorias e devolve Categorical
+    categorical = _as_category(series)
+    mapped = [fn(c) for c in categorical.cat.categories] + [fn(np.nan)]
+    categories = sorted(set(mapped))
+    table = np.array([categories.index(m) for m in mapped], dtype=np.int8)
+    # O código -1 (valor ausente) cai na última posição da tabela: fn(nan)
+    codes = table.take(categorical.cat.codes.to_numpy())
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=series.index, name=series.name)
+
+
+class _CompactMixin:
+    def __setstate__(self, state):
+        # Transformadores salvos antes do modo compacto
+        state.setdefault('compact', False)
+        super().__setstate__(state)
+
+
+class CompactSchema(BaseEstimator, TransformerMixin):
+    """
+    Primeira etapa do modo compacto: copia a entrada uma única vez já nos
+    tipos compactos. As etapas seguintes, com compact=True, alteram esse
+    DataFrame no lugar.
+    """
+
+    def fit(self, X, y=None):
+        return self
+
+    @instrument()
+    def transform(self, X):
+        dtypes = {}
+        for col, dtype in X.dtypes.items():
+            if col in COMPACT_CATEGORICAL and dtype == object:
+                dtypes[col] = 'category'
+            elif col in COMPACT_ORDINAL and dtype.kind in 'iuf' and self._fits_int8(X[col]):
+                dtypes[col] = np.int8
+            elif col in COMPACT_FLOAT32 and dtype.kind == 'f':
+                dtypes[col] = np.float32
+        # astype sempre copia: esta é a cópia que as etapas seguintes podem alterar
+        return X.astype(dtypes)
+
+    @staticmethod
+    def _fits_int8(values):
+        # Só converte quando é exato: valores inteiros, sem ausentes, dentro do int8
+        array = values.to_numpy()
+        return bool(((array % 1 == 0) & (array >= -128) & (array <= 127)).all())
+
+class DropFeatures(_CompactMixin, BaseEstimator, TransformerMixin):
+    def __init__(self, feature_to_drop=['Age'], compact=False):
         self.feature_to_drop = feature_to_drop
+        self.compact = compact
 
     def fit(self, X, y=None): 
         return self
 
+    @instrument()
     def transform(self, X):
+        if self.compact:
+            # del não reconsolida os blocos do DataFrame (drop com inplace copia)
+            for col in self.feature_to_drop:
+                if col in X.columns:
+                    del X[col]
+            return X
         X = X.copy()
         return X.drop(columns=self.feature_to_drop, errors='ignore')
 
-class FeatureEngineering(BaseEstimator, TransformerMixin):
+class FeatureEngineering(_CompactMixin, BaseEstimator, TransformerMixin):
+    def __init__(self, compact=False):
+        self.compact = compact
+
     def fit(self, X, y=None):
         return self
+    @instrument()
     def transform(self, X):
-        X = X.copy()
+        if not self.compact:
+            X = X.copy()
 
         required_cols = ['Height', 'Weight', 'FCVC', 'NCP', 'FAF', 'TUE', 'MTRANS']
 
@@ -29,12 +126,20 @@ class FeatureEngineering(BaseEstimator, TransformerMixin):
         X['IMC'] = X['Weight'] / ((X['Height']**2))
         X['HealthyMealRatio'] = X['FCVC'] / X['NCP']
         X['ActivityBalance'] = X['FAF'] - X['TUE']
-        X['TransportType'] = X['MTRANS'].apply(lambda x: 'sedentary' if x in ['Automobile', 'Motorbike'] else 'active' if x in ['Bike', 'Walking'] else 'neutral')
+        if self.compact:
+            X['TransportType'] = _map_categories(X['MTRANS'], _transport_type)
+            # Já usados nos indicadores: daqui em diante só vão para o modelo, que converte para float32
+            for col in COMPACT_ORDINAL:
+                if X[col].dtype == np.float64:
+                    X[col] = X[col].astype(np.float32)
+        else:
+            X['TransportType'] = X['MTRANS'].apply(_transport_type)
 
         return X
 
-class TrasformNumeric(BaseEstimator, TransformerMixin):
-    def __init__(self):
+class TrasformNumeric(_CompactMixin, BaseEstimator, TransformerMixin):
+    def __init__(self, compact=False):
+        self.compact = compact
         self.dummy_cols = [
             'TransportType_active', 'TransportType_neutral', 'TransportType_sedentary',
             'CALC_Always', 'CALC_Frequently', 'CALC_Sometimes', 'CALC_no',
@@ -44,14 +149,17 @@ class TrasformNumeric(BaseEstimator, TransformerMixin):
     def fit(self, X, y=None):
         return self
 
+    @instrument()
     def transform(self, X):
-        X = X.copy()
-
         required_cols = ['family_history', 'FAVC', 'SMOKE', 'SCC', 'Gender', 'TransportType', 'CALC', 'CAEC']
         missing = set(required_cols) - set(X.columns)
         if missing:
             raise ValueError(f"Missing required columns: {missing}")
 
+        if self.compact:
+            return self._transform_compact(X)
+
+        X = X.copy()
         bol_col = ['family_history', 'FAVC', 'SMOKE', 'SCC']
         X[bol_col] = X[bol_col].replace({'yes': 1, 'no': 0})
 
@@ -69,29 +177,70 @@ class TrasformNumeric(BaseEstimator, TransformerMixin):
 
         return X
 
-class MinMaxScalerFeatures(BaseEstimator, TransformerMixin):
-    def __init__(self, min_max_col=None):
+    def _transform_compact(self, X):
+        # Flags e dummies em uint8, criadas no próprio DataFrame; só a reordenação copia
+        for col in ['family_history', 'FAVC', 'SMOKE', 'SCC']:
+            X[col] = _category_codes(X[col], {'yes': 1, 'no': 0}, col)
+        X['Gender'] = _category_codes(X['Gender'], {'Male': 1, 'Female': 0}, 'Gender')
+
+        for prefix in ['TransportType', 'CALC', 'CAEC']:
+            categorical = _as_category(X.pop(prefix))
+            codes = categorical.cat.codes.to_numpy()
+            for i, value in enumerate(categorical.cat.categories):
+                X[f'{prefix}_{value}'] = (codes == i).view(np.uint8)
+
+        for col in self.dummy_cols:
+            if col not in X.columns:
+                X[col] = np.zeros(len(X), dtype=np.uint8)
+
+        return X.reindex(sorted(X.columns), axis=1)
+
+class MinMaxScalerFeatures(_CompactMixin, BaseEstimator, TransformerMixin):
+    def __init__(self, min_max_col=None, compact=False):
         if min_max_col is None:
             self.min_max_col = ['Height', 'Weight', 'IMC', 'ActivityBalance', 'HealthyMealRatio']
         else:
             self.min_max_col = min_max_col
+        self.compact = compact
         self.scaler = MinMaxScaler()
 
     def fit(self, X, y=None):
         self.scaler.fit(X[self.min_max_col])
         return self
 
+    @instrument()
     def transform(self, X):
+        if self.compact:
+            # Coluna a coluna, com a mesma conta do MinMaxScaler em float64, e conversão
+            # para float32 como o RandomForest faria: mesmos valores, sem a cópia do bloco
+            missing = set(self.min_max_col) - set(X.columns)
+            if missing:
+                raise ValueError(f"Missing required columns: {missing}")
+            scaler = self.scaler
+            low, high = scaler.feature_range
+            for col, scale, offset in zip(self.min_max_col, scaler.scale_, scaler.min_):
+                values = X[col].to_numpy(dtype=np.float64, copy=True)
+                values *= scale
+                values += offset
+                if scaler.clip:
+                    np.clip(values, low, high, out=values)
+                X[col] = values.astype(np.float32)
+            return X
         X = X.copy()
         X[self.min_max_col] = self.scaler.transform(X[self.min_max_col])
         return X
 
-class LifestyleScore(BaseEstimator, TransformerMixin):
+class LifestyleScore(_CompactMixin, BaseEstimator, TransformerMixin):
+    def __init__(self, compact=False):
+        self.compact = compact
+
     def fit(self, X, y=None):
         return self
 
+    @instrument()
     def transform(self, X):
-        X = X.copy()
+        if not self.compact:
+            X = X.copy()
 
         required_cols = ['SMOKE', 'SCC', 'FAVC', 'family_history']
 
@@ -108,11 +257,21 @@ class LifestyleScore(BaseEstimator, TransformerMixin):
 
         return X
 
-class DropNonNumeric(BaseEstimator, TransformerMixin):
+class DropNonNumeric(_CompactMixin, BaseEstimator, TransformerMixin):
+    def __init__(self, compact=False):
+        self.compact = compact
+
     def fit(self, X, y=None):
         return self
 
+    @instrument()
     def transform(self, X):
+        if self.compact:
+            # No modo compacto as strings chegam como Categorical
+            for col, dtype in list(X.dtypes.items()):
+                if dtype == object or isinstance(dtype, pd.CategoricalDtype):
+                    del X[col]
+            return X
         X = X.copy()
         return X.select_dtypes(exclude=['object'])
 
@@ -142,25 +301,103 @@ class ObesityMap(BaseEstimator, TransformerMixin):
             raise TypeError("Input must be a pandas Series or DataFrame.")
 
 class Model(BaseEstimator, ClassifierMixin):
-    def __init__(self, max_depth=20, n_estimators=50, random_state=42):
+    # engine='compiled' usa o FlatForest (shared.forest): mesmas probabilidades, bit a bit
+    def __init__(self, max_depth=20, n_estimators=50, random_state=42, engine='sklearn',
+                 min_samples_leaf=1, max_features='sqrt', n_jobs=None):
         self.max_depth = max_depth
         self.n_estimators = n_estimators
         self.random_state = random_state
+        self.engine = engine
+        self.min_samples_leaf = min_samples_leaf
+        self.max_features = max_features
+        self.n_jobs = n_jobs
+    
+    def fit(self, X, y):
+        # A floresta é criada no fit para respeitar set_params (usado na busca de hiperparâmetros)
         self.model = RandomForestClassifier(
             max_depth=self.max_depth,
             n_estimators=self.n_estimators,
-            random_state=self.random_state
+            random_state=self.random_state,
+            min_samples_leaf=self.min_samples_leaf,
+            max_features=self.max_features,
+            n_jobs=self.n_jobs
         )
-    
-    def fit(self, X, y):
         self.model.fit(X, y)
+        self.classes_ = self.model.classes_
+        self._flat = None
         return self
+
+    def _flat_forest(self):
+        if getattr(self, '_flat', None) is None:
+            from shared.forest import FlatForest
+            self._flat = FlatForest.from_sklearn(self.model)
+        return self._flat
+
+    def _as_matrix(self, X):
+        if isinstance(X, pd.DataFrame):
+            expected = list(self.model.feature_names_in_)
+            if list(X.columns) != expected:
+                raise ValueError(f"Feature names must match those seen at fit: {expected}")
+            X = X.to_numpy(dtype='float32')
+        return X
+
+    def _compiled_proba(self, X):
+        return self._flat_forest().predict_proba(self._as_matrix(X))
     
+    @instrument()
     def predict(self, X):
+        if self.engine == 'compiled':
+            proba = self._compiled_proba(X)
+            return self.model.classes_.take(proba.argmax(axis=1), axis=0)
         return self.model.predict(X)
     
+    @instrument()
     def predict_proba(self, X):
+        if self.engine == 'compiled':
+            return self._compiled_proba(X)
         return self.model.predict_proba(X)
     
     def score(self, X, y):
-        return self.model.score(X, y)
\ No newline at end of file
+        return self.model.score(X, y)
+
+    def explain(self, X, predicted_only=False):
+        """
+        Contribuição de cada feature para as probabilidades de cada linha
+        (FlatForest.explain), com os nomes das features, as classes e a classe
+        prevista. Para somar as dummies no campo de origem: shared.explain.by_field.
+        """
+        result = self._flat_forest().explain(self._as_matrix(X), predicted_only)
+        result['feature_names'] = list(self.model.feature_names_in_)
+        result['classes'] = self.model.classes_
+        result['prediction'] = self.model.classes_.take(result['proba'].argmax(axis=1), axis=0)
+        return result
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop('_flat', None)
+        return state
+
+    def __setstate__(self, state):
+        # Modelos salvos antes destes parâmetros usam os valores padrão
+        state.setdefault('engine', 'sklearn')
+        state.setdefault('min_samples_leaf', 1)
+        state.setdefault('max_features', 'sqrt')
+        state.setdefault('n_jobs', None)
+        if hasattr(state.get('model'), 'classes_'):
+            state.setdefault('classes_', state['model'].classes_)
+        super().__setstate__(state)
+
+
+def compact_pipeline(pipeline):
+    """
+    Versão em modo compacto de um Pipeline já ajustado: CompactSchema na
+    frente e as etapas de pré-processamento com compact=True (tipos menores e
+    alterações no lugar). O modelo é o mesmo e as predições são idênticas.
+    """
+    steps = [('compact_schema', CompactSchema())]
+    for name, step in pipeline.steps:
+        if 'compact' in step.get_params():
+            step = copy.copy(step)
+            step.compact = True
+        steps.append((name, step))
+    return Pipeline(steps)
@@ -0,0 +1,61 @@
+"""
+Carregamento do modelo em segundo plano, na partida do processo.
+
+O app começa a desenhar a página enquanto o modelo é lido e aquecido numa
+thread; só a primeira predição espera, e apenas se o carregamento ainda não
+terminou.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+# Registro típico de Obesity.csv, usado para exercitar o caminho de predição
+SAMPLE_RECORD = {
+    'Gender': 'Female', 'Age': 21, 'Height': 1.62, 'Weight': 64.0,
+    'family_history': 'yes', 'FAVC': 'no', 'FCVC': 2, 'NCP': 3, 'CAEC': 'Sometimes',
+    'SMOKE': 'no', 'CH2O': 2, 'SCC': 'no', 'FAF': 0, 'TUE': 1, 'CALC': 'no',
+    'MTRANS': 'Public_Transportation',
+}
+
+
+def warm_predictor(predictor):
+    # A primeira chamada paga os page faults do artefato mapeado e os buffers por thread
+    predictor.predict_record(SAMPLE_RECORD)
+    # e a tabela de caminhos das explicações, montada na primeira chamada
+    if hasattr(predictor, 'explain_record'):
+        predictor.explain_record(SAMPLE_RECORD)
+
+
+class BackgroundLoader:
+    """
+    Executa `load()` (e depois `warmup(valor)`) numa thread daemon.
+    `result()` bloqueia até o valor ficar pronto e repassa exceções do carregamento.
+    """
+
+    def __init__(self, load, warmup=None, name='model-loader'):
+        self._load = load
+        self._warmup = warmup
+        self._future = Future()
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            value = self._load()
+            self.load_seconds = time.perf_counter() - start
+            if self._warmup is not None:
+                self._warmup(value)
+                self.warmup_seconds = time.perf_counter() - start - self.load_seconds
+        except BaseException as e:
+            self._future.set_exception(e)
+        else:
+            self._future.set_result(value)
+
+    def done(self):
+        return self._future.done()
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
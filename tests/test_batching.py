@@ -0,0 +1,84 @@
+import threading
+
+import numpy as np
+import pytest
+
+from shared.batching import MicroBatcher, MicroBatchModel
+
+
+def submit_together(batcher, rows):
+    # Envia as linhas de uma vez, para caírem no mesmo lote
+    return [batcher.submit(row) for row in rows]
+
+
+def test_rows_are_batched_and_fanned_out():
+    batcher = MicroBatcher(lambda X: X.sum(axis=1), max_wait=0.05)
+    futures = submit_together(batcher, [np.array([i, 1.0]) for i in range(5)])
+    assert [f.result(timeout=5) for f in futures] == [1, 2, 3, 4, 5]
+    assert batcher.metrics()['rows'] == 5
+    batcher.close()
+
+
+def test_malformed_row_is_rejected_at_submit():
+    batcher = MicroBatcher(lambda X: X.sum(axis=1), n_features=2)
+    with pytest.raises(ValueError):
+        batcher.submit(np.array([1.0, 2.0, 3.0]))
+    with pytest.raises(ValueError):
+        batcher.submit(np.array([[1.0, 2.0]]))
+    with pytest.raises(ValueError):
+        batcher.submit(['a', 'b'])
+    assert batcher.submit(np.array([1.0, 2.0])).result(timeout=5) == 3
+    batcher.close()
+
+
+def test_failing_row_only_fails_its_caller():
+    def fn(X):
+        if np.isnan(X).any():
+            raise ValueError("NaN in batch")
+        return X.sum(axis=1)
+
+    batcher = MicroBatcher(fn, max_wait=0.05)
+    futures = submit_together(batcher, [np.array([1.0]), np.array([np.nan]), np.array([3.0])])
+    assert futures[0].result(timeout=5) == 1
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == 3
+    batcher.close()
+
+
+def test_short_result_fails_instead_of_hanging():
+    batcher = MicroBatcher(lambda X: X.sum(axis=1)[:1], max_wait=0.05)
+    futures = submit_together(batcher, [np.array([1.0]), np.array([2.0])])
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_submit_after_close_raises():
+    batcher = MicroBatcher(lambda X: X.sum(axis=1))
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.array([1.0]))
+
+
+class SlowModel:
+    classes_ = np.array([0, 1])
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def predict_proba(self, X):
+        self.release.wait(5)
+        return np.tile([0.25, 0.75], (len(X), 1))
+
+
+def test_model_times_out_and_handles_empty_input():
+    model = SlowModel()
+    batched = MicroBatchModel(model, timeout=0.1)
+    assert batched.predict_proba(np.empty((0, 3))).shape == (0, 2)
+    with pytest.raises(TimeoutError):
+        batched.predict_proba(np.ones((1, 3)))
+    model.release.set()
+    assert batched.predict(np.ones((2, 3))).tolist() == [1, 1]
+    batched.close()
@@ -0,0 +1,31 @@
+import json
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from shared.datastore import AppendOnlyStore
+from train.incremental import retrain
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_retrain_extends_the_drift_baseline(tmp_path):
+    models_dir = tmp_path / 'models'
+    models_dir.mkdir()
+    for name in ('obesity_model.joblib', 'obesity_model.ofc', 'obesity_baseline.json'):
+        shutil.copy(ROOT / 'models' / name, models_dir / name)
+    previous = json.loads((models_dir / 'obesity_baseline.json').read_text())
+
+    store = AppendOnlyStore(tmp_path / 'store.csv')
+    store.append(pd.read_csv(ROOT / 'Obesity.csv').head(200))
+    metadata = retrain(store, n_trees=2, models_dir=models_dir)
+
+    baseline = json.loads((models_dir / 'obesity_baseline.json').read_text())
+    version_file = Path(metadata['path']).with_suffix('.baseline.json')
+    assert json.loads(version_file.read_text()) == baseline
+    assert baseline['records'] == previous['records'] + 200 == metadata['baseline_rows']
+    assert baseline['metadata']['version'] == metadata['version']
+    assert baseline['numeric']['IMC']['edges'] == previous['numeric']['IMC']['edges']
+    assert baseline['numeric']['IMC']['count'] == previous['numeric']['IMC']['count'] + 200
+    assert sum(baseline['categorical']['prediction']['counts'].values()) == baseline['records']
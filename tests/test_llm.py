@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from shared.llm import AnalysisService, LocalBackend
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def slow_service():
+    # 20 pedaços de 50 ms: tempo de sobra para cancelar no meio da geração
+    service = AnalysisService(LocalBackend(n_chunks=20, chunk_latency=0.05))
+    yield service
+    service.shutdown()
+
+
+def test_identical_requests_share_one_backend_call():
+    gate = threading.Event()
+    backend = LocalBackend(responder=lambda prompt: gate.wait(5) and f"resposta {prompt}")
+    service = AnalysisService(backend, max_workers=2)
+    try:
+        streams = [service.stream('a') for _ in range(5)]
+        # Os pedidos agrupados não ocupam workers: um prompt diferente roda enquanto 'a' espera
+        other = service.stream('b', timeout=2)
+        assert not gate.is_set()
+        gate.set()
+        assert ''.join(other) == 'resposta b'
+        assert [''.join(stream) for stream in streams] == ['resposta a'] * 5
+        assert backend.calls == 2
+        assert service.stats()['coalesced'] == 4
+    finally:
+        gate.set()
+        service.shutdown()
+
+
+def test_cancelled_owner_keeps_generating_for_waiters(slow_service):
+    owner, waiter = slow_service.stream('a'), slow_service.stream('a')
+    owner.cancel()
+    assert ''.join(waiter).startswith('**')
+    assert slow_service.stats()['cancelled'] == 0
+
+
+def test_owner_abandons_once_every_waiter_cancels(slow_service):
+    owner, waiter = slow_service.stream('a'), slow_service.stream('a')
+    owner.cancel()
+    waiter.cancel()
+    assert wait_for(lambda: slow_service.stats()['cancelled'] == 1)
+    with pytest.raises(CancelledError):
+        list(owner)
+    # A chave foi liberada: um pedido novo chama o backend outra vez
+    assert ''.join(slow_service.stream('a')).startswith('**')
+    assert slow_service.backend.calls == 2
+
+
+def test_waiter_timeout_releases_the_owner(slow_service):
+    owner, waiter = slow_service.stream('a'), slow_service.stream('a', timeout=0.1)
+    with pytest.raises(TimeoutError):
+        list(waiter)
+    owner.cancel()
+    assert wait_for(lambda: slow_service.stats()['cancelled'] == 1)
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shared import profiling
+
+
+class Stage:
+    @profiling.instrument('stage')
+    def run(self, X):
+        return X
+
+
+@pytest.fixture
+def profile():
+    profiling.enable(trace_allocations=False)
+    profiling.reset()
+    yield
+    profiling.reset()
+    profiling.disable()
+
+
+@pytest.mark.parametrize('output', [
+    pd.Series(np.zeros(100)),
+    pd.DataFrame({'a': np.zeros(100), 'b': np.zeros(100)}),
+    np.zeros(100),
+])
+def test_output_bytes_for_series_frames_and_arrays(profile, output):
+    Stage().run(output)
+    stats = profiling.snapshot()['stage']
+    assert stats['rows']['sum'] == 100
+    assert stats['bytes']['sum'] >= 800
+
+
+def test_prometheus_names_the_bytes_measure(profile):
+    Stage().run(np.zeros(10))
+    assert 'obesity_stage_output_bytes_count{stage="stage"} 1' in profiling.to_prometheus()
+    text = profiling.to_prometheus(allocations=True)
+    assert 'obesity_stage_allocated_bytes_count{stage="stage"} 1' in text
+    assert 'output_bytes' not in text
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import numpy as np
+
+from shared.batching import MicroBatcher
+from shared.registry import ModelRegistry
+
+
+class BatchedPredictor:
+    """
+    Preditor mínimo que passa pelo MicroBatcher, como o do server.py com
+    --microbatch-ms; `started`/`proceed` seguram a requisição no meio.
+    """
+
+    def __init__(self):
+        self.batcher = MicroBatcher(lambda X: X.sum(axis=1))
+        self.started = threading.Event()
+        self.proceed = threading.Event()
+        self.block = False
+        self.closed = False
+
+    def predict_record(self, record):
+        if self.block:
+            self.started.set()
+            self.proceed.wait(5)
+        value = self.batcher.submit(np.array([record['x']])).result(timeout=5)
+        return {'prediction': int(value)}
+
+    def close(self):
+        self.closed = True
+        self.batcher.close()
+
+
+def test_evict_waits_for_in_flight_request(tmp_path):
+    predictors = []
+
+    def load():
+        predictors.append(BatchedPredictor())
+        return predictors[-1]
+
+    registry = ModelRegistry(load, tmp_path / 'model.ofc', keep=1, poll_interval=0)
+    registry.load()
+    first = predictors[0]
+    first.block = True
+    results = []
+    request = threading.Thread(target=lambda: results.append(registry.predict_record({'x': 3})))
+    request.start()
+    assert first.started.wait(5)
+
+    # A nova versão descarta a primeira enquanto a requisição ainda a usa
+    registry.load()
+    assert registry.active_version == 2
+    assert not first.closed
+
+    first.proceed.set()
+    request.join(5)
+    assert not request.is_alive()
+    assert results == [{'prediction': 3, 'model_version': 1}]
+    assert first.closed
+    assert registry.predict_record({'x': 4})['model_version'] == 2
+
+
+def test_evict_closes_idle_version_immediately(tmp_path):
+    predictors = []
+
+    def load():
+        predictors.append(BatchedPredictor())
+        return predictors[-1]
+
+    registry = ModelRegistry(load, tmp_path / 'model.ofc', keep=1, poll_interval=0)
+    registry.load()
+    registry.predict_record({'x': 1})
+    registry.load()
+    assert predictors[0].closed
+    assert not predictors[1].closed
+
+
+def test_predictions_do_not_wait_for_a_slow_load(tmp_path):
+    loading = threading.Event()
+    release = threading.Event()
+    predictors = []
+
+    def load():
+        if predictors:
+            # A segunda carga fica presa até o teste liberar
+            loading.set()
+            release.wait(5)
+        predictors.append(BatchedPredictor())
+        return predictors[-1]
+
+    registry = ModelRegistry(load, tmp_path / 'model.ofc', keep=2, poll_interval=0)
+    registry.load()
+    reload = threading.Thread(target=registry.load)
+    reload.start()
+    assert loading.wait(5)
+    try:
+        start = time.perf_counter()
+        for x in range(20):
+            assert registry.predict_record({'x': x}) == {'prediction': x, 'model_version': 1}
+        assert time.perf_counter() - start < 1.0
+    finally:
+        release.set()
+        reload.join(5)
+    assert registry.active_version == 2
@@ -0,0 +1,27 @@
+from benchmarks.suite import compare
+
+
+def run(seconds, rounds):
+    return {'results': [{'case': 'Model.predict', 'rows': 1, 'seconds': seconds, 'rounds': rounds}]}
+
+
+def test_overlapping_rounds_are_not_a_regression():
+    # Mediana 37% pior, mas uma rodada atual empata com o baseline: ruído
+    baseline = run(0.0032, [0.0030, 0.0032, 0.0045])
+    assert compare(run(0.0044, [0.0031, 0.0044, 0.0046]), baseline) == []
+
+
+def test_small_absolute_change_is_not_a_regression():
+    assert compare(run(0.0012, [0.0011, 0.0012, 0.0013]), run(0.0005, [0.0005, 0.0005, 0.0005])) == []
+
+
+def test_clear_slowdown_is_a_regression():
+    baseline = run(0.010, [0.009, 0.010, 0.011])
+    regressions = compare(run(0.020, [0.019, 0.020, 0.022]), baseline)
+    assert [(r['case'], r['metric']) for r in regressions] == [('Model.predict', 'seconds')]
+    assert regressions[0]['ratio'] == 2.0
+
+
+def test_baseline_without_rounds_uses_the_median():
+    baseline = {'results': [{'case': 'Model.predict', 'rows': 1, 'seconds': 0.010}]}
+    assert len(compare(run(0.020, [0.019, 0.020, 0.022]), baseline)) == 1
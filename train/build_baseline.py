@@ -0,0 +1,43 @@
+"""
+Gera a linha de base do monitor de drift (shared.drift) para o modelo atual,
+sem retreinar.
+
+Usa a mesma divisão de treino de train.train: as estatísticas das entradas do
+conjunto de treino e a distribuição das classes previstas pelo modelo nelas.
+O train.train já grava este arquivo a cada treino; este comando serve para
+modelos treinados antes do monitor ou para outra base de referência.
+
+Uso (a partir da raiz do repositório):
+    python -m train.build_baseline
+    python -m train.build_baseline --data outra_base.csv --bins 20
+"""
+import argparse
+
+import pandas as pd
+
+from shared.artifact import load_artifact, load_predictor
+from shared.drift import DEFAULT_BINS, build_baseline, save_baseline
+from train.train import DATA_PATH, split
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/obesity_model.ofc', help='.ofc ou .joblib')
+    parser.add_argument('--data', default=DATA_PATH, help='CSV de treino no schema de Obesity.csv')
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS, help='faixas por campo numérico (quantis)')
+    parser.add_argument('--out', default='models/obesity_baseline.json')
+    args = parser.parse_args(argv)
+
+    X_train, _, _, _ = split(pd.read_csv(args.data))
+    predictor = load_predictor(args.model)
+    metadata = {'source': args.data, 'rows': len(X_train), 'model': args.model}
+    if args.model.endswith('.ofc'):
+        metadata['version'] = load_artifact(args.model).metadata.get('version')
+    baseline = build_baseline(X_train, predictor.predict(X_train), bins=args.bins, metadata=metadata)
+    save_baseline(baseline, args.out)
+    print(f"Linha de base salva em {args.out}: {len(X_train):,} linhas, {len(baseline['numeric'])} campos numéricos, "
+          f"{len(baseline['categorical'])} categóricos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Gera a tabela de consulta do app (shared.lookup) para o modelo atual.
+
+Percorre todas as combinações dos campos discretos do formulário e, para cada
+uma, a grade de altura x IMC, com o CompiledPipeline do modelo. A tabela
+guarda o digest do modelo: o app só a usa com o mesmo modelo.
+
+Uso (a partir da raiz do repositório):
+    python -m train.build_lookup
+    python -m train.build_lookup --height 1.45 0.1 6 --imc 14 1 40
+"""
+import argparse
+import os
+import sys
+import time
+
+from shared.artifact import load_predictor
+from shared.lookup import DEFAULT_HEIGHT, DEFAULT_IMC, build_table, load_table
+
+
+def _grid(values):
+    start, step, count = values
+    return float(start), float(step), int(count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/obesity_model.ofc', help='.ofc ou .joblib')
+    parser.add_argument('--out', default='models/obesity_lookup.oft')
+    parser.add_argument('--height', nargs=3, type=float, default=DEFAULT_HEIGHT, metavar=('INICIO', 'PASSO', 'FAIXAS'),
+                        help='grade de altura em metros')
+    parser.add_argument('--imc', nargs=3, type=float, default=DEFAULT_IMC, metavar=('INICIO', 'PASSO', 'FAIXAS'),
+                        help='grade de IMC em kg/m²')
+    args = parser.parse_args(argv)
+
+    def progress(done, total, seconds):
+        eta = seconds / done * (total - done)
+        print(f"\r{done:,}/{total:,} combinações  {seconds:,.0f} s  (faltam ~{eta:,.0f} s)",
+              end='', file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    predictor = load_predictor(args.model)
+    path = build_table(predictor, args.out, height=_grid(args.height), imc=_grid(args.imc),
+                       metadata={'model': args.model}, progress=progress)
+    print(file=sys.stderr)
+    table = load_table(path)
+    print(f"Tabela salva em {path}: {len(table.classes):,} entradas, {os.path.getsize(path) / 2**20:,.0f} MB, "
+          f"{table.coverage():.1%} com resposta, {time.perf_counter() - start:,.0f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Converte um Pipeline salvo em .joblib para o artefato compacto (.ofc),
+sem retreinar.
+
+Uso (a partir da raiz do repositório):
+    python -m train.export_artifact models/obesity_model.joblib models/obesity_model.ofc
+"""
+import argparse
+
+import joblib
+import sklearn
+
+from shared.artifact import export_artifact
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', nargs='?', default='models/obesity_model.joblib')
+    parser.add_argument('target', nargs='?', default='models/obesity_model.ofc')
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.source)
+    path = export_artifact(pipeline, args.target, metadata={
+        'source': args.source, 'sklearn_version': sklearn.__version__,
+    })
+    print(f"Artefato salvo em {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Retreino incremental a partir do armazenamento local de registros novos.
+
+Lê do AppendOnlyStore apenas as linhas gravadas depois do último retreino (o
+offset fica nos metadados do artefato), treina árvores novas só com essas
+linhas e as acrescenta à floresta atual (`--mode warm_start`) ou substitui
+as árvores mais antigas (`--mode replace`, mantendo o tamanho da floresta).
+
+O pré-processamento não é reajustado: o MinMaxScalerFeatures fica congelado
+com as estatísticas do treino original, porque os thresholds das árvores
+existentes estão nessa escala. Linhas novas fora do intervalo [0, 1] depois da
+escala são contadas e registradas nos metadados.
+
+Cada execução grava uma nova versão em models/versions/ e, por padrão, a
+promove para models/obesity_model.joblib e .ofc (troca atômica), junto com a
+linha de base do drift: a anterior somada às linhas novas.
+
+Uso (a partir da raiz do repositório):
+    python -m train.incremental --store data/novos.csv --trees 10 --mode warm_start
+"""
+import argparse
+import os
+import re
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, classification_report, mean_absolute_error
+from sklearn.tree._tree import Tree
+
+from shared.artifact import export_artifact, load_artifact
+from shared.datastore import AppendOnlyStore
+from shared.drift import extend_baseline, load_baseline, save_baseline
+from shared.utils import ObesityMap
+
+MODELS_DIR = Path('models')
+STORE_PATH = Path('data') / 'obesity_store.csv'
+VERSION_PATTERN = re.compile(r'obesity_model-v(\d+)\.ofc$')
+
+
+def _expand_tree(estimator, classes):
+    # Uma árvore treinada só com as classes presentes no lote novo passa a ter as colunas de todas
+    index = np.searchsorted(classes, estimator.classes_)
+    if index.max(initial=0) >= len(classes) or not np.array_equal(classes[index], estimator.classes_):
+        raise ValueError(f"New labels {set(estimator.classes_) - set(classes)} are not in the model classes.")
+    state = estimator.tree_.__getstate__()
+    values = np.zeros((state['node_count'], 1, len(classes)))
+    values[:, :, index] = state['values']
+    state['values'] = values
+    tree = Tree(estimator.n_features_in_, np.array([len(classes)], dtype=np.intp), 1)
+    tree.__setstate__(state)
+    estimator.tree_ = tree
+    estimator.classes_ = classes
+    estimator.n_classes_ = len(classes)
+    return estimator
+
+
+def grow_forest(forest, X, y, n_trees, replace_oldest=False, random_state=None):
+    """
+    Treina `n_trees` árvores com (X, y) e as acrescenta a `forest`; com
+    `replace_oldest`, as `n_trees` primeiras árvores saem.
+    """
+    params = forest.get_params()
+    params.update(n_estimators=n_trees, warm_start=False, oob_score=False, random_state=random_state)
+    new = RandomForestClassifier(**params).fit(X, y)
+    trees = [_expand_tree(e, forest.classes_) for e in new.estimators_]
+    kept = forest.estimators_[n_trees:] if replace_oldest else forest.estimators_
+    forest.estimators_ = list(kept) + trees
+    forest.n_estimators = len(forest.estimators_)
+    return forest
+
+
+def next_version(models_dir, current=0):
+    versions = [int(m.group(1)) for p in (Path(models_dir) / 'versions').glob('*.ofc')
+                if (m := VERSION_PATTERN.search(p.name))]
+    return max(versions + [current]) + 1
+
+
+def save_version(pipeline, metadata, models_dir=MODELS_DIR, promote=True, baseline=None):
+    """
+    Grava models/versions/obesity_model-vNNNN.{joblib,ofc} e, com `promote`,
+    substitui atomicamente os arquivos atuais do modelo. Com `baseline`
+    (shared.drift.build_baseline), grava também a linha de base do drift.
+    """
+    models_dir = Path(models_dir)
+    versions_dir = models_dir / 'versions'
+    versions_dir.mkdir(parents=True, exist_ok=True)
+    name = f"obesity_model-v{metadata['version']:04d}"
+    joblib.dump(pipeline, versions_dir / f'{name}.joblib')
+    export_artifact(pipeline, versions_dir / f'{name}.ofc', metadata=metadata)
+    if baseline is not None:
+        save_baseline(baseline, versions_dir / f'{name}.baseline.json')
+    if promote:
+        tmp_path = models_dir / 'obesity_model.joblib.tmp'
+        joblib.dump(pipeline, tmp_path)
+        tmp_path.replace(models_dir / 'obesity_model.joblib')
+        export_artifact(pipeline, models_dir / 'obesity_model.ofc', metadata=metadata)
+        if baseline is not None:
+            save_baseline(baseline, models_dir / 'obesity_baseline.json')
+    return versions_dir / f'{name}.ofc'
+
+
+def retrain(store, n_trees=10, replace_oldest=False, models_dir=MODELS_DIR, eval_path=None, promote=True):
+    """
+    Um ciclo de retreino incremental. Devolve os metadados da nova versão, ou
+    None se não houver linhas novas no armazenamento.
+    """
+    start = time.perf_counter()
+    models_dir = Path(models_dir)
+    store = store if isinstance(store, AppendOnlyStore) else AppendOnlyStore(store)
+    pipeline = joblib.load(models_dir / 'obesity_model.joblib')
+    previous = load_artifact(models_dir / 'obesity_model.ofc').metadata
+    same_store = os.path.abspath(previous.get('store', '')) == os.path.abspath(store.path)
+    offset = previous.get('store_offset', 0) if same_store else 0
+
+    new_rows, end = store.read_since(offset)
+    if new_rows.empty:
+        return None
+    y = ObesityMap().transform(new_rows['Obesity'])
+    known = y.notna().to_numpy()
+    X = new_rows.drop(columns=['Obesity'])[known]
+    y = y[known].astype(int)
+
+    # Pré-processamento já ajustado (scaler congelado): só o Model muda
+    features = pipeline[:-1].transform(X)
+    scaler = pipeline.named_steps['min_max_scaler']
+    scaled = features[scaler.min_max_col].to_numpy()
+    out_of_range = int(((scaled < 0) | (scaled > 1)).any(axis=1).sum())
+
+    model = pipeline.named_steps['model']
+    version = next_version(models_dir, previous.get('version', 0))
+    random_state = None if model.random_state is None else model.random_state + version
+    grow_forest(model.model, features, y, n_trees, replace_oldest=replace_oldest, random_state=random_state)
+    model.n_estimators = model.model.n_estimators
+    model._flat = None
+
+    metadata = {
+        'source': 'incremental', 'version': version, 'parent_version': previous.get('version', 0),
+        'mode': 'replace' if replace_oldest else 'warm_start', 'new_trees': n_trees,
+        'n_trees': model.n_estimators, 'new_rows': int(known.sum()), 'skipped_rows': int((~known).sum()),
+        'scaler_out_of_range_rows': out_of_range, 'store': store.path, 'store_offset': end,
+        'train_seconds': time.perf_counter() - start,
+    }
+    if eval_path:
+        eval_df = pd.read_csv(eval_path)
+        y_eval = ObesityMap().transform(eval_df['Obesity'])
+        y_pred = pipeline.predict(eval_df.drop(columns=['Obesity']))
+        metadata.update({
+            'eval': str(eval_path), 'accuracy': accuracy_score(y_eval, y_pred),
+            'mae': mean_absolute_error(y_eval, y_pred),
+            'f1_macro': classification_report(y_eval, y_pred, output_dict=True)['macro avg']['f1-score'],
+        })
+    # A linha de base do drift acompanha a versão: a anterior mais as linhas novas
+    baseline = None
+    baseline_path = models_dir / 'obesity_baseline.json'
+    if baseline_path.exists():
+        baseline = extend_baseline(load_baseline(baseline_path), X, pipeline.predict(X),
+                                   metadata={'version': version, 'source': 'incremental'})
+        metadata['baseline_rows'] = baseline['records']
+    metadata['path'] = str(save_version(pipeline, metadata, models_dir, promote=promote, baseline=baseline))
+    return metadata
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=str(STORE_PATH), help='CSV só de acréscimo com os registros novos')
+    parser.add_argument('--trees', type=int, default=10, help='árvores treinadas com as linhas novas')
+    parser.add_argument('--mode', choices=['warm_start', 'replace'], default='warm_start')
+    parser.add_argument('--models-dir', default=str(MODELS_DIR))
+    parser.add_argument('--eval', help='CSV rotulado para avaliar a nova versão (opcional)')
+    parser.add_argument('--no-promote', action='store_true', help='só grava a versão, sem trocar o modelo atual')
+    args = parser.parse_args(argv)
+
+    metadata = retrain(
+        args.store, n_trees=args.trees, replace_oldest=args.mode == 'replace',
+        models_dir=args.models_dir, eval_path=args.eval, promote=not args.no_promote
+    )
+    if metadata is None:
+        print(f"Nenhuma linha nova em {args.store}.")
+        return
+    print(f"Versão {metadata['version']}: {metadata['new_rows']:,} linhas novas, "
+          f"{metadata['n_trees']} árvores, {metadata['train_seconds']:.2f} s -> {metadata['path']}")
+    if metadata['scaler_out_of_range_rows']:
+        print(f"Aviso: {metadata['scaler_out_of_range_rows']} linhas fora do intervalo do MinMaxScaler original.")
+    if 'accuracy' in metadata:
+        print(f"Acurácia: {metadata['accuracy']:.4f}  MAE: {metadata['mae']:.4f}  F1 Macro: {metadata['f1_macro']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
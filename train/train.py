@@ -1,44 +1,163 @@
+"""
+Treino do modelo de obesidade.
+
+Uso (a partir da raiz do repositório):
+    python -m train.train                      # treina o Model padrão
+    python -m train.train --search --folds 5   # busca de hiperparâmetros com CV estratificada
+
+Na busca, cada candidato de `--grid` é avaliado com k-fold estratificado em
+todos os núcleos; o pré-processamento de shared.utils é ajustado uma vez por
+fold e reaproveitado entre candidatos (Pipeline com `memory`). O melhor
+candidato (métrica de `--refit`) é treinado e salvo como no modo padrão.
+
+Junto com o modelo é gravada a linha de base do monitor de drift
+(models/obesity_baseline.json, shared.drift), calculada no conjunto de treino.
+"""
+import argparse
+import json
 import os
+import shutil
+import tempfile
 import joblib
 import pandas as pd
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
 from sklearn.metrics import accuracy_score, mean_absolute_error, classification_report
 from shared.utils import FeatureEngineering, TrasformNumeric, MinMaxScalerFeatures, LifestyleScore, ObesityMap, Model, DropNonNumeric, DropFeatures
+from shared.datastore import AppendOnlyStore
+from shared.drift import build_baseline
+from train.incremental import next_version, save_version
+
+# Arquivo local: a URL do GitHub (página "blob", não o CSV) falhava e exigia rede
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Obesity.csv')
+
+DEFAULT_GRID = {
+    'max_depth': [10, 15, 20, None],
+    'n_estimators': [25, 50, 100],
+    'min_samples_leaf': [1, 2],
+}
+SCORING = {'accuracy': 'accuracy', 'mae': 'neg_mean_absolute_error', 'f1_macro': 'f1_macro'}
+
+
+def build_pipeline(memory=None, **model_params):
+    return Pipeline([
+        ('drop_feature', DropFeatures()),
+        ('feature_engineering', FeatureEngineering()),
+        ('transform_numeric', TrasformNumeric()),
+        ('min_max_scaler', MinMaxScalerFeatures()),
+        ('dropnon_numeric', DropNonNumeric()),
+        ('lifestyle_score', LifestyleScore()),
+        ('model', Model(**model_params))
+    ], memory=memory)
+
+
+def split(obesity_df):
+    """
+    (X_train, X_test, y_train, y_test) com a divisão estratificada fixa do treino.
+    """
+    X = obesity_df.drop(columns=['Obesity'])
+    y = ObesityMap().fit_transform(obesity_df['Obesity'])
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+
+def search(X, y, grid=None, folds=5, n_jobs=-1, refit='accuracy'):
+    """
+    Busca em grade sobre os parâmetros de Model com StratifiedKFold.
+    Devolve (tabela de resultados ordenada por `refit`, melhores parâmetros).
+    """
+    grid = grid or DEFAULT_GRID
+    cache_dir = tempfile.mkdtemp(prefix='obesity-search-')
+    try:
+        # O cache do Pipeline guarda a saída de cada transformador por fold: só o Model muda entre candidatos
+        pipeline = build_pipeline(memory=joblib.Memory(cache_dir, verbose=0))
+        cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+        gs = GridSearchCV(
+            pipeline, {f'model__{name}': values for name, values in grid.items()},
+            scoring=SCORING, refit=False, cv=cv, n_jobs=n_jobs
+        )
+        gs.fit(X, y)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    cv_results = gs.cv_results_
+    fold_rows = len(X) / folds
+    params = [{name.removeprefix('model__'): value for name, value in p.items()} for p in cv_results['params']]
+    # Colunas object: mantém None e inteiros como vieram da grade
+    results = pd.DataFrame({name: pd.Series([p[name] for p in params], dtype=object) for name in grid})
+    results['accuracy'] = cv_results['mean_test_accuracy']
+    results['mae'] = -cv_results['mean_test_mae']
+    results['f1_macro'] = cv_results['mean_test_f1_macro']
+    results['f1_std'] = cv_results['std_test_f1_macro']
+    results['fit_s'] = cv_results['mean_fit_time']
+    # Tempo de score = pipeline.predict no fold de validação (uma predição por fold)
+    results['predict_ms'] = cv_results['mean_score_time'] * 1e3
+    results['predict_us_row'] = cv_results['mean_score_time'] / fold_rows * 1e6
+    order = results.sort_values([refit, 'predict_ms'], ascending=[refit == 'mae', True]).index
+    return results.loc[order].reset_index(drop=True), params[order[0]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--search', action='store_true', help='busca de hiperparâmetros antes do treino final')
+    parser.add_argument('--grid', help='JSON com listas de valores por parâmetro de Model (padrão: DEFAULT_GRID)')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--n-jobs', type=int, default=-1, help='processos da busca (-1 = todos os núcleos)')
+    parser.add_argument('--refit', choices=sorted(SCORING), default='accuracy', help='métrica para escolher o melhor')
+    parser.add_argument('--results', default='models/search_results.csv', help='tabela de resultados da busca')
+    parser.add_argument('--data', default=DATA_PATH, help='CSV de treino no schema de Obesity.csv')
+    parser.add_argument('--store', help='inclui as linhas do armazenamento incremental (train.incremental)')
+    args = parser.parse_args(argv)
 
-url = 'https://github.com/luishrufino/obsesityfastcheck/blob/main/Obesity.csv'
-obesity_df = pd.read_csv(url)
+    obesity_df = pd.read_csv(args.data)
+    store_metadata = {}
+    if args.store:
+        # Treino completo com o histórico do armazenamento; o retreino incremental continua daqui
+        store = AppendOnlyStore(args.store)
+        new_rows, offset = store.read_since(0)
+        obesity_df = pd.concat([obesity_df, new_rows], ignore_index=True)
+        store_metadata = {'store': store.path, 'store_offset': offset}
 
-pipeline = Pipeline([
-    ('drop_feature', DropFeatures()),
-    ('feature_engineering', FeatureEngineering()),
-    ('transform_numeric', TrasformNumeric()),
-    ('min_max_scaler', MinMaxScalerFeatures()),
-    ('dropnon_numeric', DropNonNumeric()),
-    ('lifestyle_score', LifestyleScore()),
-    ('model', Model())
-])
+    X_train, X_test, y_train, y_test = split(obesity_df)
 
+    model_params = {}
+    if args.search:
+        grid = json.loads(args.grid) if args.grid else None
+        results, model_params = search(X_train, y_train, grid=grid, folds=args.folds, n_jobs=args.n_jobs, refit=args.refit)
+        print(f"\nBusca de hiperparâmetros ({args.folds} folds, ordenado por {args.refit}):")
+        print(results.to_string(float_format=lambda v: f"{v:.4f}"))
+        os.makedirs(os.path.dirname(args.results) or '.', exist_ok=True)
+        results.to_csv(args.results, index=False)
+        print(f"\nMelhores parâmetros: {model_params}")
 
-X = obesity_df.drop(columns=['Obesity'])
-y = ObesityMap().fit_transform(obesity_df['Obesity'])
+    pipeline = build_pipeline(**model_params)
+    pipeline.fit(X_train, y_train)
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
 
-pipeline.fit(X_train, y_train)
+    y_pred = pipeline.predict(X_test)
+    acc = accuracy_score(y_test, y_pred)
+    mae = mean_absolute_error(y_test, y_pred)
+    f1 = classification_report(y_test, y_pred, output_dict=True)['macro avg']['f1-score']
 
+    print("\nDesempenho do modelo final (RandomForest):")
+    print(f"Acurácia: {acc:.4f}")
+    print(f"MAE: {mae:.4f}")
+    print(f"F1 Macro: {f1:.4f}")
 
-y_pred = pipeline.predict(X_test)
-acc = accuracy_score(y_test, y_pred)
-mae = mean_absolute_error(y_test, y_pred)
-f1 = classification_report(y_test, y_pred, output_dict=True)['macro avg']['f1-score']
 
-print("\nDesempenho do modelo final (RandomForest):")
-print(f"Acurácia: {acc:.4f}")
-print(f"MAE: {mae:.4f}")
-print(f"F1 Macro: {f1:.4f}")
+    # Nova versão em models/versions/ e troca atômica de models/obesity_model.joblib e .ofc
+    # (o .ofc é o artefato compacto, mapeável em memória, usado pelo app)
+    version = next_version('models')
+    # Distribuição das entradas de treino e das classes previstas nelas, para o monitor de drift
+    baseline = build_baseline(X_train, pipeline.predict(X_train),
+                              metadata={'version': version, 'source': args.data, 'rows': len(X_train)})
+    path = save_version(pipeline, {
+        'source': args.data, 'version': version,
+        'accuracy': acc, 'mae': mae, 'f1_macro': f1,
+        'params': pipeline.named_steps['model'].get_params(),
+        **store_metadata,
+    }, 'models', baseline=baseline)
+    print(f"Modelo salvo: {path}")
 
 
-os.makedirs('models', exist_ok=True)
-model_path = 'models/obesity_model.joblib'
-joblib.dump(pipeline, model_path)
+if __name__ == '__main__':
+    main()